@@ -0,0 +1,196 @@
+"""
+Compares how many simultaneous slow report requests a single ASGI worker
+holds with the synchronous report view against its native async counterpart
+(see transactions.api.async_views): the time to answer each number of
+concurrent requests, the throughput, the peak of queries in flight and the
+median (p50) and tail (p99) latencies.
+
+The requests are sent straight to the ASGI application of the project, in a
+single event loop as an ASGI server worker would. A slow query is simulated
+by having each report wait on the database (pg_sleep) for the given delay
+before being served. The report of a company created for the benchmark,
+and deleted afterwards, is requested:
+
+    python -m benchmarks.async_reports --concurrency 1,10,50 --delay 0.1 \\
+        --transactions 100 --pool-size 50
+"""
+
+import argparse
+import asyncio
+import time
+from urllib.parse import urlencode
+
+from benchmarks.bootstrap import setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import connections, router  # noqa: E402
+from django.urls import path  # noqa: E402
+from pycpfcnpj import gen  # noqa: E402
+
+from companies.cache import company_cache  # noqa: E402
+from companies.models import Company  # noqa: E402
+from payments import aiodb  # noqa: E402
+from payments.handlers import get_asgi_application  # noqa: E402
+from transactions.api.async_views import (  # noqa: E402
+    AsyncTransactionsReportView,
+)
+from transactions.api.views import TransactionsReportView  # noqa: E402
+from transactions.models import CompanySummary, Transaction  # noqa: E402
+from transactions.money import CENTS  # noqa: E402
+
+SLEEP = "SELECT pg_sleep(%s)"
+
+
+class InFlight:
+    """Counts the queries in flight, keeping their peak"""
+
+    def __init__(self):
+        self.count = 0
+        self.peak = 0
+
+    def __enter__(self):
+        self.count += 1
+        self.peak = max(self.peak, self.count)
+
+    def __exit__(self, *exc_info):
+        self.count -= 1
+
+
+in_flight = InFlight()
+delay = 0.1
+
+
+class SlowReportView(TransactionsReportView):
+    def _get_summary(self, company):
+        alias = router.db_for_read(CompanySummary)
+        with in_flight, connections[alias].cursor() as cursor:
+            cursor.execute(SLEEP, [delay])
+        return super()._get_summary(company)
+
+
+class SlowAsyncReportView(AsyncTransactionsReportView):
+    async def _get_summary(self, company):
+        alias = router.db_for_read(CompanySummary)
+        with in_flight:
+            await aiodb.execute(SLEEP, [delay], alias)
+        return await super()._get_summary(company)
+
+
+urlpatterns = [
+    path("sync", SlowReportView.as_view()),
+    path("async", SlowAsyncReportView.as_view()),
+]
+
+
+async def request(application, url: str, query: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url,
+        "raw_path": url.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    started_at = time.perf_counter()
+    await application(scope, receive, send)
+    elapsed = time.perf_counter() - started_at
+    assert messages[0]["status"] == 200, messages
+    return elapsed
+
+
+def percentile(latencies, fraction: float) -> float:
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+async def run(application, url: str, query: str, concurrency: int):
+    in_flight.peak = 0
+    # warms the company cache and the connections up
+    await request(application, url, query)
+    in_flight.peak = 0
+
+    started_at = time.perf_counter()
+    try:
+        latencies = sorted(
+            await asyncio.gather(
+                *[request(application, url, query) for _ in range(concurrency)]
+            )
+        )
+    finally:
+        aiodb.close_pools()
+    elapsed = time.perf_counter() - started_at
+
+    print(
+        f"{url:>5} view, {concurrency} concurrent requests: "
+        f"{elapsed:.2f}s ({concurrency / elapsed:,.1f} requests/s), "
+        f"peak of {in_flight.peak} in flight, "
+        f"p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.0f}ms"
+    )
+
+
+def create_company(transactions: int) -> Company:
+    company = Company.objects.create(
+        name="Benchmark",
+        cnpj=gen.cnpj(),
+        owner="Benchmark",
+        ddd=11,
+        phone=999999999,
+    )
+    Transaction.objects.bulk_create(
+        Transaction(
+            company=company,
+            client="11144477735",
+            value=(index % 100 + 1) * CENTS,
+            description="Benchmark",
+        )
+        for index in range(transactions)
+    )
+    return company
+
+
+def main():
+    global delay
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=str, default="1,10,50")
+    parser.add_argument("--delay", type=float, default=0.1)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=50)
+    options = parser.parse_args()
+
+    delay = options.delay
+    settings.ROOT_URLCONF = __name__
+    settings.ASYNC_API["POOL_SIZE"] = options.pool_size
+    application = get_asgi_application()
+
+    company = create_company(options.transactions)
+    query = urlencode({"cnpj": company.cnpj})
+    try:
+        for concurrency in map(int, options.concurrency.split(",")):
+            for url in ("/sync", "/async"):
+                asyncio.run(run(application, url, query, concurrency))
+    finally:
+        Transaction.objects.filter(company=company).delete()
+        company.delete()
+        company_cache.clear()
+        connections.close_all()
+
+
+if __name__ == "__main__":
+    main()
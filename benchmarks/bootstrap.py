@@ -0,0 +1,18 @@
+"""Bootstraps Django so the benchmarks can use the project code"""
+
+import os
+import sys
+
+import django
+
+PROJECT_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "payments"
+)
+
+
+def setup_django():
+    if PROJECT_ROOT not in sys.path:
+        sys.path.append(PROJECT_ROOT)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "payments.settings")
+    django.setup()
@@ -0,0 +1,144 @@
+"""
+Compares recording transactions from concurrent clients with an insert and
+a commit each against group commits (see transactions.batching), which
+insert the transactions arriving within a window together: the throughput
+and the median (p50) and tail (p99) latencies of the inserts for each
+number of clients and window.
+
+Each client is a thread recording one transaction at a time (as a worker
+thread serving requests) through the writes of the transaction batcher of
+the API, so each insert goes through the foreign key check of its company
+and the triggers of the summaries and rollups. The transactions table is
+the one of a scratch database (the test database of the configured one),
+created and migrated for the benchmark and dropped afterwards, so no
+project data is touched. A window of 0 inserts each transaction on its own:
+
+    python -m benchmarks.group_commit --requests 5000 --clients 1,8,32 \\
+        --windows 0,0.001,0.005 --max-size 100
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bootstrap import setup_django
+
+setup_django()
+
+from django.db import connection, connections  # noqa: E402
+from pycpfcnpj import gen  # noqa: E402
+
+from companies.models import Company  # noqa: E402
+from transactions.batching import (  # noqa: E402
+    InsertBatcher,
+    transaction_batcher,
+)
+from transactions.models import Transaction  # noqa: E402
+from transactions.money import CENTS  # noqa: E402
+
+
+class Writer:
+    """Writes transactions as the transaction batcher does, counting them"""
+
+    def __init__(self):
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, transactions, using):
+        transaction_batcher.write(transactions, using)
+        with self._lock:
+            self.commits += 1
+
+
+def create_companies(count: int):
+    companies = Company.objects.bulk_create(
+        Company(
+            name="Benchmark",
+            cnpj=gen.cnpj(),
+            owner="Benchmark",
+            ddd=11,
+            phone=999999999,
+        )
+        for _ in range(count)
+    )
+    return [company.id for company in companies]
+
+
+def percentile(latencies, fraction: float) -> float:
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+def run(clients: int, window: float, companies, options):
+    writer = Writer()
+    batcher = InsertBatcher(writer, window, options.max_size)
+    insert = (
+        batcher.insert
+        if batcher.enabled
+        else (lambda transaction, using: writer([transaction], using))
+    )
+
+    def client(requests: int):
+        latencies = []
+        try:
+            for _ in range(requests):
+                transaction = Transaction(
+                    company_id=random.choice(companies),
+                    client="11144477735",
+                    value=random.randint(150 * CENTS, 5000 * CENTS),
+                    description="Benchmark",
+                )
+                started_at = time.perf_counter()
+                insert(transaction, connection.alias)
+                latencies.append(time.perf_counter() - started_at)
+        finally:
+            connections.close_all()
+        return latencies
+
+    requests = [options.requests // clients] * clients
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = sorted(
+            latency
+            for client_latencies in executor.map(client, requests)
+            for latency in client_latencies
+        )
+    elapsed = time.perf_counter() - started_at
+
+    print(
+        f"{clients} clients, window {window * 1000:g}ms: "
+        f"{len(latencies):,} inserts in {elapsed:.2f}s "
+        f"({len(latencies) / elapsed:,.0f} rows/s, "
+        f"{len(latencies) / writer.commits:.1f} rows/commit), "
+        f"p50 {percentile(latencies, 0.5) * 1000:.2f}ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=str, default="1,8,32")
+    parser.add_argument("--windows", type=str, default="0,0.001,0.005")
+    parser.add_argument("--max-size", type=int, default=100)
+    parser.add_argument("--companies", type=int, default=1000)
+    options = parser.parse_args()
+
+    database_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        companies = create_companies(options.companies)
+        for clients in map(int, options.clients.split(",")):
+            for window in map(float, options.windows.split(",")):
+                random.seed(0)
+                run(clients, window, companies, options)
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compares storing transaction values as floats (double precision) against
+integer cents (bigint): the speed of summing them, the size of the table
+and of a (company_id, value) index, and the drift of the float sums.
+
+The same synthetic values (5M rows over 1000 companies by default) are
+loaded into two temporary tables of the configured database, so no project
+table is touched:
+
+    python -m benchmarks.money_storage --rows 5000000 --companies 1000
+"""
+
+import argparse
+import time
+
+from benchmarks.bootstrap import setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from transactions.money import CENTS, from_cents  # noqa: E402
+
+CREATE_CENTS_TABLE = """
+CREATE TEMPORARY TABLE benchmark_cents AS
+SELECT
+    md5((index %% %(companies)s)::text)::uuid AS company_id,
+    (random() * 485000)::bigint + 15000 AS value
+FROM generate_series(1, %(rows)s) AS index
+"""
+
+CREATE_FLOAT_TABLE = f"""
+CREATE TEMPORARY TABLE benchmark_float AS
+SELECT company_id, (value / {CENTS}.0)::double precision AS value
+FROM benchmark_cents
+"""
+
+TABLES = {"float": "benchmark_float", "cents": "benchmark_cents"}
+
+QUERIES = {
+    "SUM": "SELECT SUM(value) FROM {table}",
+    "SUM by company": (
+        "SELECT company_id, SUM(value) FROM {table} GROUP BY company_id"
+    ),
+}
+
+
+def setup_tables(cursor, rows, companies):
+    cursor.execute("SELECT setseed(0.5)")
+    cursor.execute(CREATE_CENTS_TABLE, {"rows": rows, "companies": companies})
+    cursor.execute(CREATE_FLOAT_TABLE)
+    for table in TABLES.values():
+        cursor.execute(
+            f"CREATE INDEX {table}_company_value ON {table} (company_id, value)"
+        )
+        cursor.execute(f"VACUUM ANALYZE {table}")
+
+
+def measure(cursor, query, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        cursor.execute(query)
+        result = cursor.fetchall()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    with connection.cursor() as cursor:
+        print(f"Loading {options.rows:,} rows...")
+        setup_tables(cursor, options.rows, options.companies)
+
+        for name, table in TABLES.items():
+            cursor.execute(
+                "SELECT pg_table_size(%s), pg_indexes_size(%s)", [table, table]
+            )
+            table_size, indexes_size = cursor.fetchone()
+            print(
+                f"{name:<6} table {table_size / 2 ** 20:.1f} MiB, "
+                f"(company_id, value) index {indexes_size / 2 ** 20:.1f} MiB"
+            )
+
+        for query_name, query in QUERIES.items():
+            timings = {}
+            results = {}
+            for name, table in TABLES.items():
+                timings[name], results[name] = measure(
+                    cursor, query.format(table=table), options.repeat
+                )
+            print(
+                f"{query_name:<15} float {timings['float'] * 1000:.0f}ms, "
+                f"cents {timings['cents'] * 1000:.0f}ms "
+                f"({timings['float'] / timings['cents']:.2f}x)"
+            )
+
+        # results of the last query, summed by company
+        float_sums = dict(results["float"])
+        cents_sums = dict(results["cents"])
+        drift = max(
+            abs(float_sum - from_cents(cents_sums[company_id]))
+            for company_id, float_sum in float_sums.items()
+        )
+        print(f"max drift of the float sums by company: {drift:.10f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compares the throughput of encoding report transactions through model
+instances and DRF serializers against the ReportEncoder fast path.
+
+The transactions of a merchant (1M by default) are generated in memory as
+the rows the database would return for each path (all the model columns
+for the serializers, only the reported ones for the encoder), and both paths
+encode them in chunks, as the streaming report does:
+
+    python -m benchmarks.report_encoding --rows 1000000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from benchmarks.bootstrap import setup_django
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from transactions.api.encoders import ReportEncoder  # noqa: E402
+from transactions.api.serializers import (  # noqa: E402
+    TransactionReportSerializer,
+)
+from transactions.models import Transaction  # noqa: E402
+from transactions.money import CENTS  # noqa: E402
+
+MODEL_FIELDS = [field.attname for field in Transaction._meta.concrete_fields]
+DESCRIPTIONS = ["Cafe e pao de queijo", "Almoço executivo", "Combustível"]
+
+
+def generate_rows(size):
+    company_id = uuid4()
+    created_at = datetime.now(timezone.utc)
+    for index in range(size):
+        values = {
+            "id": uuid4(),
+            "company_id": company_id,
+            "client": int(f"{index % 1000:03d}456789{index % 100:02d}"),
+            "value": random.randint(150 * CENTS, 5000 * CENTS),
+            "description": random.choice(DESCRIPTIONS),
+            "created_at": created_at,
+        }
+        yield tuple(values[field] for field in MODEL_FIELDS)
+
+
+def chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_with_serializers(chunk):
+    transactions = [
+        Transaction.from_db("default", MODEL_FIELDS, row) for row in chunk
+    ]
+    data = TransactionReportSerializer(transactions, many=True).data
+    return JSONRenderer().render(data)[1:-1]
+
+
+def encode_with_encoder(encoder, chunk):
+    return encoder.encode_rows(chunk)
+
+
+def measure(name, chunks, encode):
+    started_at = time.perf_counter()
+    rows = 0
+    size = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        size += len(encode(chunk))
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"{name:<12} {rows} rows in {elapsed:.2f}s "
+        f"({rows / elapsed:,.0f} rows/s, {size / 2 ** 20:.1f} MiB)"
+    )
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    options = parser.parse_args()
+
+    encoder = ReportEncoder()
+    model_chunks = list(
+        chunked(generate_rows(options.rows), options.chunk_size)
+    )
+    indexes = [MODEL_FIELDS.index(field) for field in encoder.row_fields]
+    row_chunks = [
+        [tuple(row[index] for index in indexes) for row in chunk]
+        for chunk in model_chunks
+    ]
+
+    assert encode_with_serializers(model_chunks[0]) == encode_with_encoder(
+        encoder, row_chunks[0]
+    ), "The encoders output differs"
+
+    serializers_rate = measure(
+        "serializers", model_chunks, encode_with_serializers
+    )
+    encoder_rate = measure(
+        "encoder",
+        row_chunks,
+        lambda chunk: encode_with_encoder(encoder, chunk),
+    )
+    print(f"speedup      {encoder_rate / serializers_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
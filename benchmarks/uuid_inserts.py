@@ -0,0 +1,100 @@
+"""
+Compares inserting rows keyed by random UUIDs (version 4) against time
+ordered ones (version 7, see payments.uuids): the insert throughput as the
+tables grow and the final size of their primary key indexes.
+
+The rows are generated in Python, as the ids of the models are, and
+inserted in batches (as the transactions are recorded) into two temporary
+tables of the configured database, so no project table is touched:
+
+    python -m benchmarks.uuid_inserts --rows 2000000 --batch-size 1000
+"""
+
+import argparse
+import random
+import time
+from uuid import uuid4
+
+from benchmarks.bootstrap import setup_django
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+from payments.uuids import uuid7  # noqa: E402
+from transactions.money import CENTS  # noqa: E402
+
+GENERATORS = {"uuid4": uuid4, "uuid7": uuid7}
+
+CREATE_TABLE = """
+CREATE TEMPORARY TABLE {table} (
+    id uuid PRIMARY KEY,
+    company_id uuid NOT NULL,
+    value bigint NOT NULL
+)
+"""
+
+INSERT_ROWS = "INSERT INTO {table} (id, company_id, value) VALUES %s"
+
+
+def insert_rows(cursor, table, generate_id, options):
+    companies = [uuid4() for _ in range(options.companies)]
+    inserted = 0
+    timings = []
+    while inserted < options.rows:
+        size = min(options.batch_size, options.rows - inserted)
+        rows = [
+            (
+                generate_id(),
+                random.choice(companies),
+                random.randint(150 * CENTS, 5000 * CENTS),
+            )
+            for _ in range(size)
+        ]
+
+        started_at = time.perf_counter()
+        execute_values(
+            cursor, INSERT_ROWS.format(table=table), rows, page_size=size
+        )
+        timings.append((size, time.perf_counter() - started_at))
+        inserted += size
+    return timings
+
+
+def rate(timings) -> float:
+    return sum(size for size, _ in timings) / sum(
+        elapsed for _, elapsed in timings
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--companies", type=int, default=1000)
+    options = parser.parse_args()
+
+    with connection.cursor() as cursor:
+        for name, generate_id in GENERATORS.items():
+            table = f"benchmark_{name}"
+            cursor.execute(CREATE_TABLE.format(table=table))
+
+            random.seed(0)
+            timings = insert_rows(cursor.cursor, table, generate_id, options)
+            cursor.execute("SELECT pg_indexes_size(%s)", [table])
+            (index_size,) = cursor.fetchone()
+
+            tenth = max(len(timings) // 10, 1)
+            print(
+                f"{name} {options.rows:,} rows in "
+                f"{sum(elapsed for _, elapsed in timings):.2f}s "
+                f"({rate(timings):,.0f} rows/s, "
+                f"first 10% {rate(timings[:tenth]):,.0f} rows/s, "
+                f"last 10% {rate(timings[-tenth:]):,.0f} rows/s), "
+                f"primary key index {index_size / 2 ** 20:.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
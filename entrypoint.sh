@@ -1,6 +1,14 @@
 #!/bin/sh
 /wait
 python manage.py migrate
+# the shards are named after their position in DB_SHARDS (see settings)
+index=1
+for _ in $(echo "${DB_SHARDS:-}" | tr "," " "); do
+    python manage.py migrate --database "shard$index"
+    index=$((index + 1))
+done
+python manage.py partition_transactions
+python manage.py create_transaction_partitions
 python manage.py import_companies --filepath data/companies.json
 
 exec "$@"
@@ -0,0 +1,231 @@
+"""
+Asynchronous access to the databases, for the async views (see
+transactions.api.async_views), as the ORM of this Django version only runs
+synchronously. Queries are still built with the ORM (and routed by
+payments.routers), then compiled to SQL and run through psycopg2
+connections in asynchronous mode, polled by the event loop, so neither the
+loop nor a thread is blocked while the database works.
+
+Each event loop keeps a pool of up to ASYNC_API["POOL_SIZE"] connections per
+database, opened on demand. The connections are in autocommit mode (psycopg2
+does not manage transactions on them), so each statement commits on its
+own, but for the rows streamed through a server-side cursor (see stream).
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Sequence
+
+import psycopg2
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import DataError, IntegrityError, ProgrammingError, connections
+from django.db.models import Model, QuerySet
+from django.db.models.sql import InsertQuery
+from psycopg2 import extensions
+
+# errors of a statement which leave its connection usable
+STATEMENT_ERRORS = (DataError, IntegrityError, ProgrammingError)
+
+STREAM_CURSOR = "aiodb_stream"
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _set_ready(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+async def _wait(connection):
+    """Polls an asynchronous connection until its operation completes"""
+    loop = asyncio.get_running_loop()
+    fd = connection.fileno()
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            return
+
+        ready = loop.create_future()
+        if state == extensions.POLL_READ:
+            loop.add_reader(fd, _set_ready, ready)
+            remove = loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            loop.add_writer(fd, _set_ready, ready)
+            remove = loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"Unexpected poll state {state}")
+        try:
+            await ready
+        finally:
+            remove(fd)
+
+
+class ConnectionPool:
+    """Asynchronous connections to one of the databases, for an event loop"""
+
+    def __init__(self, alias: str, size: int):
+        self.alias = alias
+        self.size = size
+        self._idle: List = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self):
+        wrapper = connections[self.alias]
+        params = wrapper.get_connection_params()
+        options = params.get("options", "")
+        params["options"] = f"{options} -c TimeZone={wrapper.timezone_name}"
+        connection = psycopg2.connect(
+            **params, client_encoding="UTF8", async_=True
+        )
+        try:
+            await _wait(connection)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Takes a connection of the pool for the block, waiting for one to be
+        released when all of them are in use
+        """
+        async with self._slots:
+            while self._idle and self._idle[-1].closed:
+                self._idle.pop()
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = await self._connect()
+
+            try:
+                yield connection
+            except STATEMENT_ERRORS:
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                # e.g. cancelled amid a statement, which would be left
+                # running on the connection, or a broken connection
+                connection.close()
+                raise
+            self._idle.append(connection)
+
+    def close(self):
+        """Closes the idle connections"""
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+def get_pool(alias: str) -> ConnectionPool:
+    """Gets the pool of the given database for the running event loop"""
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(alias)
+    if pool is None:
+        pool = pools[alias] = ConnectionPool(
+            alias, settings.ASYNC_API["POOL_SIZE"]
+        )
+    return pool
+
+
+def close_pools():
+    """
+    Closes the idle connections of the pools of every event loop, e.g. once
+    the event loops are done with them
+    """
+    for pools in list(_pools.values()):
+        for pool in pools.values():
+            pool.close()
+
+
+async def _execute(connection, sql: str, params=None) -> List[tuple]:
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        await _wait(connection)
+        return cursor.fetchall() if cursor.description else []
+
+
+async def execute(sql: str, params: Sequence, using: str) -> List[tuple]:
+    """
+    Runs a statement on the given database, returning the rows it results
+    in, if any. Errors are raised as the Django database errors.
+    """
+    async with get_pool(using).connection() as connection:
+        with connections[using].wrap_database_errors:
+            return await _execute(connection, sql, params)
+
+
+async def fetch(queryset: QuerySet) -> List[tuple]:
+    """
+    Gets the rows of a queryset of tuples (see QuerySet.values_list) from
+    its database, converted as the queryset itself would
+    """
+    using = queryset.db
+    compiler = queryset.query.get_compiler(using)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return []
+
+    rows = await execute(sql, params, using)
+    return list(compiler.results_iter([rows], tuple_expected=True))
+
+
+async def stream(
+    queryset: QuerySet, chunk_size: int
+) -> AsyncIterator[List[tuple]]:
+    """
+    Streams the rows of a queryset of tuples (see fetch) in chunks of up to
+    `chunk_size` rows, read through a server-side cursor so memory usage
+    does not grow with the number of rows. A connection of the pool is held,
+    within a read-only transaction, until the rows are consumed.
+    """
+    using = queryset.db
+    compiler = queryset.query.get_compiler(using)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return
+
+    async with get_pool(using).connection() as connection:
+        with connections[using].wrap_database_errors:
+            try:
+                await _execute(connection, "BEGIN READ ONLY")
+                await _execute(
+                    connection,
+                    f"DECLARE {STREAM_CURSOR} NO SCROLL CURSOR FOR {sql}",
+                    params,
+                )
+                while True:
+                    rows = await _execute(
+                        connection, f"FETCH {chunk_size} FROM {STREAM_CURSOR}"
+                    )
+                    if not rows:
+                        break
+                    yield list(
+                        compiler.results_iter([rows], tuple_expected=True)
+                    )
+                await _execute(connection, "COMMIT")
+            except BaseException:
+                # e.g. the rows were not consumed, so the transaction is
+                # left open, and the connection is not reused
+                connection.close()
+                raise
+
+
+async def insert(instances: Sequence[Model], using: str):
+    """
+    Inserts model instances into the given database with a single query, as
+    QuerySet.bulk_create does, without reading anything back
+    """
+    if not instances:
+        return
+
+    model = type(instances[0])
+    query = InsertQuery(model)
+    query.insert_values(model._meta.concrete_fields, instances)
+    for sql, params in query.get_compiler(using).as_sql():
+        await execute(sql, params, using)
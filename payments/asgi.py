@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from django.conf import settings
+
+from payments.handlers import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "payments.settings")
 
 application = get_asgi_application()
+
+# the apps can only be imported once the application is set up
+from companies.cache import company_cache  # noqa: E402
+
+if settings.COMPANY_CACHE["PREWARM"]:
+    company_cache.prewarm()
@@ -0,0 +1,40 @@
+from io import StringIO
+from typing import Iterable, List
+
+from django.db import models
+
+COPY_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def copy_value(value) -> str:
+    """Encodes a value in the text format of COPY"""
+    return r"\N" if value is None else str(value).translate(COPY_ESCAPES)
+
+
+def copy_instances(
+    cursor,
+    table: str,
+    fields: List[models.Field],
+    instances: Iterable[models.Model],
+):
+    """
+    Loads model instances into a table (e.g. a staging table shaped like
+    the table of the model) with COPY, which is much cheaper than an INSERT
+    for many rows. The values are prepared by the given fields as for an
+    insert, so defaults (e.g. ids) are filled in and converted.
+    """
+    connection = cursor.db
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+
+    rows = StringIO()
+    for instance in instances:
+        values = (
+            field.get_db_prep_save(field.pre_save(instance, True), connection)
+            for field in fields
+        )
+        rows.write("\t".join(map(copy_value, values)) + "\n")
+    rows.seek(0)
+
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", rows)
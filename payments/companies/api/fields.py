@@ -0,0 +1,55 @@
+from django.core.validators import MaxLengthValidator, MinLengthValidator
+from django.utils.translation import gettext_lazy as _
+
+from companies.formats import CNPJ_DIGITS, format_cnpj, normalize_cnpj
+from rest_framework import serializers
+
+
+class DocumentNumberField(serializers.CharField):
+    """
+    Document number stored as an integer (see companies.fields), accepted
+    with or without punctuation and represented with it. The length
+    limits apply to the given string, punctuation included, while the
+    number of `digits` of the document is always checked.
+    """
+
+    digits = CNPJ_DIGITS
+    default_error_messages = {
+        "digits": _("Ensure this field has {digits} digits."),
+    }
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # the built-in length validators would run on the integer
+        self.validators = [
+            validator
+            for validator in self.validators
+            if not isinstance(
+                validator, (MaxLengthValidator, MinLengthValidator)
+            )
+        ]
+
+    def normalize(self, value) -> str:
+        return normalize_cnpj(value)
+
+    def format(self, value) -> str:
+        return format_cnpj(value)
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        if self.max_length is not None and len(data) > self.max_length:
+            self.fail("max_length", max_length=self.max_length)
+        if self.min_length is not None and len(data) < self.min_length:
+            self.fail("min_length", min_length=self.min_length)
+
+        digits = self.normalize(data)
+        if len(digits) != self.digits:
+            self.fail("digits", digits=self.digits)
+        return int(digits)
+
+    def to_representation(self, value):
+        return self.format(value)
+
+
+class CNPJField(DocumentNumberField):
+    pass
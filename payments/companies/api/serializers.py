@@ -1,10 +1,11 @@
+from companies.api.fields import CNPJField
 from companies.models import Company
 from rest_framework import serializers
 
 
 class CompanyReportSerializer(serializers.ModelSerializer):
     nome = serializers.CharField(source="name")
-    cnpj = serializers.CharField()
+    cnpj = CNPJField()
     dono = serializers.CharField(source="owner")
     telefone = serializers.SerializerMethodField("get_telephone")
 
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from companies.formats import CNPJ_DIGITS, normalize_cnpj
+from companies.models import Company
+from companies.shards import get_shards, shard_directory
+from payments.routers import use_shard
+
+logger = logging.getLogger(__name__)
+
+CACHED_FIELDS = ["id", "name", "cnpj", "owner", "ddd", "phone"]
+
+
+class CachedCompany(NamedTuple):
+    id: UUID
+    name: str
+    cnpj: int
+    owner: str
+    ddd: int
+    phone: int
+    shard: str
+
+    @property
+    def full_phone(self):
+        return int(f"{self.ddd}{self.phone}")
+
+
+class CompanyCache:
+    """
+    Bounded in-process LRU cache mapping normalized CNPJs to the header
+    fields of their companies, along with the shard holding them (see
+    companies.shards). Unknown CNPJs are cached as well (negative entries)
+    with a shorter time to live.
+
+    Entries are invalidated by the Company signals and by the companies
+    import, which only reach the current process, so other processes rely on
+    the time to live for picking up changes.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[CachedCompany]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+
+            expires_at, company = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+
+            self._entries.move_to_end(key)
+            return True, company
+
+    def _store(self, key: str, company: Optional[CachedCompany]):
+        ttl = self.ttl if company is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, company)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _fetch(self, keys: Iterable[str]) -> Dict[str, CachedCompany]:
+        cnpjs = [int(key) for key in keys if len(key) == CNPJ_DIGITS]
+        fetched = {}
+        for shard, shard_cnpjs in shard_directory.group(cnpjs).items():
+            with use_shard(shard):
+                rows = Company.objects.filter(cnpj__in=shard_cnpjs)
+                for row in rows.values_list(*CACHED_FIELDS):
+                    company = CachedCompany(*row, shard)
+                    fetched[normalize_cnpj(company.cnpj)] = company
+        return fetched
+
+    def get(self, cnpj: str) -> Optional[CachedCompany]:
+        """
+        Gets the company with the given CNPJ, querying the database only when
+        the CNPJ is not cached yet. Returns None for unknown CNPJs.
+        """
+        return self.get_many([cnpj])[cnpj]
+
+    def get_many(
+        self, cnpjs: Iterable[str]
+    ) -> Dict[str, Optional[CachedCompany]]:
+        """
+        Gets the companies with the given CNPJs, querying the database once
+        for all the CNPJs which are not cached yet. Returns a mapping of each
+        given CNPJ to its company, or None for unknown CNPJs.
+        """
+        keys = {cnpj: normalize_cnpj(cnpj) for cnpj in cnpjs}
+
+        found = {}
+        missing = set()
+        for key in set(keys.values()):
+            cached, company = self._lookup(key)
+            if cached:
+                found[key] = company
+            else:
+                missing.add(key)
+
+        if missing:
+            fetched = self._fetch(missing)
+            for key in missing:
+                found[key] = fetched.get(key)
+                self._store(key, found[key])
+
+        return {cnpj: found[key] for cnpj, key in keys.items()}
+
+    def refresh_many(
+        self, cnpjs: Iterable[str]
+    ) -> Dict[str, Optional[CachedCompany]]:
+        """
+        Gets the companies with the given CNPJs as get_many does, but always
+        from the database, along with their shards, for callers which found
+        their cached entries to be stale (e.g. after a company was moved)
+        """
+        cnpjs = list(cnpjs)
+        self.invalidate_many(cnpjs)
+        return self.get_many(cnpjs)
+
+    def get_cached(self, cnpj: str) -> Tuple[bool, Optional[CachedCompany]]:
+        """
+        Looks the company with the given CNPJ up in the cache only, never
+        querying the database, returning whether the CNPJ is cached along
+        with its company (None for unknown CNPJs)
+        """
+        return self._lookup(normalize_cnpj(cnpj))
+
+    def invalidate(self, cnpj: str, company_id: Optional[UUID] = None):
+        """
+        Removes the entry of the given CNPJ and, when a company id is given,
+        any other entry pointing to that company (e.g. its former CNPJ)
+        """
+        with self._lock:
+            self._entries.pop(normalize_cnpj(cnpj), None)
+            if company_id is not None:
+                stale_keys = [
+                    key
+                    for key, (_, company) in self._entries.items()
+                    if company is not None and company.id == company_id
+                ]
+                for key in stale_keys:
+                    del self._entries[key]
+
+    def invalidate_many(self, cnpjs: Iterable[str]):
+        """Removes the entries of the given CNPJs"""
+        with self._lock:
+            for cnpj in cnpjs:
+                self._entries.pop(normalize_cnpj(cnpj), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def prewarm(self):
+        """
+        Loads companies into the cache up to its maximum size, which is meant
+        to be done when a worker process boots
+        """
+        try:
+            for shard in get_shards():
+                remaining = self.max_size - len(self)
+                if remaining <= 0:
+                    break
+                with use_shard(shard):
+                    rows = Company.objects.values_list(*CACHED_FIELDS)
+                    for row in rows[:remaining]:
+                        company = CachedCompany(*row, shard)
+                        self._store(normalize_cnpj(company.cnpj), company)
+        except DatabaseError as exc:
+            logger.warning(f"Could not prewarm the company cache. Got {exc}")
+
+
+company_cache = CompanyCache(
+    max_size=settings.COMPANY_CACHE["MAX_SIZE"],
+    ttl=settings.COMPANY_CACHE["TTL"],
+    negative_ttl=settings.COMPANY_CACHE["NEGATIVE_TTL"],
+)
@@ -0,0 +1,73 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from companies.formats import NON_DIGITS
+
+
+class DocumentNumberField(models.BigIntegerField):
+    """
+    Stores a document number, such as a CNPJ or a CPF, as the integer of
+    its digits, which is smaller and cheaper to compare and index than the
+    punctuated string. Strings are accepted with or without punctuation
+    wherever the field takes a value (e.g. instances and lookups), while
+    rendering the punctuation back is left to the serializers.
+
+    As the leading zeros are not kept, the number of `digits` of the
+    document is checked before the conversion, so a number with a digit too
+    many is not taken for another document.
+    """
+
+    default_error_messages = {
+        "digits": _(
+            "Ensure this value has %(digits)s digits (it has %(length)s)."
+        ),
+    }
+
+    def __init__(self, *args, digits: int, **kwargs):
+        self.digits = digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["digits"] = self.digits
+        return name, path, args, kwargs
+
+    def _strip(self, value):
+        if isinstance(value, str):
+            return NON_DIGITS.sub("", value) or value
+        return value
+
+    def _check_digits(self, value):
+        if isinstance(value, str) and value.isdigit():
+            length = len(value)
+        elif isinstance(value, int):
+            # only an upper bound, as the leading zeros are implicit
+            length = len(str(abs(value)))
+            if length < self.digits:
+                return
+        else:
+            return
+
+        if length != self.digits:
+            raise ValidationError(
+                self.error_messages["digits"],
+                code="digits",
+                params={"digits": self.digits, "length": length},
+            )
+
+    def to_python(self, value):
+        stripped = self._strip(value)
+        self._check_digits(stripped)
+        try:
+            return super().to_python(stripped)
+        except ValidationError:
+            # reports the given value instead of the stripped one
+            raise ValidationError(
+                self.error_messages["invalid"],
+                code="invalid",
+                params={"value": value},
+            )
+
+    def get_prep_value(self, value):
+        return super().get_prep_value(self._strip(value))
@@ -0,0 +1,32 @@
+import re
+from typing import Union
+
+CNPJ_DIGITS = 14
+NON_DIGITS = re.compile(r"\D")
+
+DocumentNumber = Union[int, str]
+
+
+def normalize_digits(number: DocumentNumber, size: int) -> str:
+    """
+    Gets the digits of a document number (e.g. a CNPJ), given either as a
+    string, with or without punctuation, or as the integer it is stored as
+    (padding it back to the given size)
+    """
+    if isinstance(number, int):
+        return f"{number:0{size}d}"
+    return NON_DIGITS.sub("", str(number))
+
+
+def normalize_cnpj(cnpj: DocumentNumber) -> str:
+    """Strips any punctuation from a CNPJ, keeping only its digits"""
+    return normalize_digits(cnpj, CNPJ_DIGITS)
+
+
+def format_cnpj(cnpj: DocumentNumber) -> str:
+    """Formats a CNPJ with its punctuation, as it is rendered"""
+    digits = normalize_cnpj(cnpj)
+    return (
+        f"{digits[:2]}.{digits[2:5]}.{digits[5:8]}/"
+        f"{digits[8:12]}-{digits[12:]}"
+    )
@@ -1,10 +1,25 @@
-import json
+import glob
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from enum import Enum
+from typing import Callable, List, NamedTuple, Optional
 
+import django
 from django.core.management.base import BaseCommand
+from django.db import connections
 
-from companies.utils import CompaniesData, import_companies
+from companies.streaming import iter_json_records
+from companies.utils import (
+    COPY_BATCH_SIZE,
+    ImportSummary,
+    copy_companies,
+)
+from companies.validation import RejectFile
+
+STREAMED_EXTENSIONS = (".ndjson", ".jsonl")
+JSON_EXTENSIONS = (".json",) + STREAMED_EXTENSIONS
+REJECTS_SUFFIX = ".rejects.ndjson"
 
 
 class MessageType(Enum):
@@ -12,68 +27,305 @@ class MessageType(Enum):
     ERROR = "error"
 
 
+class FileResult(NamedTuple):
+    """Outcome of the import of one of several files"""
+
+    filepath: str
+    elapsed: float
+    summary: Optional[ImportSummary] = None
+    error: Optional[str] = None
+
+
+def list_filepaths(filepath: str) -> List[str]:
+    """
+    Lists the JSON files of a directory, or the ones matched by a glob
+    pattern, leaving out the rejects files written by former imports
+    """
+    if os.path.isdir(filepath):
+        candidates = [
+            os.path.join(filepath, name) for name in os.listdir(filepath)
+        ]
+    else:
+        candidates = glob.glob(filepath)
+    return sorted(
+        path
+        for path in candidates
+        if os.path.isfile(path)
+        and path.endswith(JSON_EXTENSIONS)
+        and not path.endswith(REJECTS_SUFFIX)
+    )
+
+
+def stream_file(
+    filepath: str,
+    batch_size: int,
+    workers: int,
+    rejects: str,
+    upsert: bool = False,
+    progress: Optional[Callable[[ImportSummary], None]] = None,
+) -> ImportSummary:
+    """Streams a file into the database, writing its rejects to `rejects`"""
+    json_file = open(filepath, "r", encoding="utf-8")
+    with json_file, RejectFile(rejects) as reject_file:
+        return copy_companies(
+            iter_json_records(json_file),
+            batch_size,
+            progress=progress,
+            reject=reject_file,
+            workers=workers,
+            upsert=upsert,
+        )
+
+
+def import_file(filepath: str, batch_size: int, upsert: bool) -> FileResult:
+    """
+    Streams one of several files into the database, validating it in the
+    calling process, which is a worker of the pool importing the files
+    """
+    started_at = time.monotonic()
+    try:
+        summary = stream_file(
+            filepath, batch_size, 1, f"{filepath}{REJECTS_SUFFIX}", upsert
+        )
+    except Exception as exc:
+        return FileResult(
+            filepath, time.monotonic() - started_at, error=str(exc)
+        )
+    return FileResult(filepath, time.monotonic() - started_at, summary)
+
+
 class Command(BaseCommand):
     help = "Imports companies data from json file into the database"
 
     def add_arguments(self, parser):
         parser.add_argument(
-            "--filepath", type=str, help="Path to the source json file"
+            "--filepath",
+            type=str,
+            help=(
+                "Path to the source json file, or to a directory or glob "
+                "pattern (quoted) of json files, which are streamed "
+                "concurrently"
+            ),
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help=(
+                "Kept for compatibility, as the files, JSON arrays or JSON "
+                "lines, are always streamed into the database in batches"
+            ),
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help=(
+                "Updates the companies already imported whose data changed, "
+                "instead of leaving them out"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=COPY_BATCH_SIZE,
+            help="Number of companies copied in each batch",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                "Number of processes validating the companies when importing "
+                "a single file"
+            ),
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                "Number of files streamed concurrently, each by a process "
+                "with its own database connections, when importing a "
+                "directory or glob pattern"
+            ),
+        )
+        parser.add_argument(
+            "--rejects",
+            type=str,
+            help=(
+                "Path to the JSON lines file the invalid and duplicate "
+                "companies are written to, along with the reasons, when "
+                "importing a single file (<filepath>.rejects.ndjson by "
+                "default, which is always the case for several files)"
+            ),
         )
 
     def _write_message(
-        self, message: str, message_type: MessageType = MessageType.SUCCESS,
+        self,
+        message: str,
+        message_type: MessageType = MessageType.SUCCESS,
     ):
         if message_type == MessageType.SUCCESS:
             self.stdout.write(self.style.SUCCESS(message))
         elif message_type == MessageType.ERROR:
             self.stdout.write(self.style.ERROR(message))
 
-    def _collect_data(self, filepath: str) -> CompaniesData:
-        data = []
-        try:
-            with open(filepath, "r", encoding="utf-8") as json_file:
-                data = json.load(json_file)
-        except Exception as exc:
+    def _report_summary(
+        self,
+        filepath: str,
+        summary: ImportSummary,
+        elapsed: float,
+        rejects: str,
+        upsert: bool = False,
+    ):
+        self._write_message(
+            f"Successfully imported companies data from {filepath} in "
+            f"{elapsed:.2f}s: {self._summary_counts(summary, upsert)}",
+            MessageType.SUCCESS,
+        )
+        if summary.duplicates or summary.rejected:
             self._write_message(
-                f"Error trying to read {filepath}. Got {str(exc)}",
+                f"Duplicate and rejected companies written to {rejects}",
                 MessageType.ERROR,
             )
 
-        return data
+    @staticmethod
+    def _summary_counts(summary: ImportSummary, upsert: bool) -> str:
+        counts = [f"{summary.inserted} inserted"]
+        if upsert:
+            counts += [
+                f"{summary.updated} updated",
+                f"{summary.unchanged} unchanged",
+            ]
+        counts += [
+            f"{summary.duplicates} duplicates",
+            f"{summary.rejected} rejected",
+        ]
+        if upsert:
+            touched = summary.inserted + summary.updated
+            counts[-1] += f" ({touched} rows touched)"
+        return ", ".join(counts)
 
-    def _perform_insertion(self, data: CompaniesData, filepath: str):
-        error_msg = f"Error trying to import companies data from {filepath}."
-        success_message = (
-            f"Successfully imported companies data from {filepath}"
-        )
+    def _stream_insertion(
+        self,
+        filepath: str,
+        batch_size: int,
+        workers: int,
+        rejects: str,
+        upsert: bool = False,
+    ):
+        started_at = time.monotonic()
+
+        def report(summary: ImportSummary):
+            rate = summary.read / max(time.monotonic() - started_at, 1e-6)
+            self.stdout.write(
+                f"Imported {summary.inserted + summary.updated} of "
+                f"{summary.read} companies read ({rate:.0f} rows/s)"
+            )
 
         try:
-            import_companies(data)
+            summary = stream_file(
+                filepath, batch_size, workers, rejects, upsert, report
+            )
         except Exception as exc:
             self._write_message(
-                f"{error_msg} Got {str(exc)}", MessageType.ERROR
+                f"Error trying to import companies data from {filepath}. "
+                f"Got {str(exc)}",
+                MessageType.ERROR,
             )
-        else:
-            self._write_message(success_message, MessageType.SUCCESS)
+            return
 
-    def handle(self, *args, **options):
-        filepath = options.get("filepath", "")
+        self._report_summary(
+            filepath, summary, time.monotonic() - started_at, rejects, upsert
+        )
 
-        path_exists = os.path.exists(filepath)
-        is_file = os.path.isfile(filepath)
-        is_json = filepath.endswith(".json")
+    def _parallel_insertion(
+        self,
+        filepaths: List[str],
+        batch_size: int,
+        jobs: int,
+        upsert: bool = False,
+    ):
+        started_at = time.monotonic()
+        results = []
 
-        if path_exists and is_file and is_json:
-            data = self._collect_data(filepath)
+        def report(result: FileResult):
+            results.append(result)
+            if result.error is None:
+                self._report_summary(
+                    result.filepath,
+                    result.summary,
+                    result.elapsed,
+                    f"{result.filepath}{REJECTS_SUFFIX}",
+                    upsert,
+                )
+            else:
+                self._write_message(
+                    f"Error trying to import companies data from "
+                    f"{result.filepath}. Got {result.error}",
+                    MessageType.ERROR,
+                )
+
+        if jobs == 1:
+            for filepath in filepaths:
+                report(import_file(filepath, batch_size, upsert))
+        else:
+            # the workers are forked, so the connections of the command are
+            # closed for each worker to open its own instead of sharing them
+            connections.close_all()
+            with ProcessPoolExecutor(
+                jobs, initializer=django.setup
+            ) as executor:
+                futures = [
+                    executor.submit(import_file, filepath, batch_size, upsert)
+                    for filepath in filepaths
+                ]
+                for future in as_completed(futures):
+                    report(future.result())
 
-            if data:
-                self._perform_insertion(data, filepath)
+        summaries = [r.summary for r in results if r.error is None]
+        summary = ImportSummary(*map(sum, zip(ImportSummary(), *summaries)))
+        elapsed = time.monotonic() - started_at
+        rate = summary.read / max(elapsed, 1e-6)
+        self._write_message(
+            f"Imported {len(summaries)} of {len(filepaths)} files in "
+            f"{elapsed:.2f}s ({rate:.0f} rows/s): "
+            f"{self._summary_counts(summary, upsert)}",
+            MessageType.SUCCESS if summaries else MessageType.ERROR,
+        )
+
+    def handle(self, *args, **options):
+        filepath = options.get("filepath") or ""
+        if os.path.isdir(filepath) or glob.escape(filepath) != filepath:
+            filepaths = list_filepaths(filepath)
+            if filepaths:
+                self._parallel_insertion(
+                    filepaths,
+                    max(options["batch_size"], 1),
+                    min(max(options["jobs"] or 1, 1), len(filepaths)),
+                    options["upsert"],
+                )
             else:
                 self._write_message(
-                    f"Could not collect data from {filepath} properly or the "
-                    f"file is empty",
+                    f"Provided filepath {filepath} does not match any json "
+                    f"file",
                     MessageType.ERROR,
                 )
+            return
+
+        path_exists = os.path.exists(filepath)
+        is_file = os.path.isfile(filepath)
+        is_json = filepath.endswith(JSON_EXTENSIONS)
+
+        if path_exists and is_file and is_json:
+            # every file is validated, and its rejects written, as it is
+            # streamed into the database
+            self._stream_insertion(
+                filepath,
+                max(options["batch_size"], 1),
+                max(options["workers"] or 1, 1),
+                options["rejects"] or f"{filepath}{REJECTS_SUFFIX}",
+                options["upsert"],
+            )
         else:
             self._write_message(
                 f"Provided filepath {filepath} does not exist or is not a file",
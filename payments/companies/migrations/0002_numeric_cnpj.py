@@ -0,0 +1,38 @@
+# Generated by Django 3.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+import companies.fields
+import companies.validators
+
+STRIP_CNPJ_PUNCTUATION = """
+UPDATE companies_company SET cnpj = regexp_replace(cnpj, '\\D', '', 'g')
+"""
+
+ADD_CNPJ_PUNCTUATION = """
+UPDATE companies_company SET cnpj = regexp_replace(
+    lpad(cnpj, 14, '0'),
+    '^(\\d{2})(\\d{3})(\\d{3})(\\d{4})(\\d{2})$',
+    '\\1.\\2.\\3/\\4-\\5'
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(STRIP_CNPJ_PUNCTUATION, ADD_CNPJ_PUNCTUATION),
+        migrations.AlterField(
+            model_name="company",
+            name="cnpj",
+            field=companies.fields.DocumentNumberField(
+                digits=14,
+                unique=True,
+                validators=[companies.validators.cnpj_validator],
+            ),
+        ),
+    ]
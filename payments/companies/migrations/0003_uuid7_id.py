@@ -0,0 +1,25 @@
+# Generated by Django 3.1 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+import payments.uuids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0002_numeric_cnpj"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="company",
+            name="id",
+            field=models.UUIDField(
+                default=payments.uuids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
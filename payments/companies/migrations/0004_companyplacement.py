@@ -0,0 +1,27 @@
+# Generated by Django 3.1 on 2026-10-18 20:30
+
+import companies.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0003_uuid7_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompanyPlacement",
+            fields=[
+                (
+                    "cnpj",
+                    companies.fields.DocumentNumberField(
+                        digits=14, primary_key=True, serialize=False
+                    ),
+                ),
+                ("shard", models.CharField(max_length=100)),
+                ("moved_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,14 +1,12 @@
-from uuid import uuid4
-
-from django.core.validators import (
-    MaxValueValidator,
-    MinLengthValidator,
-    MinValueValidator,
-)
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils.functional import cached_property
 
+from companies.fields import DocumentNumberField
+from companies.formats import CNPJ_DIGITS, format_cnpj
 from companies.validators import IntegerLengthValidator, cnpj_validator
+from payments.routers import use_primary
+from payments.uuids import uuid7
 
 CNPJ_SIZE = 18
 DDD_LOWER_LIMIT = 11
@@ -16,16 +14,17 @@ DDD_UPPER_LIMIT = 99
 NAME_SIZE = 255
 OWNER_SIZE = 40
 PHONE_SIZE = 9
+SHARD_SIZE = 100
 
 
 class Company(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=NAME_SIZE, blank=False, null=False)
-    cnpj = models.CharField(
-        max_length=CNPJ_SIZE,
+    cnpj = DocumentNumberField(
+        digits=CNPJ_DIGITS,
         blank=False,
         null=False,
-        validators=[MinLengthValidator(CNPJ_SIZE), cnpj_validator],
+        validators=[cnpj_validator],
         unique=True,
     )
     owner = models.CharField(max_length=OWNER_SIZE, blank=False, null=False)
@@ -46,8 +45,25 @@ class Company(models.Model):
         return int(f"{self.ddd}{self.phone}")
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # validated against the primary, which the instance is written to
+        with use_primary():
+            self.full_clean()
         return super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.name} ({self.cnpj})"
+        return f"{self.name} ({format_cnpj(self.cnpj)})"
+
+
+class CompanyPlacement(models.Model):
+    """
+    Shard holding a company moved away from the shard picked by the hash of
+    its CNPJ (see companies.shards). Placements are stored in the default
+    database only.
+    """
+
+    cnpj = DocumentNumberField(digits=CNPJ_DIGITS, primary_key=True)
+    shard = models.CharField(max_length=SHARD_SIZE)
+    moved_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{format_cnpj(self.cnpj)} -> {self.shard}"
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple, TypeVar
+from zlib import crc32
+
+from django.conf import settings
+
+from companies.formats import DocumentNumber, normalize_cnpj
+from companies.models import CompanyPlacement
+from payments.routers import PRIMARY
+
+Item = TypeVar("Item")
+
+
+def get_shards() -> List[str]:
+    return settings.DATABASE_SHARDING["SHARDS"]
+
+
+# number of virtual buckets the CNPJs are hashed into, the buckets being the
+# ones assigned to the shards, so it must never change
+BUCKETS = 4096
+
+
+def bucket_of(cnpj: DocumentNumber) -> int:
+    """
+    Gets the bucket of a CNPJ, picked by its hash, which is stable across
+    processes (unlike the builtin hash) and formats of the CNPJ
+    """
+    return crc32(normalize_cnpj(cnpj).encode()) % BUCKETS
+
+
+@lru_cache(maxsize=8)
+def _assign_buckets(shards: Tuple[str, ...]) -> Tuple[str, ...]:
+    # each bucket goes to the shard scoring the highest hash along with it
+    # (rendezvous hashing), so a shard added only takes the buckets it wins
+    # from the others, about 1/N of them, and a shard removed only gives
+    # away its own
+    return tuple(
+        max(shards, key=lambda shard: crc32(f"{shard}:{bucket}".encode()))
+        for bucket in range(BUCKETS)
+    )
+
+
+def hash_shard(cnpj: DocumentNumber, shards: List[str]) -> str:
+    """
+    Gets the shard the bucket of a CNPJ is assigned to. Adding a shard only
+    reassigns about 1/N of the buckets, all of them to the new shard, so
+    only the companies of those buckets need to be pinned or moved.
+    """
+    return _assign_buckets(tuple(shards))[bucket_of(cnpj)]
+
+
+class ShardDirectory:
+    """
+    Maps companies, by CNPJ, to the shard holding them along with their
+    transactions, summaries and rollups: the shard picked by the hash of the
+    CNPJ, unless the company was moved to another shard (see
+    transactions.rebalancing), as recorded by its CompanyPlacement.
+
+    The placements of the given CNPJs only are looked up, with a single
+    query for a group of them, rather than loading them all, as the shards
+    are cached along with the companies (see companies.cache), so other
+    processes pick up a move within the time to live of their cache.
+    Nothing is queried when there is a single shard.
+    """
+
+    def _get_placements(self, cnpjs: Set[int]) -> Dict[int, str]:
+        rows = (
+            CompanyPlacement.objects.using(PRIMARY)
+            .filter(cnpj__in=cnpjs)
+            .values_list("cnpj", "shard")
+        )
+        return dict(rows.iterator())
+
+    def get(self, cnpj: DocumentNumber) -> str:
+        """Gets the shard of the company with the given CNPJ"""
+        (shard,) = self.group([cnpj])
+        return shard
+
+    def group(
+        self, items: Iterable[Item], cnpj_of=lambda item: item
+    ) -> Dict[str, List[Item]]:
+        """
+        Groups the given items (CNPJs by default) by the shard of the
+        company they belong to, whose CNPJ is got through `cnpj_of`
+        """
+        items = list(items)
+        shards = get_shards()
+        if len(shards) == 1:
+            return {shards[0]: items} if items else {}
+
+        cnpjs = [int(normalize_cnpj(cnpj_of(item))) for item in items]
+        placements = self._get_placements(set(cnpjs)) if items else {}
+        grouped = defaultdict(list)
+        for item, cnpj in zip(items, cnpjs):
+            shard = placements.get(cnpj)
+            if shard not in shards:
+                shard = hash_shard(cnpj, shards)
+            grouped[shard].append(item)
+        return dict(grouped)
+
+
+shard_directory = ShardDirectory()
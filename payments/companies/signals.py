@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from companies.cache import company_cache
+from companies.models import Company
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_cached_company(sender, instance, **kwargs):
+    company_cache.invalidate(instance.cnpj, company_id=instance.id)
@@ -0,0 +1,107 @@
+import csv
+import json
+import re
+from typing import IO, Any, Dict, Iterator
+
+READ_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 16 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+# what is left of a literal, or of a number, cut short by the end of a chunk
+# once the decoder stops at it
+_truncated_token = re.compile(
+    r"(?:-|\.|[eE][+-]?|t(?:ru?)?|f(?:a(?:ls?)?)?|n(?:ul?)?)\Z"
+)
+
+
+def _is_truncated(buffer: str, error: json.JSONDecodeError) -> bool:
+    """
+    Tells whether a record failed to be decoded for being cut short by the
+    end of the buffer, so it may be decoded once more is read, rather than
+    for being malformed
+    """
+    tail = buffer[error.pos :]
+    return (
+        not tail
+        or error.msg.startswith("Unterminated string")
+        or (error.msg.startswith("Invalid \\uXXXX") and len(tail) < 6)
+        or _truncated_token.match(tail) is not None
+    )
+
+
+def iter_json_records(
+    file: IO[str],
+    read_size: int = READ_SIZE,
+    max_record_size: int = MAX_RECORD_SIZE,
+) -> Iterator[Any]:
+    """
+    Parses the records of a JSON array, or of JSON lines (NDJSON), as the
+    file is read, so only the chunk being parsed is kept in memory instead
+    of the whole file. A record split across chunks is parsed once the
+    chunks holding it are read, reading larger chunks for larger records,
+    up to `max_record_size` characters. A malformed record fails as soon
+    as it is read.
+    """
+    buffer, position, eof = "", 0, False
+    in_array = None
+    closed = expect_separator = False
+
+    while True:
+        position = _whitespace.match(buffer, position).end()
+        if position == len(buffer) and not eof:
+            buffer, position = file.read(read_size), 0
+            eof = not buffer
+            continue
+        if position == len(buffer):
+            break
+
+        char = buffer[position]
+        if closed:
+            raise ValueError(f"Extra data after the array: {char!r}")
+        if in_array is None:
+            in_array = char == "["
+            position += in_array
+            continue
+        if in_array and char == "]":
+            closed = True
+            position += 1
+            continue
+        if in_array and expect_separator:
+            if char != ",":
+                raise ValueError(f"Expecting ',' delimiter: got {char!r}")
+            expect_separator = False
+            position += 1
+            continue
+
+        try:
+            record, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            if eof or not _is_truncated(buffer, exc):
+                raise
+            end = None
+
+        # a record ending the chunk (e.g. a number) may go on in the next
+        if end is None or (end == len(buffer) and not eof):
+            if len(buffer) - position >= max_record_size:
+                raise ValueError("Record too large")
+            chunk = file.read(max(read_size, len(buffer) - position))
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        position = end
+        expect_separator = in_array
+        yield record
+
+    if in_array and not closed:
+        raise ValueError("Unterminated array")
+
+
+def iter_csv_records(file: IO[str]) -> Iterator[Dict[str, str]]:
+    """
+    Parses the records of a CSV file with a header row as the file is read,
+    leaving out the empty values, as if missing from a JSON record
+    """
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value != ""}
@@ -6,9 +6,11 @@ from companies.models import (
     PHONE_SIZE,
     Company,
 )
+from companies.shards import shard_directory
 from factory import Faker
 from factory.django import DjangoModelFactory
 from factory.fuzzy import FuzzyAttribute, FuzzyInteger
+from payments.routers import use_shard
 from pycpfcnpj.gen import cnpj_with_punctuation
 
 COMPANY_TYPES = ["LTDA", "Indústria e Comércio", "Consultoria", "Serviços"]
@@ -35,3 +37,11 @@ class CompanyFactory(DjangoModelFactory):
 
     class Meta:
         model = Company
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        # created in the shard of the company (see companies.shards)
+        shard = shard_directory.get(kwargs["cnpj"])
+        with use_shard(shard):
+            manager = cls._get_manager(model_class).using(shard)
+            return manager.create(*args, **kwargs)
@@ -0,0 +1,199 @@
+from unittest.mock import patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+
+from companies.cache import CachedCompany, CompanyCache, company_cache
+from companies.formats import normalize_cnpj
+from companies.models import Company
+from companies.tests.factories import CompanyFactory
+from companies.utils import copy_companies
+
+
+def cached_from(company: Company) -> CachedCompany:
+    return CachedCompany(
+        company.id,
+        company.name,
+        company.cnpj,
+        company.owner,
+        company.ddd,
+        company.phone,
+        company._state.db,
+    )
+
+
+class TestCompanyCache(TestCase):
+    def setUp(self):
+        self.cache = CompanyCache(max_size=10, ttl=60, negative_ttl=60)
+
+    def test_get(self):
+        """
+        Should query the database only on the first lookup of a company,
+        serving the following lookups from the cache
+        """
+        company = CompanyFactory()
+
+        with self.assertNumQueries(1):
+            cached_company = self.cache.get(company.cnpj)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get(company.cnpj), cached_company)
+
+        self.assertEqual(cached_company, cached_from(company))
+        self.assertEqual(cached_company.full_phone, company.full_phone)
+
+    def test_get_normalizes_cnpj(self):
+        """
+        Should find a company regardless of the punctuation of the given
+        CNPJ, sharing the same cache entry
+        """
+        company = CompanyFactory()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.cache.get(normalize_cnpj(company.cnpj)),
+                cached_from(company),
+            )
+            self.assertEqual(
+                self.cache.get(company.cnpj), cached_from(company)
+            )
+        self.assertEqual(len(self.cache), 1)
+
+    def test_get_unknown_company(self):
+        """
+        Should cache unknown CNPJs as negative entries, not querying the
+        database again for them
+        """
+        cnpj = CompanyFactory.build().cnpj
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.cache.get(cnpj))
+            self.assertIsNone(self.cache.get(cnpj))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.cache.get("invalid"))
+
+    def test_get_many(self):
+        """
+        Should resolve many CNPJs with a single query, mapping each given
+        CNPJ to its company or to None when it is unknown
+        """
+        companies = CompanyFactory.create_batch(2)
+        unknown_cnpj = CompanyFactory.build().cnpj
+        cnpjs = [company.cnpj for company in companies] + [unknown_cnpj]
+
+        with self.assertNumQueries(1):
+            result = self.cache.get_many(cnpjs)
+
+        expected = {
+            company.cnpj: cached_from(company) for company in companies
+        }
+        expected[unknown_cnpj] = None
+        self.assertEqual(result, expected)
+
+    def test_entries_expire(self):
+        """Should query the database again once an entry has expired"""
+        company = CompanyFactory()
+        cache = CompanyCache(max_size=10, ttl=0, negative_ttl=0)
+
+        with self.assertNumQueries(2):
+            cache.get(company.cnpj)
+            cache.get(company.cnpj)
+
+    def test_size_is_bounded(self):
+        """Should evict the least recently used entries when full"""
+        cache = CompanyCache(max_size=2, ttl=60, negative_ttl=60)
+        companies = CompanyFactory.create_batch(3)
+
+        for company in companies:
+            cache.get(company.cnpj)
+
+        self.assertEqual(len(cache), 2)
+        with self.assertNumQueries(1):
+            cache.get(companies[0].cnpj)
+
+    def test_invalidate(self):
+        """
+        Should remove the entry of a CNPJ and any other entry pointing to the
+        given company
+        """
+        company = CompanyFactory()
+        former_cnpj = company.cnpj
+        self.cache.get(former_cnpj)
+
+        company.cnpj = CompanyFactory.build().cnpj
+        self.cache.get(company.cnpj)
+        self.cache.invalidate(company.cnpj, company_id=company.id)
+
+        self.assertEqual(len(self.cache), 0)
+
+    def test_prewarm(self):
+        """Should load the companies into the cache"""
+        companies = CompanyFactory.create_batch(2)
+        self.cache.prewarm()
+
+        self.assertEqual(len(self.cache), 2)
+        with self.assertNumQueries(0):
+            for company in companies:
+                self.assertEqual(
+                    self.cache.get(company.cnpj), cached_from(company)
+                )
+
+    def test_prewarm_database_error(self):
+        """Should not fail when the database is not available"""
+        with patch(
+            "companies.cache.Company.objects.values_list",
+            side_effect=DatabaseError("Simulated error message"),
+        ):
+            with self.assertLogs("companies.cache", level="WARNING"):
+                self.cache.prewarm()
+
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestCompanyCacheInvalidation(TestCase):
+    def setUp(self):
+        company_cache.clear()
+
+    def test_invalidation_on_save(self):
+        """Should drop a negative entry once the company is created"""
+        company = CompanyFactory.build()
+        self.assertIsNone(company_cache.get(company.cnpj))
+
+        company.save()
+        self.assertEqual(company_cache.get(company.cnpj), cached_from(company))
+
+    def test_invalidation_on_update(self):
+        """Should drop the cached company once it is updated"""
+        company = CompanyFactory()
+        company_cache.get(company.cnpj)
+
+        company.name = "Updated Name"
+        company.save()
+        self.assertEqual(company_cache.get(company.cnpj).name, company.name)
+
+    def test_invalidation_on_delete(self):
+        """Should drop the cached company once it is deleted"""
+        company = CompanyFactory()
+        cnpj = company.cnpj
+        company_cache.get(cnpj)
+
+        company.delete()
+        self.assertIsNone(company_cache.get(cnpj))
+
+    def test_invalidation_on_import(self):
+        """Should drop negative entries of imported companies"""
+        company = CompanyFactory.build()
+        self.assertIsNone(company_cache.get(company.cnpj))
+
+        copy_companies(
+            [
+                {
+                    "name": company.name,
+                    "cnpj": company.cnpj,
+                    "owner": company.owner,
+                    "ddd": company.ddd,
+                    "phone": company.phone,
+                }
+            ]
+        )
+        self.assertIsNotNone(company_cache.get(company.cnpj))
@@ -1,10 +1,11 @@
 import json
 import os
 from io import StringIO
+from tempfile import TemporaryDirectory
 from unittest.mock import patch
 
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 from companies.management.commands.import_companies import Command, MessageType
 from companies.models import Company
@@ -35,139 +36,320 @@ class TestImportCompaniesCommand(TestCase):
         self.assertIn(success_message, output.getvalue())
         self.assertIn(error_message, output.getvalue())
 
-    def test_successful_collect_data(self):
-        """
-        Should be able to read the input file data into list
-        """
-        command = Command()
-        data = command._collect_data(DATA_FILE)
-        self.assertIsInstance(data, list)
-        with open(DATA_FILE, "r") as json_file:
-            self.assertEqual(data, json.load(json_file))
-
-    def test_failing_collect_data(self):
+    def test_successful_command(self):
         """
-        Should properly write to stdout when failing to collect data from file
+        Should successfully insert the companies data into the database when
+        running the command
         """
         output = StringIO()
-        command = Command()
-
-        error_message = "Simulated error message"
-        expected_message = (
-            f"Error trying to read {DATA_FILE}. Got {error_message}"
-        )
-
-        with patch.object(command, "stdout", new=output):
-            with patch("builtins.open", side_effect=IOError(error_message)):
-                command._collect_data(DATA_FILE)
-
-        self.assertIn(expected_message, output.getvalue())
+        self.assertEqual(Company.objects.count(), 0)
 
-    def test_successful_perform_insertion(self):
-        """Should properly insert provided companies data into the database"""
-        output = StringIO()
-        command = Command()
-        data = command._collect_data(DATA_FILE)
+        kwarguments = {"filepath": DATA_FILE, "stdout": output}
+        call_command("import_companies", **kwarguments)
 
-        self.assertEqual(Company.objects.count(), 0)
-        with patch.object(command, "stdout", new=output):
-            command._perform_insertion(data, DATA_FILE)
+        with open(DATA_FILE, "r") as json_file:
+            expected_data = json.load(json_file)
 
-        self.assertEqual(Company.objects.count(), len(data))
+        self.assertEqual(Company.objects.count(), len(expected_data))
         self.assertIn(
             f"Successfully imported companies data from {DATA_FILE}",
             output.getvalue(),
         )
+        self.assertIn(
+            f": {len(expected_data)} inserted, 0 duplicates, 0 rejected",
+            output.getvalue(),
+        )
 
-        companies = Company.objects.all()
-        cnpjs = [piece["cnpj"] for piece in data]
-        for company in companies:
-            self.assertIn(company.cnpj, cnpjs)
+    def test_command_validates(self):
+        """
+        Should validate the companies of a JSON file by default, writing
+        the invalid and duplicate ones to the rejects file next to it
+        """
+        with open(DATA_FILE, "r") as json_file:
+            data = json.load(json_file)
+        data += [data[0], {**data[1], "cnpj": "11.111.111/1111-11"}]
 
-    def test_perform_insertion_failure(self):
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "companies.json")
+            with open(filepath, "w") as json_file:
+                json.dump(data, json_file)
+
+            output = StringIO()
+            call_command(
+                "import_companies",
+                filepath=filepath,
+                workers=1,
+                stdout=output,
+            )
+
+            self.assertEqual(Company.objects.count(), len(data) - 2)
+            self.assertIn(
+                f": {len(data) - 2} inserted, 1 duplicates, 1 rejected",
+                output.getvalue(),
+            )
+            with open(f"{filepath}.rejects.ndjson") as rejects_file:
+                self.assertEqual(len(rejects_file.readlines()), 2)
+
+    def test_failing_command_import(self):
         """
         Should properly write to stdout when failing to import companies data
+        when running the command
         """
         output = StringIO()
-        command = Command()
         error_message = "Simulated error message"
 
-        data = command._collect_data(DATA_FILE)
+        with patch(
+            "companies.management.commands.import_companies.copy_companies",
+            side_effect=IOError(error_message),
+        ):
+            call_command("import_companies", filepath=DATA_FILE, stdout=output)
 
         self.assertEqual(Company.objects.count(), 0)
-        with patch.object(command, "stdout", new=output):
-            with patch(
-                "companies.management.commands.import_companies."
-                "import_companies",
-                side_effect=IOError(error_message),
-            ):
-                command._perform_insertion(data, DATA_FILE)
-
         self.assertIn(
-            f"Error trying to import companies data from {DATA_FILE}",
+            f"Error trying to import companies data from {DATA_FILE}. "
+            f"Got {error_message}",
             output.getvalue(),
         )
-        self.assertIn(error_message, output.getvalue())
-        self.assertEqual(Company.objects.count(), 0)
 
-    def test_successful_command(self):
+    def test_failing_command_file(self):
         """
-        Should successfully insert the companies data into the database when
-        running the command
+        Should properly write to stdout when failing to access the data file
+        when running the command
         """
         output = StringIO()
         self.assertEqual(Company.objects.count(), 0)
 
         kwarguments = {"filepath": DATA_FILE, "stdout": output}
-        call_command("import_companies", **kwarguments)
 
-        with open(DATA_FILE, "r") as json_file:
-            expected_data = json.load(json_file)
+        with patch("os.path.exists", return_value=False):
+            call_command("import_companies", **kwarguments)
 
-        self.assertEqual(Company.objects.count(), len(expected_data))
+        self.assertEqual(Company.objects.count(), 0)
         self.assertIn(
-            f"Successfully imported companies data from {DATA_FILE}",
+            f"Provided filepath {DATA_FILE} does not exist or is not a file",
             output.getvalue(),
         )
 
-    def test_failing_command_data(self):
+    def test_streaming_command(self):
         """
-        Should properly write to stdout when failing to collect the data
-        when running the command
+        Should stream the companies data into the database in batches,
+        reporting the progress, from JSON files and JSON lines files
         """
-        output = StringIO()
-        self.assertEqual(Company.objects.count(), 0)
+        with open(DATA_FILE, "r") as json_file:
+            expected_data = json.load(json_file)
 
-        kwarguments = {"filepath": DATA_FILE, "stdout": output}
+        with TemporaryDirectory() as directory:
+            lines_file = os.path.join(directory, "companies.ndjson")
+            with open(lines_file, "w") as json_lines:
+                json_lines.writelines(
+                    json.dumps(piece) + "\n" for piece in expected_data
+                )
 
-        with patch(
-            "companies.management.commands.import_companies.Command._collect_data",
-            return_value=None,
-        ):
-            call_command("import_companies", **kwarguments)
+            for filepath, options in (
+                (DATA_FILE, {"stream": True}),
+                (lines_file, {}),
+            ):
+                Company.objects.all().delete()
+                output = StringIO()
+                call_command(
+                    "import_companies",
+                    filepath=filepath,
+                    batch_size=3,
+                    workers=1,
+                    stdout=output,
+                    **options,
+                )
+
+                self.assertEqual(Company.objects.count(), len(expected_data))
+                self.assertIn(
+                    "Imported 3 of 3 companies read", output.getvalue()
+                )
+                self.assertIn(
+                    f"Successfully imported companies data from {filepath}",
+                    output.getvalue(),
+                )
+                self.assertIn(
+                    f": {len(expected_data)} inserted, 0 duplicates, "
+                    f"0 rejected",
+                    output.getvalue(),
+                )
+                self.assertFalse(os.path.exists(f"{filepath}.rejects.ndjson"))
+
+    def test_streaming_command_rejects(self):
+        """
+        Should write the invalid and duplicate companies data to the rejects
+        file, reporting how many were rejected
+        """
+        with open(DATA_FILE, "r") as json_file:
+            data = json.load(json_file)
+        data += [data[0], {**data[1], "cnpj": "11.111.111/1111-11"}]
+
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "companies.jsonl")
+            rejects = os.path.join(directory, "rejects.jsonl")
+            with open(filepath, "w") as json_lines:
+                json_lines.writelines(
+                    json.dumps(piece) + "\n" for piece in data
+                )
+
+            output = StringIO()
+            call_command(
+                "import_companies",
+                filepath=filepath,
+                rejects=rejects,
+                workers=2,
+                stdout=output,
+            )
+
+            self.assertEqual(Company.objects.count(), len(data) - 2)
+            self.assertIn(
+                f": {len(data) - 2} inserted, 1 duplicates, 1 rejected",
+                output.getvalue(),
+            )
+            self.assertIn(
+                f"Duplicate and rejected companies written to {rejects}",
+                output.getvalue(),
+            )
+            with open(rejects) as rejects_file:
+                positions = [
+                    json.loads(line)["position"] for line in rejects_file
+                ]
+            self.assertEqual(sorted(positions), [len(data) - 1, len(data)])
+
+    def test_upsert_command(self):
+        """
+        Should update the companies whose data changed when upserting,
+        reporting how many rows were touched
+        """
+        with open(DATA_FILE, "r") as json_file:
+            data = json.load(json_file)
+        call_command("import_companies", filepath=DATA_FILE, stdout=StringIO())
+        data[0]["name"] = "Outro nome"
 
-        self.assertEqual(Company.objects.count(), 0)
+        with TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "companies.json")
+            with open(filepath, "w") as json_file:
+                json.dump(data, json_file)
+
+            output = StringIO()
+            call_command(
+                "import_companies",
+                filepath=filepath,
+                upsert=True,
+                workers=1,
+                stdout=output,
+            )
+
+        self.assertEqual(Company.objects.count(), len(data))
+        self.assertEqual(
+            Company.objects.get(cnpj=data[0]["cnpj"]).name, "Outro nome"
+        )
         self.assertIn(
-            f"Could not collect data from {DATA_FILE} properly or the "
-            f"file is empty",
+            f": 0 inserted, 1 updated, {len(data) - 1} unchanged, "
+            f"0 duplicates, 0 rejected (1 rows touched)",
             output.getvalue(),
         )
 
-    def test_failing_command_file(self):
+    def test_directory_command(self):
         """
-        Should properly write to stdout when failing to access the data file
-        when running the command
+        Should stream every json file of a directory, reporting each file
+        and the totals, while leaving out the rejects of former imports
         """
-        output = StringIO()
+        with open(DATA_FILE, "r") as json_file:
+            data = json.load(json_file)
+
+        with TemporaryDirectory() as directory:
+            parts = [data[:2], data[2:] + [data[0]]]
+            for index, part in enumerate(parts, start=1):
+                filepath = os.path.join(directory, f"part-{index}.ndjson")
+                with open(filepath, "w") as json_lines:
+                    json_lines.writelines(
+                        json.dumps(piece) + "\n" for piece in part
+                    )
+            stale_rejects = os.path.join(
+                directory, "part-0.ndjson.rejects.ndjson"
+            )
+            with open(stale_rejects, "w") as json_lines:
+                json_lines.write(json.dumps(data[0]) + "\n")
+
+            output = StringIO()
+            call_command(
+                "import_companies",
+                filepath=directory,
+                jobs=1,
+                stdout=output,
+            )
+
+            self.assertEqual(Company.objects.count(), len(data))
+            for index in (1, 2):
+                self.assertIn(
+                    "Successfully imported companies data from "
+                    f"{os.path.join(directory, f'part-{index}.ndjson')}",
+                    output.getvalue(),
+                )
+            self.assertIn(
+                f"Duplicate and rejected companies written to "
+                f"{os.path.join(directory, 'part-2.ndjson.rejects.ndjson')}",
+                output.getvalue(),
+            )
+            self.assertIn("Imported 2 of 2 files in ", output.getvalue())
+            self.assertIn(
+                f": {len(data)} inserted, 1 duplicates, 0 rejected",
+                output.getvalue(),
+            )
+
+    def test_glob_command_without_files(self):
+        """Should report a glob pattern matching no json file"""
+        with TemporaryDirectory() as directory:
+            pattern = os.path.join(directory, "*.ndjson")
+            output = StringIO()
+            call_command("import_companies", filepath=pattern, stdout=output)
+
         self.assertEqual(Company.objects.count(), 0)
+        self.assertIn(
+            f"Provided filepath {pattern} does not match any json file",
+            output.getvalue(),
+        )
 
-        kwarguments = {"filepath": DATA_FILE, "stdout": output}
 
-        with patch("os.path.exists", return_value=False):
-            call_command("import_companies", **kwarguments)
+class TestImportCompaniesCommandParallel(TransactionTestCase):
+    databases = "__all__"
 
-        self.assertEqual(Company.objects.count(), 0)
+    def test_glob_command_in_parallel(self):
+        """
+        Should stream the files matched by a glob pattern concurrently in
+        worker processes, reporting the ones which failed
+        """
+        with open(DATA_FILE, "r") as json_file:
+            data = json.load(json_file)
+
+        with TemporaryDirectory() as directory:
+            for index, piece in enumerate(data):
+                filepath = os.path.join(directory, f"part-{index}.jsonl")
+                with open(filepath, "w") as json_lines:
+                    json_lines.write(json.dumps(piece) + "\n")
+            broken = os.path.join(directory, "part-broken.jsonl")
+            with open(broken, "w") as json_lines:
+                json_lines.write("{not json\n")
+
+            output = StringIO()
+            call_command(
+                "import_companies",
+                filepath=os.path.join(directory, "part-*.jsonl"),
+                jobs=2,
+                stdout=output,
+            )
+
+        self.assertEqual(Company.objects.count(), len(data))
         self.assertIn(
-            f"Provided filepath {DATA_FILE} does not exist or is not a file",
+            f"Error trying to import companies data from {broken}",
+            output.getvalue(),
+        )
+        self.assertIn(
+            f"Imported {len(data)} of {len(data) + 1} files in ",
+            output.getvalue(),
+        )
+        self.assertIn(
+            f": {len(data)} inserted, 0 duplicates, 0 rejected",
             output.getvalue(),
         )
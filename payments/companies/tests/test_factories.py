@@ -1,5 +1,6 @@
 from django.test import TestCase
 
+from companies.formats import CNPJ_DIGITS, normalize_cnpj
 from companies.models import (
     DDD_LOWER_LIMIT,
     DDD_UPPER_LIMIT,
@@ -42,8 +43,8 @@ class TestFactories(TestCase):
         self.assertIsInstance(company, Company)
         self.assertIsInstance(company.name, str)
         self.assertTrue(len(company.name) > 1)
-        self.assertIsInstance(company.cnpj, str)
-        self.assertTrue(len(company.cnpj) > 1)
+        self.assertIsInstance(company.cnpj, int)
+        self.assertEqual(len(normalize_cnpj(company.cnpj)), CNPJ_DIGITS)
         self.assertIsInstance(company.owner, str)
         self.assertTrue(len(company.owner) > 1)
         self.assertIsInstance(company.ddd, int)
@@ -1,8 +1,8 @@
 from django.core.validators import ValidationError
 from django.test import TestCase
 
+from companies.formats import CNPJ_DIGITS, format_cnpj, normalize_cnpj
 from companies.models import (
-    CNPJ_SIZE,
     DDD_LOWER_LIMIT,
     DDD_UPPER_LIMIT,
     PHONE_SIZE,
@@ -25,6 +25,24 @@ class TestCompanyModel(TestCase):
         self.assertEqual(company.ddd, retrieved_company.ddd)
         self.assertEqual(company.phone, retrieved_company.phone)
 
+    def test_model_cnpj_storage(self):
+        """
+        Should store the cnpj as the integer of its digits, whether given
+        with or without punctuation, and look it up either way
+        """
+        for punctuated in (True, False):
+            company = CompanyFactory.build()
+            cnpj = company.cnpj
+            digits = normalize_cnpj(cnpj)
+            company.cnpj = cnpj if punctuated else digits
+            company.save()
+
+            for lookup in (cnpj, digits, int(digits)):
+                retrieved_company = Company.objects.get(cnpj=lookup)
+                self.assertEqual(retrieved_company.pk, company.pk)
+                self.assertEqual(retrieved_company.cnpj, int(digits))
+                self.assertEqual(format_cnpj(retrieved_company.cnpj), cnpj)
+
     def test_model_creation_duplicate_cnpj(self):
         """
         Should fail to create multiple instances of Company in the database
@@ -68,10 +86,9 @@ class TestCompanyModel(TestCase):
         company.cnpj = company.cnpj + "1"
         expected_messages = {
             "cnpj": [
-                f"Ensure the CNPJ is valid (it is {company.cnpj}).",
-                f"Ensure this value has at most {CNPJ_SIZE} characters "
-                f"(it has {len(company.cnpj)}).",
-            ],
+                f"Ensure this value has {CNPJ_DIGITS} digits "
+                f"(it has {CNPJ_DIGITS + 1})."
+            ]
         }
 
         with self.assertRaises(ValidationError) as raised:
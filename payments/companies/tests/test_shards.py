@@ -0,0 +1,100 @@
+from collections import Counter
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from companies.formats import normalize_cnpj
+from companies.models import CompanyPlacement
+from companies.shards import ShardDirectory, hash_shard
+from pycpfcnpj.gen import cnpj_with_punctuation
+
+SHARDS = ["default", "shard1", "shard2", "shard3"]
+SHARDING = {"SHARDS": SHARDS}
+
+
+class TestHashShard(SimpleTestCase):
+    def test_hash_shard(self):
+        """
+        Should pick the same shard for a CNPJ regardless of its format,
+        spreading the CNPJs across the shards
+        """
+        cnpjs = [cnpj_with_punctuation() for _ in range(2000)]
+        for cnpj in cnpjs[:10]:
+            self.assertEqual(
+                hash_shard(cnpj, SHARDS),
+                hash_shard(int(normalize_cnpj(cnpj)), SHARDS),
+            )
+
+        counts = Counter(hash_shard(cnpj, SHARDS) for cnpj in cnpjs)
+        self.assertEqual(set(counts), set(SHARDS))
+        self.assertGreater(min(counts.values()), len(cnpjs) / 8)
+
+    def test_hash_shard_added(self):
+        """
+        Should only move about 1/N of the CNPJs, all of them to the new
+        shard, when the Nth shard is added
+        """
+        cnpjs = [cnpj_with_punctuation() for _ in range(2000)]
+        shards = SHARDS + ["shard4"]
+
+        moved = [
+            cnpj
+            for cnpj in cnpjs
+            if hash_shard(cnpj, SHARDS) != hash_shard(cnpj, shards)
+        ]
+        self.assertEqual(
+            {hash_shard(cnpj, shards) for cnpj in moved}, {"shard4"}
+        )
+        self.assertGreater(len(moved), len(cnpjs) / 10)
+        self.assertLess(len(moved), len(cnpjs) * 3 / 10)
+
+
+class TestShardDirectory(TestCase):
+    def setUp(self):
+        self.directory = ShardDirectory()
+        self.cnpj = cnpj_with_punctuation()
+
+    @override_settings(DATABASE_SHARDING={**SHARDING, "SHARDS": ["default"]})
+    def test_single_shard(self):
+        """Should map every company to the single shard without queries"""
+        with self.assertNumQueries(0):
+            self.assertEqual(self.directory.get(self.cnpj), "default")
+
+    @override_settings(DATABASE_SHARDING=SHARDING)
+    def test_placement(self):
+        """
+        Should map the moved companies to their placements, looking up the
+        placements of the given CNPJs only, with a single query
+        """
+        home = hash_shard(self.cnpj, SHARDS)
+        other = next(shard for shard in SHARDS if shard != home)
+
+        self.assertEqual(self.directory.get(self.cnpj), home)
+        CompanyPlacement.objects.create(cnpj=self.cnpj, shard=other)
+        another = next(
+            cnpj
+            for cnpj in iter(cnpj_with_punctuation, None)
+            if hash_shard(cnpj, SHARDS) == home
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.directory.group(
+                    [self.cnpj, normalize_cnpj(self.cnpj), another]
+                ),
+                {
+                    other: [self.cnpj, normalize_cnpj(self.cnpj)],
+                    home: [another],
+                },
+            )
+        self.assertEqual(self.directory.get(self.cnpj), other)
+
+    @override_settings(DATABASE_SHARDING=SHARDING)
+    def test_placement_unknown_shard(self):
+        """
+        Should map the companies placed in shards no longer configured to
+        the shard picked by their hash
+        """
+        CompanyPlacement.objects.create(cnpj=self.cnpj, shard="shard9")
+        self.assertEqual(
+            self.directory.get(self.cnpj), hash_shard(self.cnpj, SHARDS)
+        )
@@ -0,0 +1,85 @@
+import json
+from io import StringIO
+
+from django.test import SimpleTestCase
+
+from companies.streaming import iter_json_records
+
+RECORDS = [
+    {"name": "Loja [1]", "cnpj": "16.470.954/0001-06", "ddd": 11},
+    {"name": 'Loja "2", {centro}', "cnpj": "16470954000106", "ddd": 21},
+    {"name": "Loja 3", "cnpj": 16470954000106, "ddd": 31},
+]
+
+
+class TestIterJsonRecords(SimpleTestCase):
+    def parse(self, content: str, read_size: int = 7):
+        return list(iter_json_records(StringIO(content), read_size))
+
+    def test_json_array(self):
+        """
+        Should parse the records of a JSON array split across many chunks
+        """
+        content = json.dumps(RECORDS, indent=2)
+        for read_size in (1, 7, len(content)):
+            self.assertEqual(self.parse(content, read_size), RECORDS)
+
+    def test_json_lines(self):
+        """Should parse JSON lines, ignoring blank lines"""
+        content = "\n".join(map(json.dumps, RECORDS)) + "\n\n"
+        self.assertEqual(self.parse(content), RECORDS)
+        self.assertEqual(self.parse("1\n22\n333", read_size=1), [1, 22, 333])
+
+    def test_empty(self):
+        """Should parse no records from empty files and arrays"""
+        for content in ("", " \n", "[]", "[\n]\n"):
+            self.assertEqual(self.parse(content), [])
+
+    def test_invalid(self):
+        """Should fail on malformed JSON, yielding the records before it"""
+        records = iter_json_records(StringIO('[{"a": 1}, {"a": 2} {"a": 3}]'))
+        self.assertEqual(next(records), {"a": 1})
+        self.assertEqual(next(records), {"a": 2})
+        with self.assertRaisesMessage(ValueError, "Expecting ',' delimiter"):
+            next(records)
+
+        for content in ('[{"a": 1}', '[{"a": 1}] {}', '{"a": 1'):
+            with self.assertRaises(ValueError):
+                self.parse(content)
+
+    def test_truncated_literals(self):
+        """
+        Should parse the literals, numbers and escapes of records split
+        across chunks anywhere
+        """
+        content = (
+            '[{"a": true, "b": false, "c": null, "d": -1.5e+3, '
+            '"e": "\\u00e9\\""}]'
+        )
+        expected = [{"a": True, "b": False, "c": None, "d": -1500.0}]
+        expected[0]["e"] = 'é"'
+        for read_size in range(1, len(content) + 1):
+            self.assertEqual(self.parse(content, read_size), expected)
+
+    def test_malformed_early(self):
+        """
+        Should fail on a malformed record without reading the rest of the
+        file
+        """
+        content = '{"a": 1}\n{"a" 2}\n' + '{"a": 3}\n' * 10000
+        file = StringIO(content)
+
+        with self.assertRaisesMessage(ValueError, "Expecting ':' delimiter"):
+            list(iter_json_records(file, read_size=16))
+        self.assertLessEqual(file.tell(), 32)
+
+    def test_record_too_large(self):
+        """Should fail on a record larger than the maximum record size"""
+        content = json.dumps([{"a": "x" * 100}, {"a": 1}])
+
+        with self.assertRaisesMessage(ValueError, "Record too large"):
+            list(iter_json_records(StringIO(content), 7, max_record_size=50))
+        self.assertEqual(
+            list(iter_json_records(StringIO(content), 7, max_record_size=200)),
+            [{"a": "x" * 100}, {"a": 1}],
+        )
@@ -2,9 +2,10 @@ from typing import Dict
 
 from django.test import TransactionTestCase
 
+from companies.formats import format_cnpj, normalize_cnpj
 from companies.models import Company
 from companies.tests.factories import CompanyFactory
-from companies.utils import import_companies
+from companies.utils import ImportSummary, copy_companies
 
 
 def remove_attributes(data: Dict) -> Dict:
@@ -15,6 +16,8 @@ def remove_attributes(data: Dict) -> Dict:
 
 
 class TestUtils(TransactionTestCase):
+    databases = "__all__"
+
     def setUp(self):
         self.test_data = {}
         companies = [
@@ -31,14 +34,16 @@ class TestUtils(TransactionTestCase):
         """
         self.assertEqual(Company.objects.count(), 0)
 
-        with self.assertNumQueries(1):
-            import_companies(self.test_data.values())
+        summary = copy_companies(self.test_data.values())
+
+        self.assertEqual(summary.inserted, len(self.test_data))
 
         self.assertEqual(Company.objects.count(), len(self.test_data))
 
         for cnpj, data in self.test_data.items():
             company = Company.objects.get(cnpj=cnpj)
             company_dict = remove_attributes(company.__dict__)
+            company_dict["cnpj"] = format_cnpj(company_dict["cnpj"])
             self.assertEqual(company_dict, data)
 
     def test_import_companies_ignoring_duplicates(self):
@@ -52,11 +57,106 @@ class TestUtils(TransactionTestCase):
         test_element = self.test_data[first_key]
         test_data = [test_element, test_element]
 
-        with self.assertNumQueries(1):
-            import_companies(test_data)
+        summary = copy_companies(test_data)
 
+        self.assertEqual(summary.inserted, 1)
+        self.assertEqual(summary.duplicates, 1)
         self.assertEqual(Company.objects.count(), 1)
 
         company = Company.objects.get(cnpj=test_element["cnpj"])
         company_dict = remove_attributes(company.__dict__)
+        company_dict["cnpj"] = format_cnpj(company_dict["cnpj"])
         self.assertEqual(company_dict, test_element)
+
+    def test_import_companies_unpunctuated_cnpj(self):
+        """
+        Should successfully import Company data into the database with the
+        cnpj given without punctuation
+        """
+        self.assertEqual(Company.objects.count(), 0)
+
+        test_data = [
+            {**data, "cnpj": normalize_cnpj(cnpj)}
+            for cnpj, data in self.test_data.items()
+        ]
+        copy_companies(test_data)
+
+        self.assertEqual(Company.objects.count(), len(test_data))
+        for cnpj in self.test_data:
+            company = Company.objects.get(cnpj=cnpj)
+            self.assertEqual(format_cnpj(company.cnpj), cnpj)
+
+    def test_copy_companies(self):
+        """
+        Should import companies data in batches, rejecting invalid and
+        duplicate data and reporting the progress after each batch
+        """
+        data = [*self.test_data.values(), CompanyFactory.build().__dict__]
+        remove_attributes(data[-1])
+        data[-1]["name"] = "Bar do Zé\t\\ \\N\n"
+        data.append({**data[0], "cnpj": normalize_cnpj(data[0]["cnpj"])})
+        data.append({**data[1], "cnpj": "11.111.111/1111-11", "ddd": 10})
+        progress, rejects = [], []
+
+        summary = copy_companies(
+            iter(data), 2, progress.append, rejects.append
+        )
+
+        self.assertEqual(summary, ImportSummary(5, 3, 1, 1))
+        self.assertEqual(
+            progress, [ImportSummary(2, 2, 0, 0), ImportSummary(4, 3, 1, 0)]
+        )
+        self.assertEqual([reject.position for reject in rejects], [4, 5])
+        self.assertEqual(
+            rejects[0].errors,
+            {"cnpj": ["Company with this Cnpj already exists."]},
+        )
+        self.assertEqual(set(rejects[1].errors), {"cnpj", "ddd"})
+
+        self.assertEqual(Company.objects.count(), 3)
+        for piece in data[:3]:
+            company = Company.objects.get(cnpj=piece["cnpj"])
+            company_dict = remove_attributes(company.__dict__)
+            company_dict["cnpj"] = format_cnpj(company_dict["cnpj"])
+            self.assertEqual(company_dict, piece)
+
+        summary = copy_companies(iter(data), 10, workers=2)
+        self.assertEqual(summary, ImportSummary(5, 0, 4, 1))
+
+    def test_copy_companies_upsert(self):
+        """
+        Should update the changed companies when upserting, leaving the
+        unchanged ones untouched and upserting the last of the companies
+        sharing a CNPJ
+        """
+        first, second = self.test_data.values()
+        copy_companies([first, second])
+        companies = Company.objects.extra(select={"version": "xmin"})
+        former = {format_cnpj(company.cnpj): company for company in companies}
+
+        new = remove_attributes(CompanyFactory.build().__dict__)
+        changed = {**first, "name": "Outro nome", "ddd": 99}
+        data = [{**first, "owner": "Antigo"}, second, changed, new]
+        rejects = []
+
+        summary = copy_companies(data, reject=rejects.append, upsert=True)
+
+        self.assertEqual(summary, ImportSummary(4, 1, 1, 0, 1, 1))
+        self.assertEqual([reject.position for reject in rejects], [1])
+        self.assertEqual(Company.objects.count(), 3)
+        for expected in (changed, second, new):
+            company = companies.get(cnpj=expected["cnpj"])
+            if expected is not new:
+                self.assertEqual(company.id, former[expected["cnpj"]].id)
+            company_dict = remove_attributes(dict(company.__dict__))
+            del company_dict["version"]
+            company_dict["cnpj"] = format_cnpj(company_dict["cnpj"])
+            self.assertEqual(company_dict, expected)
+
+        # the row of the unchanged company is not rewritten
+        self.assertEqual(
+            companies.get(cnpj=second["cnpj"]).version,
+            former[second["cnpj"]].version,
+        )
+        summary = copy_companies(data, upsert=True)
+        self.assertEqual(summary, ImportSummary(4, 0, 1, 0, 0, 3))
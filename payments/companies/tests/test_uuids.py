@@ -0,0 +1,98 @@
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from companies.models import Company
+from payments import uuids
+from payments.uuids import MAX_COUNTER, stable_uuid7, uuid7
+from transactions.models import Transaction
+
+
+def timestamp_of(value) -> int:
+    return value.int >> 80
+
+
+class TestUuid7(SimpleTestCase):
+    def test_uuid7(self):
+        """
+        Should generate a version 7 UUID holding the current unix time in
+        milliseconds
+        """
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, "specified in RFC 4122")
+        self.assertGreaterEqual(timestamp_of(value), before)
+        self.assertLessEqual(timestamp_of(value), after)
+
+    def test_uuid7_ordering(self):
+        """
+        Should generate strictly increasing UUIDs, both as integers and as
+        the strings and bytes they are compared as by the database
+        """
+        values = [uuid7() for _ in range(10000)]
+
+        self.assertEqual(len(set(values)), len(values))
+        self.assertEqual(sorted(values), values)
+        self.assertEqual(sorted(map(str, values)), list(map(str, values)))
+        self.assertEqual(
+            sorted(value.bytes for value in values),
+            [value.bytes for value in values],
+        )
+
+    def test_uuid7_same_millisecond(self):
+        """
+        Should keep the UUIDs increasing when the clock does not move, even
+        when the counter of the millisecond overflows
+        """
+        with patch.object(time, "time_ns", return_value=time.time_ns()):
+            values = [uuid7() for _ in range(MAX_COUNTER + 2)]
+
+        self.assertEqual(sorted(values), values)
+        self.assertEqual(len(set(values)), len(values))
+        self.assertGreater(timestamp_of(values[-1]), timestamp_of(values[0]))
+
+    def test_uuid7_clock_backwards(self):
+        """
+        Should keep the UUIDs increasing when the clock goes backwards
+        """
+        now = time.time_ns()
+        with patch.object(time, "time_ns", return_value=now):
+            first = uuid7()
+        with patch.object(time, "time_ns", return_value=now - 10**9):
+            second = uuid7()
+
+        self.assertGreater(second, first)
+        self.assertEqual(uuids._last_timestamp, timestamp_of(second))
+
+    def test_models_default(self):
+        """
+        Should use time ordered UUIDs as the default ids of companies and
+        transactions
+        """
+        self.assertEqual(Company().id.version, 7)
+        self.assertEqual(Transaction().id.version, 7)
+        self.assertLess(Company().id, Transaction().id)
+
+
+class TestStableUuid7(SimpleTestCase):
+    def test_stable_uuid7(self):
+        """
+        Should generate the same version 7 UUID for the same time and key,
+        ordered by time and distinct across keys
+        """
+        moment = datetime(2020, 5, 17, 12, 30, tzinfo=timezone.utc)
+        value = stable_uuid7(moment, b"file:1")
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, "specified in RFC 4122")
+        self.assertEqual(timestamp_of(value), int(moment.timestamp() * 1000))
+        self.assertEqual(stable_uuid7(moment, b"file:1"), value)
+        self.assertNotEqual(stable_uuid7(moment, b"file:2"), value)
+        self.assertLess(
+            value, stable_uuid7(moment + timedelta(milliseconds=1), b"file:0")
+        )
@@ -0,0 +1,97 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.test import SimpleTestCase
+
+from companies.tests.factories import CompanyFactory
+from companies.validation import (
+    Reject,
+    RejectFile,
+    clean_company,
+    validate_companies,
+)
+
+
+def company_data(**overrides):
+    data = CompanyFactory.build().__dict__
+    del data["_state"], data["id"]
+    return {**data, **overrides}
+
+
+class TestValidation(SimpleTestCase):
+    def test_clean_company(self):
+        """
+        Should report the errors of each field of invalid companies data
+        """
+        self.assertEqual(clean_company(company_data()), {})
+        self.assertEqual(
+            set(
+                clean_company(
+                    company_data(cnpj="11.111.111/1111-11", ddd=100, phone=1)
+                )
+            ),
+            {"cnpj", "ddd", "phone"},
+        )
+        self.assertEqual(
+            set(clean_company(company_data(name="", cnpj="123"))),
+            {"name", "cnpj"},
+        )
+        self.assertIn(
+            "unexpected keyword",
+            clean_company(company_data(site="loja.com"))[NON_FIELD_ERRORS][0],
+        )
+        self.assertEqual(
+            clean_company([1, 2]), {NON_FIELD_ERRORS: ["Expected an object."]}
+        )
+
+    def test_validate_companies(self):
+        """
+        Should split the companies data into valid data and rejects in
+        chunks, keeping their order and positions, with or without workers
+        """
+        data = [company_data() for _ in range(7)]
+        data[2]["ddd"] = data[5]["ddd"] = 1
+
+        for workers in (1, 2):
+            chunks = list(validate_companies(iter(data), workers, 3))
+
+            self.assertEqual(len(chunks), 3)
+            valid = [item for chunk, _ in chunks for item in chunk]
+            rejects = [reject for _, chunk in chunks for reject in chunk]
+            self.assertEqual(
+                valid,
+                [
+                    (position, data[position - 1])
+                    for position in (1, 2, 4, 5, 7)
+                ],
+            )
+            self.assertEqual(
+                [(reject.position, reject.data) for reject in rejects],
+                [(3, data[2]), (6, data[5])],
+            )
+            self.assertEqual(set(rejects[0].errors), {"ddd"})
+
+    def test_reject_file(self):
+        """
+        Should write the rejects as JSON lines, creating the file only once
+        something is rejected
+        """
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rejects.ndjson")
+            with RejectFile(path):
+                pass
+            self.assertFalse(os.path.exists(path))
+
+            reject = Reject(3, {"ddd": 1}, {"ddd": ["Invalid."]})
+            with RejectFile(path) as reject_file:
+                reject_file(reject)
+                reject_file(reject)
+
+            self.assertEqual(reject_file.written, 2)
+            with open(path) as rejects:
+                self.assertEqual(
+                    [json.loads(line) for line in rejects],
+                    [reject._asdict()] * 2,
+                )
@@ -1,17 +1,214 @@
-from typing import Dict, List, Union
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from django.db import connections, transaction
+
+from payments.bulk import copy_instances
+
+from .cache import company_cache
+from .formats import normalize_cnpj
 from .models import Company
+from .shards import shard_directory
+from .validation import (
+    VALIDATION_CHUNK_SIZE,
+    Position,
+    Reject,
+    validate_companies,
+)
 
 CompanyData = Dict[str, Union[str, int]]
-CompaniesData = List[CompanyData]
 
+COPY_BATCH_SIZE = 10000
+
+STAGING_TABLE = "companies_company_staging"
+
+CREATE_STAGING_TABLE = f"""
+CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE}
+(LIKE companies_company)
+"""
+
+MERGE_STAGING_TABLE = f"""
+INSERT INTO companies_company ({{columns}})
+SELECT {{columns}} FROM {STAGING_TABLE} AS staged
+{{merge}}
+RETURNING cnpj, xmax = 0 AS inserted
+"""
+
+INSERT_MERGE = "ON CONFLICT DO NOTHING"
+
+# unchanged companies are left out before reaching the ON CONFLICT clause,
+# which locks (and so writes to) the conflicting rows even when not updated
+UPSERT_MERGE = """
+WHERE NOT EXISTS (
+    SELECT FROM companies_company AS company
+    WHERE company.cnpj = staged.cnpj
+    AND ({current}) IS NOT DISTINCT FROM ({staged})
+)
+ON CONFLICT (cnpj) DO UPDATE SET {updates}
+WHERE ({conflicting}) IS DISTINCT FROM ({excluded})
+"""
+
+TRUNCATE_STAGING_TABLE = f"TRUNCATE {STAGING_TABLE}"
+
+
+def _merge_clause(connection, upsert: bool) -> str:
+    if not upsert:
+        return INSERT_MERGE
+
+    updated = [
+        connection.ops.quote_name(field.column)
+        for field in Company._meta.concrete_fields
+        if not field.primary_key and field.name != "cnpj"
+    ]
+
+    def columns_of(table: str) -> str:
+        return ", ".join(f"{table}.{column}" for column in updated)
+
+    return UPSERT_MERGE.format(
+        current=columns_of("company"),
+        staged=columns_of("staged"),
+        updates=", ".join(
+            f"{column} = EXCLUDED.{column}" for column in updated
+        ),
+        conflicting=columns_of("companies_company"),
+        excluded=columns_of("EXCLUDED"),
+    )
+
+
+def _copy_to_shard(
+    companies: List[Company], shard: str, upsert: bool = False
+) -> Dict[int, bool]:
+    """
+    Copies the companies into the staging table of the shard and merges
+    them into the companies table, inserting the new companies and, when
+    upserting, updating the changed ones. Returns the CNPJs merged, mapped
+    to whether they were inserted (or updated).
+    """
+    connection = connections[shard]
+    fields = Company._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+
+    merge = MERGE_STAGING_TABLE.format(
+        columns=columns, merge=_merge_clause(connection, upsert)
+    )
+    with transaction.atomic(using=shard), connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_TABLE)
+        copy_instances(cursor, STAGING_TABLE, fields, companies)
+        cursor.execute(merge)
+        merged = dict(cursor.fetchall())
+        cursor.execute(TRUNCATE_STAGING_TABLE)
+    return merged
+
+
+class ImportSummary(NamedTuple):
+    read: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+def copy_companies(
+    data: Iterable[CompanyData],
+    batch_size: int = COPY_BATCH_SIZE,
+    progress: Optional[Callable[[ImportSummary], None]] = None,
+    reject: Optional[Callable[[Reject], None]] = None,
+    workers: int = 1,
+    upsert: bool = False,
+) -> ImportSummary:
+    """
+    Imports companies data streamed from any iterable (see
+    companies.streaming) in batches, returning how many companies were
+    read, inserted, left out as duplicates and rejected as invalid, along
+    with how many were updated or left unchanged when upserting. Only a
+    batch is kept in memory at a time.
+
+    The data is validated across `workers` processes (see
+    companies.validation) and each batch of valid companies is loaded into
+    a staging table of each shard with COPY, much cheaper than an INSERT for
+    many rows, and merged into the companies table. Companies whose CNPJ is
+    already taken are left out, unless upserting, in which case the ones
+    that changed are updated. The invalid companies and the duplicates are
+    passed to `reject` with the reasons. A batch is committed once merged,
+    and `progress` is called with the running summary.
+
+    Within a batch, the first of the companies sharing a CNPJ is the one
+    inserted, while the last one is the one upserted, as the latter would
+    update the former.
+    """
+    summary = ImportSummary()
+    batch: List[Tuple[Position, CompanyData]] = []
+    if upsert:
+        duplicate_errors = {
+            "cnpj": ["Superseded by a later company with this CNPJ."]
+        }
+    else:
+        duplicate_errors = {
+            "cnpj": Company().unique_error_message(Company, ["cnpj"]).messages
+        }
+
+    def flush(pieces: List[Tuple[Position, CompanyData]]):
+        nonlocal summary
+        companies = [Company(**piece) for _, piece in pieces]
+        cnpjs = [int(normalize_cnpj(company.cnpj)) for company in companies]
+        chosen = {}
+        for index, cnpj in enumerate(cnpjs):
+            if upsert or cnpj not in chosen:
+                chosen[cnpj] = index
+
+        companies_by_shard = shard_directory.group(
+            [companies[index] for index in chosen.values()],
+            lambda company: company.cnpj,
+        )
+        merged = {}
+        for shard, shard_companies in companies_by_shard.items():
+            merged.update(_copy_to_shard(shard_companies, shard, upsert))
+        company_cache.invalidate_many(merged)
+
+        duplicates = 0
+        for index, ((position, piece), cnpj) in enumerate(zip(pieces, cnpjs)):
+            if chosen[cnpj] == index and (upsert or cnpj in merged):
+                continue
+            duplicates += 1
+            if reject is not None:
+                reject(Reject(position, piece, duplicate_errors))
+
+        inserted = sum(merged.values())
+        unchanged = len(chosen) - len(merged) if upsert else 0
+        summary = summary._replace(
+            read=summary.read + len(pieces),
+            inserted=summary.inserted + inserted,
+            duplicates=summary.duplicates + duplicates,
+            updated=summary.updated + len(merged) - inserted,
+            unchanged=summary.unchanged + unchanged,
+        )
+        if progress is not None:
+            progress(summary)
 
-def import_companies(data: CompaniesData):
-    """Imports companies data into the database"""
-    companies_to_insert = []
+    chunk_size = min(batch_size, VALIDATION_CHUNK_SIZE)
+    for valid, rejects in validate_companies(data, workers, chunk_size):
+        summary = summary._replace(
+            read=summary.read + len(rejects),
+            rejected=summary.rejected + len(rejects),
+        )
+        if reject is not None:
+            for rejected in rejects:
+                reject(rejected)
 
-    for piece in data:
-        company = Company(**piece)
-        companies_to_insert.append(company)
+        batch += valid
+        while len(batch) >= batch_size:
+            flush(batch[:batch_size])
+            batch = batch[batch_size:]
+    if batch:
+        flush(batch)
 
-    Company.objects.bulk_create(companies_to_insert, ignore_conflicts=True)
+    return summary
@@ -0,0 +1,127 @@
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import django
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+
+from .models import Company
+
+VALIDATION_CHUNK_SIZE = 1000
+
+Errors = Dict[str, List[str]]
+Position = int
+
+
+class Reject(NamedTuple):
+    """Record of an import left out, by its position in the source"""
+
+    position: Position
+    data: Any
+    errors: Errors
+
+
+ValidatedChunk = Tuple[List[Tuple[Position, Dict]], List[Reject]]
+
+
+def clean_company(data: Any) -> Errors:
+    """
+    Validates the data of a company against the fields of the model (e.g.
+    the CNPJ, DDD and phone validators), as Company.full_clean does,
+    returning the errors found. The uniqueness of the CNPJ is left to the
+    database.
+    """
+    if not isinstance(data, dict):
+        return {NON_FIELD_ERRORS: ["Expected an object."]}
+    try:
+        Company(**data).clean_fields()
+    except TypeError as exc:
+        return {NON_FIELD_ERRORS: [str(exc)]}
+    except ValidationError as exc:
+        return exc.message_dict
+    return {}
+
+
+def validate_chunk(chunk: List[Tuple[Position, Any]]) -> ValidatedChunk:
+    valid, rejects = [], []
+    for position, data in chunk:
+        errors = clean_company(data)
+        if errors:
+            rejects.append(Reject(position, data, errors))
+        else:
+            valid.append((position, data))
+    return valid, rejects
+
+
+def _chunk(
+    data: Iterable[Any], chunk_size: int
+) -> Iterator[List[Tuple[Position, Any]]]:
+    chunk = []
+    for item in enumerate(data, start=1):
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_companies(
+    data: Iterable[Any],
+    workers: int = 1,
+    chunk_size: int = VALIDATION_CHUNK_SIZE,
+) -> Iterator[ValidatedChunk]:
+    """
+    Validates companies data in chunks across a pool of `workers`
+    processes, yielding the valid data and the rejects of each chunk, in
+    the order of the data, along with their positions (starting at 1).
+
+    Only a couple of chunks per worker are in flight at a time, so the data
+    may be streamed (see companies.streaming) without being read whole.
+    """
+    chunks = _chunk(data, chunk_size)
+    if workers <= 1:
+        yield from map(validate_chunk, chunks)
+        return
+
+    # the workers may be spawned instead of forked, so Django is set up
+    with ProcessPoolExecutor(workers, initializer=django.setup) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(validate_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class RejectFile:
+    """
+    Writes rejects as JSON lines to a file, which is only created (or
+    appended to) once the first reject is written. Each line is written
+    through as soon as the reject is.
+    """
+
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.append = append
+        self.written = 0
+        self._file: IO[str] = None
+
+    def __call__(self, reject: Reject):
+        if self._file is None:
+            mode = "a" if self.append else "w"
+            self._file = open(self.path, mode, buffering=1, encoding="utf-8")
+        self._file.write(json.dumps(reject._asdict(), default=str) + "\n")
+        self.written += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -2,15 +2,18 @@ from django.core.validators import BaseValidator, ValidationError
 from django.utils.deconstruct import deconstructible
 from django.utils.translation import gettext_lazy as _
 
+from companies.formats import DocumentNumber, format_cnpj
 from pycpfcnpj.cpfcnpj import validate as cnpj_is_valid
 
 
-def cnpj_validator(value: str):
-    message = f"Ensure the CNPJ is valid (it is {value})."
+def cnpj_validator(value: DocumentNumber):
+    # the stored integers are shown with their punctuation
+    cnpj = format_cnpj(value) if isinstance(value, int) else value
+    message = f"Ensure the CNPJ is valid (it is {cnpj})."
     code = "cnpj_value"
     params = {"value": value}
 
-    if not cnpj_is_valid(value):
+    if not cnpj_is_valid(cnpj):
         raise ValidationError(message, code=code, params=params)
 
 
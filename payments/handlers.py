@@ -0,0 +1,93 @@
+"""
+ASGI handler of the project, streaming responses without running their
+content in the event loop thread. The handler of this Django version reads
+streamed content synchronously within the loop, where the ORM refuses to run
+(e.g. the complete report streamed through a server-side cursor), and can
+not stream content produced asynchronously.
+
+Here synchronous content is read in the thread of the synchronous code, as
+the views themselves are run, and content of an AsyncStreamingHttpResponse
+(e.g. the complete report of the async views) is awaited in the loop.
+"""
+
+from typing import AsyncIterable
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.http.response import HttpResponseBase
+
+
+class AsyncStreamingHttpResponse(HttpResponseBase):
+    """
+    Streaming response with an async iterable of bytes as content, only
+    served by the ASGIHandler below
+    """
+
+    streaming = True
+
+    def __init__(self, streaming_content: AsyncIterable[bytes], **kwargs):
+        super().__init__(**kwargs)
+        self.streaming_content = streaming_content
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    def _encode_headers(self, response):
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append(
+                (
+                    b"Set-Cookie",
+                    cookie.output(header="").encode("ascii").strip(),
+                )
+            )
+        return headers
+
+    async def _iterate(self, response):
+        if isinstance(response, AsyncStreamingHttpResponse):
+            async for part in response.streaming_content:
+                yield part
+            return
+
+        parts = iter(response)
+        read = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await read(parts, None)
+            if part is None:
+                return
+            yield part
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": self._encode_headers(response),
+            }
+        )
+        async for part in self._iterate(response):
+            for chunk, _ in self.chunk_bytes(part):
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application() -> ASGIHandler:
+    """As django.core.asgi.get_asgi_application, with the handler above"""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
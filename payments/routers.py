@@ -0,0 +1,209 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# set on the responses of the requests which may write, so the next reads of
+# the same client are served by the primary (see DATABASE_REPLICATION)
+PRIMARY_COOKIE = "banco_primario"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("read_alias", default=None)
+_shard: ContextVar[str] = ContextVar("shard", default=PRIMARY)
+
+
+def get_replicas() -> List[str]:
+    return settings.DATABASE_REPLICATION["REPLICAS"]
+
+
+def choose_replica() -> str:
+    """Chooses one of the replicas at random, or the primary when none"""
+    replicas = get_replicas()
+    return random.choice(replicas) if replicas else PRIMARY
+
+
+@contextmanager
+def use_database(alias: str):
+    """Sends the reads performed within the block to the given database"""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def use_primary():
+    """
+    Sends the reads performed within the block (or the decorated function)
+    to the primary, for code which writes or must read its own writes
+    """
+    return use_database(PRIMARY)
+
+
+@contextmanager
+def use_shard(alias: str):
+    """
+    Sends the queries performed within the block to the given shard (see
+    companies.shards), the reads of the default one being sent to its
+    replicas as usual
+    """
+    token = _shard.set(alias)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+class DatabaseRouter:
+    """
+    Sends the queries to the shard of the current block (see use_shard), the
+    default database otherwise. The writes of the default database go to
+    the primary and its reads to the database chosen for the current block
+    or request (see use_database and ReplicaMiddleware), to a replica
+    otherwise.
+
+    Reads performed within a transaction of the shard are sent to the shard,
+    so they see the writes of the transaction. Queries related to an
+    instance are sent to the database it was loaded from (its primary for
+    writes).
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        shard = _shard.get()
+        if connections[shard].in_atomic_block:
+            return shard
+
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if shard != PRIMARY:
+            # only the default database is replicated
+            return shard
+        return _read_alias.get() or choose_replica()
+
+    def db_for_write(self, model, **hints) -> str:
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # the primary of the replica the instance was loaded from
+            if instance._state.db in get_replicas():
+                return PRIMARY
+            return instance._state.db
+        return _shard.get()
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        databases = {PRIMARY, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints) -> Optional[bool]:
+        # the replicas are migrated through the replication of the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+def _stream_from(alias: str, content: Iterable[bytes]) -> Iterator[bytes]:
+    chunks = iter(content)
+    while True:
+        with use_database(alias):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _astream_from(
+    alias: str, content: AsyncIterable[bytes]
+) -> AsyncIterator[bytes]:
+    chunks = content.__aiter__()
+    while True:
+        with use_database(alias):
+            try:
+                chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+        yield chunk
+
+
+class ReplicaMiddleware:
+    """
+    Sends the reads of the read-only requests (safe methods) to a single
+    replica chosen per request, so all of them see the same state, and the
+    reads of the requests which may write (e.g. recording transactions) to
+    the primary.
+
+    When the stickiness window is enabled (see DATABASE_REPLICATION), the
+    responses of the requests which may write set a cookie for that window,
+    within which the reads of the client are sent to the primary as well, so
+    it reads its own writes regardless of the replication lag.
+
+    It runs asynchronously as well under ASGI, so async views (see
+    transactions.api.async_views) are not forced into a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # tells Django this middleware is async (see MiddlewareMixin)
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        writes, alias = self._choose_database(request)
+        with use_database(alias):
+            response = self.get_response(request)
+        return self._process_response(response, writes, alias)
+
+    async def __acall__(self, request):
+        writes, alias = self._choose_database(request)
+        with use_database(alias):
+            response = await self.get_response(request)
+        return self._process_response(response, writes, alias)
+
+    def _choose_database(self, request) -> Tuple[bool, str]:
+        writes = request.method not in SAFE_METHODS
+        if writes or PRIMARY_COOKIE in request.COOKIES:
+            return writes, PRIMARY
+        return writes, choose_replica()
+
+    def _process_response(self, response, writes: bool, alias: str):
+        if response.streaming:
+            # streamed content is read after the request is handled
+            stream_from = (
+                _astream_from
+                if hasattr(response.streaming_content, "__aiter__")
+                else _stream_from
+            )
+            response.streaming_content = stream_from(
+                alias, response.streaming_content
+            )
+
+        stickiness = settings.DATABASE_REPLICATION["STICKINESS"]
+        if writes and stickiness and get_replicas():
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                "1",
+                max_age=stickiness,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
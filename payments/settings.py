@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "payments.routers.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -87,6 +88,55 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default (primary) database, given as a comma separated
+# list of host[:port] and named replica1, replica2 and so on. Reports and
+# other read-only requests are served by the replicas while writes go to the
+# primary (see payments.routers). STICKINESS is the number of seconds the
+# reads of a client stay on the primary after it writes, 0 for never.
+
+DATABASE_REPLICATION = {
+    "REPLICAS": [],
+    "STICKINESS": int(os.environ.get("DB_REPLICA_STICKINESS", "0")),
+}
+
+for index, address in enumerate(
+    filter(None, os.environ.get("DB_REPLICAS", "").split(",")), start=1
+):
+    host, _, port = address.strip().partition(":")
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICATION["REPLICAS"].append(f"replica{index}")
+
+# Shards holding the companies along with their transactions (see
+# companies.shards), the default database being the first one. The other
+# shards are given as a comma separated list of host[:port][/name] and named
+# shard1, shard2 and so on. Companies moved between shards are recorded in
+# the default database and picked up by the processes within the time to
+# live of their company cache (see COMPANY_CACHE).
+
+DATABASE_SHARDING = {
+    "SHARDS": ["default"],
+}
+
+for index, address in enumerate(
+    filter(None, os.environ.get("DB_SHARDS", "").split(",")), start=1
+):
+    location, _, name = address.strip().partition("/")
+    host, _, port = location.partition(":")
+    DATABASES[f"shard{index}"] = {
+        **DATABASES["default"],
+        "NAME": name or DATABASES["default"]["NAME"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+    }
+    DATABASE_SHARDING["SHARDS"].append(f"shard{index}")
+
+DATABASE_ROUTERS = ["payments.routers.DatabaseRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -127,3 +177,102 @@ USE_TZ = True
 STATIC_URL = "/static/"
 
 APPEND_SLASH = False
+
+
+# In-process cache of companies looked up by CNPJ (see companies.cache)
+
+COMPANY_CACHE = {
+    "MAX_SIZE": int(os.environ.get("COMPANY_CACHE_MAX_SIZE", "10000")),
+    "TTL": float(os.environ.get("COMPANY_CACHE_TTL", "300")),
+    "NEGATIVE_TTL": float(os.environ.get("COMPANY_CACHE_NEGATIVE_TTL", "30")),
+    "PREWARM": os.environ.get("COMPANY_CACHE_PREWARM", "true") == "true",
+}
+
+
+# Optional partitioning of the transactions table (see transactions.partitions),
+# applied by the partition_transactions command (the migrations leave the table
+# alone and a system check warns when it is partitioned otherwise): "month" for
+# range partitions by creation month (pre-created MONTHS_AHEAD months ahead, see
+# create_transaction_partitions), "company" for HASH_PARTITIONS hash partitions
+# by company or empty for none
+
+TRANSACTIONS_PARTITIONING = {
+    "SCHEME": os.environ.get("TRANSACTIONS_PARTITIONING", ""),
+    "HASH_PARTITIONS": int(
+        os.environ.get("TRANSACTIONS_HASH_PARTITIONS", "16")
+    ),
+    "MONTHS_AHEAD": int(
+        os.environ.get("TRANSACTIONS_PARTITIONS_MONTHS_AHEAD", "3")
+    ),
+}
+
+
+# Optional write-behind queue of the transactions recorded by the API (see
+# transactions.queue): when a directory is set, each server process appends
+# the transactions to a durable log in it, flushed to the database every
+# FLUSH_INTERVAL seconds in batches of BATCH_SIZE transactions
+
+TRANSACTIONS_QUEUE = {
+    "DIRECTORY": os.environ.get("TRANSACTIONS_QUEUE_DIRECTORY", ""),
+    "SEGMENT_SIZE": int(
+        os.environ.get("TRANSACTIONS_QUEUE_SEGMENT_SIZE", str(16 * 1024**2))
+    ),
+    "BATCH_SIZE": int(os.environ.get("TRANSACTIONS_QUEUE_BATCH_SIZE", "5000")),
+    "FLUSH_INTERVAL": float(
+        os.environ.get("TRANSACTIONS_QUEUE_FLUSH_INTERVAL", "1")
+    ),
+}
+
+
+# Optional group commit of the transactions recorded by the API (see
+# transactions.batching): when WINDOW (in seconds, e.g. 0.002) is set, the
+# transactions recorded by concurrent requests of a process within the
+# window are inserted together, up to MAX_SIZE transactions at once, failing
+# the ones whose batch is not written within WRITE_TIMEOUT seconds after the
+# window
+
+TRANSACTIONS_BATCHING = {
+    "WINDOW": float(os.environ.get("TRANSACTIONS_BATCHING_WINDOW", "0")),
+    "MAX_SIZE": int(os.environ.get("TRANSACTIONS_BATCHING_MAX_SIZE", "100")),
+    "WRITE_TIMEOUT": float(
+        os.environ.get("TRANSACTIONS_BATCHING_WRITE_TIMEOUT", "30")
+    ),
+}
+
+
+# Native async views for recording transactions and for the reports (see
+# transactions.api.async_views), served in place of the synchronous ones when
+# VIEWS is true, which is meant for ASGI servers. They query the databases
+# through pools of up to POOL_SIZE asynchronous connections per database in
+# each process (see payments.aiodb).
+
+ASYNC_API = {
+    "VIEWS": os.environ.get("ASYNC_API_VIEWS", "false") == "true",
+    "POOL_SIZE": int(os.environ.get("ASYNC_API_POOL_SIZE", "10")),
+}
+
+
+# Cache of rendered reports (see transactions.cache). Any Django cache
+# backend can be used, e.g. django.core.cache.backends.filebased.FileBasedCache
+# with a directory as location, so reports are shared by all the processes.
+
+REPORT_CACHE_ALIAS = "reports"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    REPORT_CACHE_ALIAS: {
+        "BACKEND": os.environ.get(
+            "REPORT_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("REPORT_CACHE_LOCATION", "reports"),
+        "TIMEOUT": float(os.environ.get("REPORT_CACHE_TIMEOUT", "300")),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(
+                os.environ.get("REPORT_CACHE_MAX_ENTRIES", "1000")
+            ),
+        },
+    },
+}
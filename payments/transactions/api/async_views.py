@@ -0,0 +1,271 @@
+"""
+Native async counterparts of the views recording transactions and serving
+the reports, routed in place of them when ASYNC_API["VIEWS"] is set (see
+transactions.api.urls) and meant to be served by an ASGI server. They take
+the same requests and give the same responses, but await the databases
+through payments.aiodb, so a worker holds any number of requests waiting on
+slow queries instead of a thread for each of them.
+
+Neither the ORM nor DRF run asynchronously in their current versions, so the
+queries are built with the ORM and run by payments.aiodb, and the requests
+are parsed and the responses rendered (as JSON only) with the DRF parsers
+and renderer.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, router
+from django.db.models import Sum
+from django.http import (
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseNotModified,
+)
+
+from companies.cache import CachedCompany, company_cache
+from payments import aiodb
+from payments.handlers import AsyncStreamingHttpResponse
+from payments.routers import use_shard
+from pycpfcnpj.cpfcnpj import validate as cnpj_is_valid
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from transactions.api.etags import etag_matches
+from transactions.api.filters import NO_WINDOW, InvalidFilter
+from transactions.api.pagination import InvalidPage
+from transactions.api.serializers import TransactionIngestSerializer
+from transactions.api.streaming import astream_report
+from transactions.api.views import (
+    STREAM_CONTENT_TYPE,
+    STREAM_PAGE,
+    TransactionsReportMixin,
+)
+from transactions.models import Transaction
+from transactions.queue import transaction_queue
+from transactions.utils import build_transaction, is_unknown_company
+
+
+async def get_company(cnpj: str) -> Optional[CachedCompany]:
+    """
+    Gets the company with the given CNPJ from the cache, querying the
+    database (in the thread of the synchronous code) only when it is not
+    cached (see companies.cache)
+    """
+    cached, company = company_cache.get_cached(cnpj)
+    if cached:
+        return company
+    return await sync_to_async(company_cache.get, thread_sensitive=True)(cnpj)
+
+
+class AsyncAPIView:
+    """
+    Base async view, dispatching the requests to the coroutine handling
+    their method and rendering the data of the responses as JSON. Being
+    async, its views are only served asynchronously under ASGI.
+    """
+
+    http_method_names = ("get", "post")
+    renderer = JSONRenderer()
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            method = "get" if request.method == "HEAD" else request.method
+            handler = getattr(self, method.lower(), None)
+            if method.lower() not in cls.http_method_names or not handler:
+                allowed = [
+                    name.upper()
+                    for name in cls.http_method_names
+                    if hasattr(cls, name)
+                ]
+                return HttpResponseNotAllowed(allowed)
+            return await handler(request, *args, **kwargs)
+
+        view.view_class = cls
+        # as the DRF views, which do not authenticate with sessions here
+        view.csrf_exempt = True
+        return view
+
+    def respond(self, data, status: int) -> HttpResponse:
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status,
+            content_type=self.renderer.media_type,
+        )
+
+
+class AsyncRecordTransactionView(AsyncAPIView):
+    serializer_class = TransactionIngestSerializer
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    queue = transaction_queue
+
+    def _return_error_response(self, status):
+        return self.respond({"aceito": False}, status)
+
+    def _parse(self, request):
+        # the body is read by the ASGI handler before the view is called,
+        # so it is parsed without blocking
+        parsers = [parser() for parser in self.parser_classes]
+        return Request(request, parsers=parsers).data
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = self._parse(request)
+        except APIException as exc:
+            return self.respond({"detail": exc.detail}, exc.status_code)
+
+        serializer = self.serializer_class(data=data)
+        if not serializer.is_valid():
+            return self._return_error_response(status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        company = await get_company(data["cnpj"])
+        if company is None:
+            return self._return_error_response(status.HTTP_404_NOT_FOUND)
+
+        transaction = build_transaction(company.id, data)
+        if self.queue.is_open:
+            # accepted once written (and synced) to the queue, in a thread
+            put = sync_to_async(self.queue.put, thread_sensitive=False)
+            await put(transaction, company.cnpj)
+            return self.respond({"aceito": True}, status.HTTP_201_CREATED)
+
+        try:
+            with use_shard(company.shard):
+                using = router.db_for_write(Transaction)
+                await aiodb.insert([transaction], using)
+        except IntegrityError as exc:
+            if not is_unknown_company(exc):
+                raise
+            # the cached company no longer exists
+            company_cache.invalidate(data["cnpj"], company_id=company.id)
+            return self._return_error_response(status.HTTP_404_NOT_FOUND)
+
+        return self.respond({"aceito": True}, status.HTTP_201_CREATED)
+
+
+class AsyncCompanyRetrieveView(AsyncAPIView, ABC):
+    """
+    Base async view for retrieving data of the company informed by the
+    `cnpj` query parameter, as CompanyRetrieveView
+    """
+
+    http_method_names = ("get",)
+
+    def _return_error_response(self, status, message):
+        return self.respond({"erro": message}, status)
+
+    async def get(self, request, *args, **kwargs):
+        http_status = status.HTTP_400_BAD_REQUEST
+        cnpj = request.GET.get("cnpj", None)
+        if not cnpj:
+            message = (
+                "O parametro obrigatorio 'cnpj' nao foi incluido "
+                "na query string"
+            )
+            return self._return_error_response(http_status, message)
+
+        elif not cnpj_is_valid(cnpj):
+            message = "Informe um 'cnpj' valido"
+            return self._return_error_response(http_status, message)
+
+        company = await get_company(cnpj)
+
+        if not company:
+            message = f"Estabelecimento com cnpj '{cnpj}' nao encontrado"
+            http_status = status.HTTP_404_NOT_FOUND
+            return self._return_error_response(http_status, message)
+
+        kwargs.update({"company": company})
+        with use_shard(company.shard):
+            return await self.retrieve(request, *args, **kwargs)
+
+    @abstractmethod
+    async def retrieve(self, request, *args, **kwargs):
+        """
+        Responds with the data of the company found, given as the `company`
+        keyword argument (a companies.cache.CachedCompany), within its shard
+        """
+
+
+class AsyncTransactionsReportView(
+    TransactionsReportMixin, AsyncCompanyRetrieveView
+):
+    async def _get_summary(self, company) -> Tuple[int, Optional[int]]:
+        rows = await aiodb.fetch(self._get_summary_queryset(company)[:1])
+        return rows[0] if rows else (0, None)
+
+    async def _get_total(self, transactions, window, summary_total):
+        if window == NO_WINDOW:
+            return summary_total
+
+        rows = await aiodb.fetch(
+            transactions.order_by()
+            .values("company_id")
+            .annotate(total=Sum("value"))
+            .values_list("total")
+        )
+        return rows[0][0] if rows else None
+
+    async def _render(self, company, transactions, limit, position, total):
+        rows = await aiodb.fetch(
+            self._get_page_queryset(transactions, limit, position)
+        )
+        rows, next_cursor = self.pagination.get_page(rows, limit)
+        return self.encoder.encode_report(company, rows, total, next_cursor)
+
+    async def _respond(self, company, version, summary_total, window, page):
+        transactions = self._get_transactions(company, window)
+        if page == STREAM_PAGE:
+            return AsyncStreamingHttpResponse(
+                astream_report(
+                    company,
+                    transactions.using(transactions.db),
+                    self.stream_chunk_size,
+                    self.encoder,
+                ),
+                content_type=STREAM_CONTENT_TYPE,
+            )
+
+        limit, position = page
+        key = self._make_cache_key(company, version, window, limit, position)
+        body = self.report_cache.get(key)
+        if body is None:
+            total_value = await self._get_total(
+                transactions, window, summary_total
+            )
+            body = await self._render(
+                company, transactions, limit, position, total_value
+            )
+            self.report_cache.set(key, body)
+        return HttpResponse(body, content_type=self.renderer.media_type)
+
+    async def retrieve(self, request, *args, **kwargs):
+        company = kwargs["company"]
+        try:
+            window, page = self._get_requested_page(request)
+        except (InvalidFilter, InvalidPage) as exc:
+            http_status = status.HTTP_400_BAD_REQUEST
+            return self._return_error_response(http_status, str(exc))
+
+        version, summary_total = await self._get_summary(company)
+        etag = self._make_etag(
+            company, version, self.renderer.media_type, window, page
+        )
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = await self._respond(
+                company, version, summary_total, window, page
+            )
+        response["ETag"] = etag
+        return response
@@ -0,0 +1,158 @@
+import json
+import math
+from json.encoder import encode_basestring, encode_basestring_ascii
+from typing import Iterable, Optional, Sequence
+
+from companies.api.fields import DocumentNumberField
+from companies.api.serializers import CompanyReportSerializer
+from rest_framework import serializers
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from transactions.api.fields import CentsField
+from transactions.api.serializers import TransactionReportSerializer
+from transactions.money import CENTS, from_cents
+
+Row = Sequence
+
+
+class ReportEncoder:
+    """
+    Encodes transactions reports straight from (client, value, description)
+    rows, without building model or serializer instances for each
+    transaction. The output is the same as rendering the ReportSerializer
+    data with the JSONRenderer.
+
+    The row template is compiled once out of the TransactionReportSerializer
+    fields, so the fields (and their order) must be fetched as in
+    `row_fields`.
+    """
+
+    def __init__(self, renderer: Optional[JSONRenderer] = None):
+        self.renderer = renderer or JSONRenderer()
+        self.item_separator, self.key_separator = (
+            SHORT_SEPARATORS if self.renderer.compact else LONG_SEPARATORS
+        )
+        self.encode_string = (
+            encode_basestring_ascii
+            if self.renderer.ensure_ascii
+            else encode_basestring
+        )
+
+        fields = TransactionReportSerializer().fields
+        self.row_fields = tuple(field.source for field in fields.values())
+        self._row_template = (
+            "{"
+            + self.item_separator.join(
+                f"{self.encode_string(name)}{self.key_separator}%s"
+                for name in fields
+            )
+            + "}"
+        )
+        self._value_encoders = tuple(
+            self._get_value_encoder(field) for field in fields.values()
+        )
+
+    def _get_value_encoder(self, field):
+        if isinstance(field, CentsField):
+            return self._encode_cents
+        if isinstance(field, serializers.FloatField):
+            return self._encode_float
+        if isinstance(field, DocumentNumberField):
+            return lambda value: self.encode_string(field.format(value))
+        return self._encode_str
+
+    def _encode_str(self, value) -> str:
+        return self.encode_string(str(value))
+
+    def _encode_cents(self, value) -> str:
+        # integer cents always make a finite float
+        return float.__repr__(value / CENTS)
+
+    def _encode_float(self, value) -> str:
+        value = float(value)
+        if math.isfinite(value):
+            return float.__repr__(value)
+        return self._dumps(value).decode()
+
+    def _dumps(self, value) -> bytes:
+        return json.dumps(
+            value,
+            ensure_ascii=self.renderer.ensure_ascii,
+            allow_nan=not self.renderer.strict,
+        ).encode()
+
+    def _key(self, name: str) -> bytes:
+        return f"{self.encode_string(name)}{self.key_separator}".encode()
+
+    def _finish(self, encoded: str) -> bytes:
+        # the same escaping applied by the JSONRenderer
+        return (
+            encoded.replace("\u2028", "\\u2028")
+            .replace("\u2029", "\\u2029")
+            .encode()
+        )
+
+    def encode_rows(self, rows: Iterable[Row]) -> bytes:
+        """
+        Encodes rows into the items of the transactions list, encoding each
+        column at once
+        """
+        template = self._row_template
+        encoders = self._value_encoders
+        encoded = self.item_separator.join(
+            [
+                template
+                % tuple(
+                    [encode(value) for encode, value in zip(encoders, row)]
+                )
+                for row in rows
+            ]
+        )
+        return self._finish(encoded)
+
+    def encode_head(self, company) -> bytes:
+        """Encodes the start of a report, up to its transactions list"""
+        company_data = CompanyReportSerializer(company).data
+        return (
+            b"{"
+            + self._key("estabelecimento")
+            + self.renderer.render(company_data)
+            + self.item_separator.encode()
+            + self._key("recebimentos")
+            + b"["
+        )
+
+    def encode_tail(
+        self, total_value: Optional[int], next_cursor: Optional[str]
+    ) -> bytes:
+        """
+        Encodes the end of a report, after its transactions list, out of the
+        total value in cents
+        """
+        total_value = (
+            from_cents(total_value) if total_value is not None else 0.00
+        )
+        item_separator = self.item_separator.encode()
+        return (
+            b"]"
+            + item_separator
+            + self._key("total_recebido")
+            + self._dumps(total_value)
+            + item_separator
+            + self._key("proximo_cursor")
+            + self._dumps(next_cursor)
+            + b"}"
+        )
+
+    def encode_report(
+        self,
+        company,
+        rows: Iterable[Row],
+        total_value: Optional[int],
+        next_cursor: Optional[str],
+    ) -> bytes:
+        return (
+            self.encode_head(company)
+            + self.encode_rows(rows)
+            + self.encode_tail(total_value, next_cursor)
+        )
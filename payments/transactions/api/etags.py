@@ -0,0 +1,30 @@
+import hashlib
+
+from django.utils.http import parse_etags
+
+WEAK_PREFIX = "W/"
+
+
+def _opaque_tag(etag: str) -> str:
+    return (
+        etag.replace(WEAK_PREFIX, "", 1) if etag[:2] == WEAK_PREFIX else etag
+    )
+
+
+def make_etag(*parts) -> str:
+    """Builds a strong ETag out of the given parts of a representation"""
+    marker = ":".join(str(part) for part in parts)
+    return f'"{hashlib.sha1(marker.encode()).hexdigest()}"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    """
+    Checks whether the If-None-Match header of the request matches the
+    given ETag, comparing them weakly as required for that header
+    """
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+    return "*" in etags or etag in map(_opaque_tag, etags)
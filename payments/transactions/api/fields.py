@@ -0,0 +1,34 @@
+import math
+
+from companies.api.fields import DocumentNumberField
+from rest_framework import serializers
+from transactions.formats import CPF_DIGITS, format_cpf, normalize_cpf
+from transactions.money import CENTS, from_cents, to_cents
+
+MAX_CENTS = 2**63 - 1
+
+
+class CentsField(serializers.FloatField):
+    """
+    Amount of money represented as a float (e.g. 150.37) and stored as
+    integer cents (e.g. 15037), rounded to the nearest cent
+    """
+
+    def to_internal_value(self, data):
+        amount = super().to_internal_value(data)
+        if not math.isfinite(amount) or abs(amount) * CENTS > MAX_CENTS:
+            self.fail("invalid")
+        return to_cents(amount)
+
+    def to_representation(self, value):
+        return from_cents(value)
+
+
+class CPFField(DocumentNumberField):
+    digits = CPF_DIGITS
+
+    def normalize(self, value) -> str:
+        return normalize_cpf(value)
+
+    def format(self, value) -> str:
+        return format_cpf(value)
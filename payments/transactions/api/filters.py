@@ -0,0 +1,88 @@
+from datetime import datetime, time, timedelta
+from typing import Optional, Tuple
+
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+Window = Tuple[Optional[datetime], Optional[datetime]]
+
+NO_WINDOW = (None, None)
+
+
+class InvalidFilter(Exception):
+    pass
+
+
+class TransactionDateRangeFilter:
+    """
+    Filters transactions by their creation time (or rollups by the start of
+    their buckets, see `field_name`), between the optional `inicio` and
+    `fim` query parameters (both included). Each one may be a date, standing
+    for the whole day, or a datetime, which is taken in the current time
+    zone when it has no offset. An end at the last representable day (e.g.
+    9999-12-31) leaves the window open.
+
+    The window is kept as a [start, end) range, so it is filtered with the
+    (company, created_at) index (or the (company, bucket) one of rollups) as
+    a range scan.
+    """
+
+    start_query_param = "inicio"
+    end_query_param = "fim"
+
+    def __init__(self, field_name: str = "created_at"):
+        self.field_name = field_name
+
+    def _parse(self, request, param: str, is_end: bool) -> Optional[datetime]:
+        value = request.GET.get(param)
+        if value is None:
+            return None
+
+        try:
+            parsed = parse_datetime(value)
+            date = parse_date(value) if parsed is None else None
+        except ValueError:
+            parsed = date = None
+
+        try:
+            if parsed is not None:
+                # datetimes are stored with microseconds precision
+                moment = (
+                    parsed + timedelta(microseconds=1) if is_end else parsed
+                )
+            elif date is not None:
+                moment = datetime.combine(
+                    date + timedelta(days=1) if is_end else date, time.min
+                )
+            else:
+                raise InvalidFilter(
+                    f"Informe um '{param}' valido (AAAA-MM-DD ou "
+                    "AAAA-MM-DDTHH:MM:SS)"
+                )
+        except OverflowError:
+            # the end of the last representable day leaves the window open
+            return None
+
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def get_window(self, request) -> Window:
+        """Gets the requested [start, end) window, if any"""
+        start = self._parse(request, self.start_query_param, is_end=False)
+        end = self._parse(request, self.end_query_param, is_end=True)
+        if start is not None and end is not None and start >= end:
+            raise InvalidFilter(
+                f"O '{self.start_query_param}' deve ser anterior ao "
+                f"'{self.end_query_param}'"
+            )
+        return start, end
+
+    def filter_queryset(self, queryset: QuerySet, window: Window) -> QuerySet:
+        start, end = window
+        if start is not None:
+            queryset = queryset.filter(**{f"{self.field_name}__gte": start})
+        if end is not None:
+            queryset = queryset.filter(**{f"{self.field_name}__lt": end})
+        return queryset
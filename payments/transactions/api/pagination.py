@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from django.db.models import Q, QuerySet
+
+Cursor = Tuple[datetime, UUID]
+
+
+class InvalidPage(Exception):
+    pass
+
+
+class TransactionKeysetPagination:
+    """
+    Paginates transactions by their (created_at, id) key. The cursor points
+    to the last transaction of a page, so the pages already read are not
+    shifted by the transactions recorded meanwhile. As created_at is the
+    time a transaction was accepted (or informed, when imported), rather
+    than the time it was committed, the transactions committed late (e.g.
+    by the group commit or the write-behind queue) or imported with an
+    earlier creation time may fall before a cursor already handed out,
+    being left out of the pages read after it.
+
+    Transactions are paginated as rows (see QuerySet.values_list) ending
+    with their (created_at, id) key.
+    """
+
+    default_limit = 100
+    max_limit = 1000
+    limit_query_param = "limite"
+    cursor_query_param = "cursor"
+    ordering = ("created_at", "id")
+
+    def encode_cursor(self, position: Cursor) -> str:
+        created_at, transaction_id = position
+        position = [created_at.isoformat(), str(transaction_id)]
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode())
+        return encoded.decode("ascii")
+
+    def decode_cursor(self, cursor: str) -> Cursor:
+        try:
+            decoded = base64.urlsafe_b64decode(cursor.encode("ascii"))
+            created_at, transaction_id = json.loads(decoded)
+            return datetime.fromisoformat(created_at), UUID(transaction_id)
+        except (TypeError, ValueError):
+            raise InvalidPage("Informe um 'cursor' valido")
+
+    def get_limit(self, request) -> int:
+        limit = request.GET.get(self.limit_query_param)
+        if limit is None:
+            return self.default_limit
+
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+
+        if not 0 < limit <= self.max_limit:
+            raise InvalidPage(
+                f"Informe um '{self.limit_query_param}' entre 1 e "
+                f"{self.max_limit}"
+            )
+        return limit
+
+    def get_position(self, request) -> Optional[Cursor]:
+        """Gets the decoded cursor of the requested page, if any"""
+        cursor = request.GET.get(self.cursor_query_param)
+        return self.decode_cursor(cursor) if cursor else None
+
+    def page_queryset(
+        self, queryset: QuerySet, limit: int, position: Optional[Cursor]
+    ) -> QuerySet:
+        """
+        Gets the rows of the page of the given transactions rows starting
+        after the given position, along with the first row of the next page
+        if any, which tells whether there is one (see get_page)
+        """
+        if position is not None:
+            created_at, transaction_id = position
+            # the plain lower bound lets the index range scan (and the
+            # pruning of monthly partitions) start at the cursor
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at)
+                | Q(created_at=created_at, id__gt=transaction_id)
+            )
+
+        return queryset.order_by(*self.ordering)[: limit + 1]
+
+    def get_page(
+        self, rows: List[Tuple], limit: int
+    ) -> Tuple[List[Tuple], Optional[str]]:
+        """
+        Gets the page out of the fetched rows of a page queryset (see
+        page_queryset) along with the cursor of the next page (None when it
+        is the last one)
+        """
+        if len(rows) <= limit:
+            return rows, None
+
+        page = rows[:limit]
+        return page, self.encode_cursor(page[-1][-2:])
+
+    def paginate_queryset(
+        self, queryset: QuerySet, limit: int, position: Optional[Cursor]
+    ) -> Tuple[List[Tuple], Optional[str]]:
+        """
+        Gets a page of the given transactions rows, starting after the given
+        position (see get_limit and get_position), returning it along with
+        the cursor of the next page (None when it is the last one)
+        """
+        rows = list(self.page_queryset(queryset, limit, position))
+        return self.get_page(rows, limit)
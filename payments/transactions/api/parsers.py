@@ -0,0 +1,43 @@
+import gzip
+from io import BytesIO
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+GZIP_ENCODING = "gzip"
+
+
+class GzipJSONParser(JSONParser):
+    """
+    Parses JSON request bodies which may be gzip compressed, as announced by
+    the Content-Encoding header
+    """
+
+    def _decompress(self, stream):
+        max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        try:
+            with gzip.GzipFile(fileobj=stream) as gzip_file:
+                content = gzip_file.read(
+                    -1 if max_size is None else max_size + 1
+                )
+        except (OSError, EOFError) as exc:
+            raise ParseError(f"Gzip decompression error - {str(exc)}")
+
+        if max_size is not None and len(content) > max_size:
+            raise ParseError("Decompressed request body is too large")
+
+        return BytesIO(content)
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context.get("request")
+        content_encoding = (
+            request.META.get("HTTP_CONTENT_ENCODING", "") if request else ""
+        )
+
+        if content_encoding.lower() == GZIP_ENCODING:
+            stream = self._decompress(stream)
+
+        return super().parse(stream, media_type, parser_context)
@@ -1,13 +1,16 @@
+from companies.api.fields import CNPJField
 from companies.api.serializers import CompanyReportSerializer
-from companies.models import Company
 from rest_framework import serializers
-from transactions.models import Transaction
+from transactions.api.fields import CentsField, CPFField
+from transactions.models import CPF_SIZE, DESCRIPTION_LENGTH, Transaction
+from transactions.money import from_cents
+from transactions.validators import cpf_validator
 
 
 class TransactionSerializer(serializers.ModelSerializer):
-    estabelecimento = serializers.CharField(source="company.cnpj")
-    cliente = serializers.CharField(source="client")
-    valor = serializers.FloatField(source="value")
+    estabelecimento = CNPJField(source="company.cnpj")
+    cliente = CPFField(source="client", max_length=CPF_SIZE)
+    valor = CentsField(source="value")
     descricao = serializers.CharField(source="description")
 
     class Meta:
@@ -21,25 +24,56 @@ class TransactionReportSerializer(TransactionSerializer):
         fields = ["cliente", "valor", "descricao"]
 
 
-class WritableTransactionSerializer(TransactionSerializer):
-    estabelecimento = serializers.PrimaryKeyRelatedField(
-        source="company", queryset=Company.objects.all()
+class TransactionIngestSerializer(serializers.Serializer):
+    """
+    Validates an incoming transaction in a single pass, applying the same
+    rules enforced by the Transaction model so it can be inserted without
+    being cleaned again
+    """
+
+    estabelecimento = serializers.CharField(source="cnpj")
+    cliente = CPFField(
+        source="client", max_length=CPF_SIZE, validators=[cpf_validator]
+    )
+    valor = CentsField(source="value")
+    descricao = serializers.CharField(
+        source="description", max_length=DESCRIPTION_LENGTH
     )
 
 
+class TransactionImportSerializer(TransactionIngestSerializer):
+    """
+    Validates a transaction imported from a file, which may carry the time
+    it was originally created at
+    """
+
+    criado_em = serializers.DateTimeField(source="created_at", required=False)
+
+
 class ReportSerializer(serializers.Serializer):
-    estabelecimento = serializers.SerializerMethodField("get_company")
-    recebimentos = serializers.SerializerMethodField("get_transactions")
+    estabelecimento = CompanyReportSerializer(source="company")
+    recebimentos = TransactionReportSerializer(
+        source="transactions", many=True
+    )
     total_recebido = serializers.SerializerMethodField("get_total")
+    proximo_cursor = serializers.CharField(
+        source="next_cursor", allow_null=True
+    )
 
-    def get_company(self, instance):
-        return CompanyReportSerializer(instance).data
+    def get_total(self, instance):
+        total = instance["total_value"]
+        return from_cents(total) if total is not None else 0.00
 
-    def get_transactions(self, instance):
-        return TransactionReportSerializer(
-            instance.transactions.all(), many=True
-        ).data
 
-    def get_total(self, instance):
-        total = getattr(instance, "total_value")
-        return total if total is not None else 0.00
+class RollupSerializer(serializers.Serializer):
+    inicio = serializers.DateTimeField(source="bucket")
+    total_recebido = CentsField(source="total_value")
+    recebimentos = serializers.IntegerField(source="transactions_count")
+    menor_valor = CentsField(source="min_value")
+    maior_valor = CentsField(source="max_value")
+
+
+class TimeSeriesSerializer(serializers.Serializer):
+    estabelecimento = CompanyReportSerializer(source="company")
+    intervalo = serializers.CharField(source="interval")
+    serie = RollupSerializer(source="rollups", many=True)
@@ -0,0 +1,72 @@
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from django.db.models import QuerySet
+
+from payments import aiodb
+from transactions.api.encoders import ReportEncoder
+
+STREAM_CHUNK_SIZE = 2000
+
+
+def _get_rows(transactions: QuerySet, encoder: ReportEncoder) -> QuerySet:
+    return transactions.order_by("created_at", "id").values_list(
+        *encoder.row_fields
+    )
+
+
+def stream_report(
+    company,
+    transactions: QuerySet,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    encoder: ReportEncoder = None,
+) -> Iterator[bytes]:
+    """
+    Streams the complete report of a company as JSON, in the same format as
+    the paginated report. Transactions are read as rows through a
+    server-side cursor and encoded one chunk at a time, so memory usage does
+    not grow with the number of transactions. The total is summed (in cents)
+    from the streamed transactions, so it always matches them.
+    """
+    encoder = encoder or ReportEncoder()
+    yield encoder.encode_head(company)
+
+    rows = _get_rows(transactions, encoder).iterator(chunk_size=chunk_size)
+    value_index = encoder.row_fields.index("value")
+    total_value = 0
+    separator = b""
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        total_value += sum(row[value_index] for row in chunk)
+        yield separator + encoder.encode_rows(chunk)
+        separator = encoder.item_separator.encode()
+
+    yield encoder.encode_tail(total_value, None)
+
+
+async def astream_report(
+    company,
+    transactions: QuerySet,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    encoder: ReportEncoder = None,
+) -> AsyncIterator[bytes]:
+    """
+    Streams the complete report as stream_report does, for the async views,
+    reading the transactions through a server-side cursor of payments.aiodb
+    """
+    encoder = encoder or ReportEncoder()
+    yield encoder.encode_head(company)
+
+    rows = aiodb.stream(_get_rows(transactions, encoder), chunk_size)
+    value_index = encoder.row_fields.index("value")
+    total_value = 0
+    separator = b""
+    async for chunk in rows:
+        total_value += sum(row[value_index] for row in chunk)
+        yield separator + encoder.encode_rows(chunk)
+        separator = encoder.item_separator.encode()
+
+    yield encoder.encode_tail(total_value, None)
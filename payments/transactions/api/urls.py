@@ -1,18 +1,39 @@
+from django.conf import settings
 from django.urls import path
 
+from transactions.api.async_views import (
+    AsyncRecordTransactionView,
+    AsyncTransactionsReportView,
+)
 from transactions.api.views import (
+    RecordTransactionsBatchView,
     RecordTransactionView,
     TransactionsReportView,
+    TransactionsTimeSeriesView,
 )
 from transactions.apps import TransactionsConfig
 
 app_name = TransactionsConfig.name
 
+# the native async views are meant for ASGI servers (see ASYNC_API)
+if settings.ASYNC_API["VIEWS"]:
+    record_view = AsyncRecordTransactionView.as_view()
+    report_view = AsyncTransactionsReportView.as_view()
+else:
+    record_view = RecordTransactionView.as_view()
+    report_view = TransactionsReportView.as_view()
+
 urlpatterns = [
-    path("transacao", RecordTransactionView.as_view(), name="transaction"),
+    path("transacao", record_view, name="transaction"),
+    path(
+        "transacoes",
+        RecordTransactionsBatchView.as_view(),
+        name="transactions_batch",
+    ),
+    path("transacoes/estabelecimento", report_view, name="report"),
     path(
-        "transacoes/estabelecimento",
-        TransactionsReportView.as_view(),
-        name="report",
+        "transacoes/estabelecimento/serie",
+        TransactionsTimeSeriesView.as_view(),
+        name="time_series",
     ),
 ]
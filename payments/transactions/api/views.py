@@ -1,69 +1,142 @@
-from copy import deepcopy
+from typing import Optional, Tuple
 
-from django.db.models import Sum
+from django.db import IntegrityError
+from django.db.models import QuerySet, Sum
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 
-from companies.models import Company
+from companies.cache import company_cache
+from payments.routers import use_shard
 from pycpfcnpj.cpfcnpj import validate as cnpj_is_valid
 from rest_framework import status
-from rest_framework.generics import CreateAPIView, RetrieveAPIView
+from rest_framework.generics import (
+    CreateAPIView,
+    GenericAPIView,
+    RetrieveAPIView,
+)
 from rest_framework.response import Response
+from transactions.api.encoders import ReportEncoder
+from transactions.api.etags import etag_matches, make_etag
+from transactions.api.filters import (
+    NO_WINDOW,
+    InvalidFilter,
+    TransactionDateRangeFilter,
+    Window,
+)
+from transactions.api.pagination import (
+    InvalidPage,
+    TransactionKeysetPagination,
+)
+from transactions.api.parsers import GzipJSONParser
 from transactions.api.serializers import (
     ReportSerializer,
-    TransactionSerializer,
-    WritableTransactionSerializer,
+    TimeSeriesSerializer,
+    TransactionIngestSerializer,
+)
+from transactions.api.streaming import STREAM_CHUNK_SIZE, stream_report
+from transactions.batching import transaction_batcher
+from transactions.cache import report_cache
+from transactions.models import (
+    CompanySummary,
+    DailyRollup,
+    HourlyRollup,
+    Transaction,
+)
+from transactions.queue import transaction_queue
+from transactions.utils import (
+    build_transaction,
+    insert_transactions,
+    is_unknown_company,
+    record_transactions,
 )
 
+JSON_FORMAT = "json"
+MAX_BATCH_SIZE = 1000
+STREAM_CONTENT_TYPE = "application/json"
+STREAM_QUERY_PARAM = "completo"
+STREAM_PAGE = (STREAM_QUERY_PARAM,)
+
 
 class RecordTransactionView(CreateAPIView):
-    serializer_class = TransactionSerializer
+    serializer_class = TransactionIngestSerializer
+    queue = transaction_queue
+    batcher = transaction_batcher
 
     def _return_error_response(self, status):
         return Response({"aceito": False}, status=status)
 
-    def create(self, request, *args, **kwargs):
-        data = deepcopy(request.data)
-        data["estabelecimento"] = kwargs.get("company_id")
-
-        serializer = WritableTransactionSerializer(data=data)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
-            self._return_error_response(status.HTTP_400_BAD_REQUEST)
+            return self._return_error_response(status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        company = company_cache.get(data["cnpj"])
+        if company is None:
+            return self._return_error_response(status.HTTP_404_NOT_FOUND)
+
+        transaction = build_transaction(company.id, data)
+        if self.queue.is_open:
+            # accepted once written to the queue, which inserts it later
+            self.queue.put(transaction, company.cnpj)
+            return Response({"aceito": True}, status=status.HTTP_201_CREATED)
 
         try:
-            self.perform_create(serializer)
-        except Exception:
-            return self._return_error_response(status.HTTP_400_BAD_REQUEST)
+            if self.batcher.enabled:
+                # inserted along with the ones of concurrent requests
+                self.batcher.insert(transaction, company.shard)
+            else:
+                with use_shard(company.shard):
+                    insert_transactions([transaction])
+        except IntegrityError as exc:
+            if not is_unknown_company(exc):
+                raise
+            # the cached company no longer exists
+            company_cache.invalidate(data["cnpj"], company_id=company.id)
+            return self._return_error_response(status.HTTP_404_NOT_FOUND)
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(
-            {"aceito": True}, status=status.HTTP_201_CREATED, headers=headers
-        )
+        return Response({"aceito": True}, status=status.HTTP_201_CREATED)
+
+
+class RecordTransactionsBatchView(GenericAPIView):
+    serializer_class = TransactionIngestSerializer
+    parser_classes = [GzipJSONParser]
+
+    def _return_error_response(self, status):
+        return Response({"aceito": False}, status=status)
 
     def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        if not serializer.is_valid():
+        data = request.data
+        if not isinstance(data, list) or not 0 < len(data) <= MAX_BATCH_SIZE:
             return self._return_error_response(status.HTTP_400_BAD_REQUEST)
-        try:
-            company = Company.objects.get(
-                cnpj=request.data.get("estabelecimento")
-            )
-        except Company.DoesNotExist:
-            return self._return_error_response(status.HTTP_404_NOT_FOUND)
 
-        kwargs.update({"company_id": company.id})
-        return self.create(request, *args, **kwargs)
+        accepted = record_transactions(data)
+
+        http_status = (
+            status.HTTP_201_CREATED
+            if any(accepted)
+            else status.HTTP_400_BAD_REQUEST
+        )
+        return Response(
+            [{"aceito": item_accepted} for item_accepted in accepted],
+            status=http_status,
+        )
 
 
-class TransactionsReportView(RetrieveAPIView):
-    serializer_class = ReportSerializer
+class CompanyRetrieveView(RetrieveAPIView):
+    """
+    Base view for retrieving data of the company informed by the `cnpj`
+    query parameter, which is passed to `retrieve` as the `company` keyword
+    argument (see companies.cache). The data is retrieved from the shard of
+    the company (see companies.shards).
+    """
 
     def _return_error_response(self, status, message):
         return Response({"erro": message}, status=status)
 
-    def retrieve(self, request, *args, **kwargs):
-        company = kwargs["company"]
-        serializer = self.get_serializer(company)
-        return Response(serializer.data)
-
     def get(self, request, *args, **kwargs):
         http_status = status.HTTP_400_BAD_REQUEST
         cnpj = request.GET.get("cnpj", None)
@@ -78,12 +151,7 @@ class TransactionsReportView(RetrieveAPIView):
             message = "Informe um 'cnpj' valido"
             return self._return_error_response(http_status, message)
 
-        company = (
-            Company.objects.filter(cnpj=cnpj)
-            .prefetch_related("transactions")
-            .annotate(total_value=Sum("transactions__value"))
-            .first()
-        )
+        company = company_cache.get(cnpj)
 
         if not company:
             message = f"Estabelecimento com cnpj '{cnpj}' nao encontrado"
@@ -91,4 +159,194 @@ class TransactionsReportView(RetrieveAPIView):
             return self._return_error_response(http_status, message)
 
         kwargs.update({"company": company})
-        return self.retrieve(request, *args, **kwargs)
+        with use_shard(company.shard):
+            return self.retrieve(request, *args, **kwargs)
+
+
+class TransactionsReportMixin:
+    """
+    Parameters and queries of the transactions report, shared by the report
+    view and its async counterpart (see transactions.api.async_views)
+    """
+
+    pagination = TransactionKeysetPagination()
+    date_range = TransactionDateRangeFilter()
+    stream_chunk_size = STREAM_CHUNK_SIZE
+    encoder = ReportEncoder()
+    report_cache = report_cache
+
+    def _get_requested_page(self, request) -> Tuple[Window, Tuple]:
+        window = self.date_range.get_window(request)
+        if request.GET.get(STREAM_QUERY_PARAM) == "true":
+            return window, STREAM_PAGE
+
+        page = (
+            self.pagination.get_limit(request),
+            self.pagination.get_position(request),
+        )
+        return window, page
+
+    def _get_transactions(self, company, window: Window) -> QuerySet:
+        return self.date_range.filter_queryset(
+            Transaction.objects.filter(company_id=company.id), window
+        )
+
+    def _get_summary_queryset(self, company) -> QuerySet:
+        return CompanySummary.objects.filter(
+            company_id=company.id
+        ).values_list("version", "total_value")
+
+    def _get_page_queryset(self, transactions, limit, position) -> QuerySet:
+        rows = transactions.values_list(
+            *self.encoder.row_fields, "created_at", "id"
+        )
+        return self.pagination.page_queryset(rows, limit, position)
+
+    def _make_etag(self, company, version, media_type, window, page) -> str:
+        # the summary version changes along with the transactions, so it
+        # tells whether the client already has this report
+        return make_etag(*company, version, media_type, *window, *page)
+
+    def _make_cache_key(self, company, version, window, limit, position):
+        cursor = position and self.pagination.encode_cursor(position)
+        return self.report_cache.make_key(
+            company, version, *window, limit, cursor
+        )
+
+
+class TransactionsReportView(TransactionsReportMixin, CompanyRetrieveView):
+    serializer_class = ReportSerializer
+
+    def _stream(self, company, transactions):
+        # the transactions are streamed once the view returns, outside of
+        # the shard of the company
+        transactions = transactions.using(transactions.db)
+        return StreamingHttpResponse(
+            stream_report(
+                company, transactions, self.stream_chunk_size, self.encoder
+            ),
+            content_type=STREAM_CONTENT_TYPE,
+        )
+
+    def _get_summary(self, company) -> Tuple[int, Optional[int]]:
+        return self._get_summary_queryset(company).first() or (0, None)
+
+    def _get_total(self, transactions, window, summary_total):
+        if window == NO_WINDOW:
+            return summary_total
+        return transactions.aggregate(total=Sum("value"))["total"]
+
+    def _get_page(self, transactions, limit, position):
+        rows = list(self._get_page_queryset(transactions, limit, position))
+        return self.pagination.get_page(rows, limit)
+
+    def _render(self, company, transactions, limit, position, total_value):
+        rows, next_cursor = self._get_page(transactions, limit, position)
+        # fast path, encoding the rows without serializer instances
+        return self.encoder.encode_report(
+            company, rows, total_value, next_cursor
+        )
+
+    def _respond(self, request, company, version, summary_total, window, page):
+        transactions = self._get_transactions(company, window)
+        if page == STREAM_PAGE:
+            return self._stream(company, transactions)
+
+        limit, position = page
+        if request.accepted_renderer.format == JSON_FORMAT:
+            key = self._make_cache_key(
+                company, version, window, limit, position
+            )
+            body = self.report_cache.get(key)
+            if body is None:
+                total_value = self._get_total(
+                    transactions, window, summary_total
+                )
+                body = self._render(
+                    company, transactions, limit, position, total_value
+                )
+                self.report_cache.set(key, body)
+            return HttpResponse(
+                body, content_type=request.accepted_renderer.media_type
+            )
+
+        rows, next_cursor = self._get_page(transactions, limit, position)
+        report = {
+            "company": company,
+            "transactions": [
+                dict(zip(self.encoder.row_fields, row)) for row in rows
+            ],
+            "total_value": self._get_total(
+                transactions, window, summary_total
+            ),
+            "next_cursor": next_cursor,
+        }
+        serializer = self.get_serializer(report)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        company = kwargs["company"]
+        try:
+            window, page = self._get_requested_page(request)
+        except (InvalidFilter, InvalidPage) as exc:
+            http_status = status.HTTP_400_BAD_REQUEST
+            return self._return_error_response(http_status, str(exc))
+
+        version, summary_total = self._get_summary(company)
+        etag = self._make_etag(
+            company,
+            version,
+            request.accepted_renderer.media_type,
+            window,
+            page,
+        )
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = self._respond(
+                request, company, version, summary_total, window, page
+            )
+        response["ETag"] = etag
+        return response
+
+
+class TransactionsTimeSeriesView(CompanyRetrieveView):
+    """
+    Serves the time series of the transactions of a company out of its
+    hourly or daily rollups, so the cost grows with the number of buckets
+    instead of the number of transactions
+    """
+
+    serializer_class = TimeSeriesSerializer
+    date_range = TransactionDateRangeFilter(field_name="bucket")
+    interval_query_param = "intervalo"
+    intervals = {"hora": HourlyRollup, "dia": DailyRollup}
+    default_interval = "dia"
+
+    def retrieve(self, request, *args, **kwargs):
+        company = kwargs["company"]
+        http_status = status.HTTP_400_BAD_REQUEST
+
+        interval = request.GET.get(
+            self.interval_query_param, self.default_interval
+        )
+        rollup = self.intervals.get(interval)
+        if rollup is None:
+            choices = " ou ".join(f"'{choice}'" for choice in self.intervals)
+            message = (
+                f"Informe um '{self.interval_query_param}' valido ({choices})"
+            )
+            return self._return_error_response(http_status, message)
+
+        try:
+            window = self.date_range.get_window(request)
+        except InvalidFilter as exc:
+            return self._return_error_response(http_status, str(exc))
+
+        rollups = self.date_range.filter_queryset(
+            rollup.objects.filter(company_id=company.id), window
+        ).order_by("bucket")
+        serializer = self.get_serializer(
+            {"company": company, "interval": interval, "rollups": rollups}
+        )
+        return Response(serializer.data)
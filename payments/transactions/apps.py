@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TransactionsConfig(AppConfig):
     name = "transactions"
+
+    def ready(self):
+        from transactions import checks, signals  # noqa: F401
@@ -0,0 +1,145 @@
+import threading
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from payments.routers import use_shard
+from transactions.models import Transaction
+from transactions.utils import insert_transactions
+
+Item = TypeVar("Item")
+
+# seconds an insert waits for the write of its batch, after the window
+WRITE_TIMEOUT = 30.0
+
+
+class BatchWriteError(Exception):
+    """Raised for the items whose batch could not be told as written"""
+
+
+class _Entry(Generic[Item]):
+    __slots__ = ("item", "error", "written", "done")
+
+    def __init__(self, item: Item):
+        self.item = item
+        self.error: Optional[Exception] = None
+        self.written = False
+        self.done = threading.Event()
+
+
+class _Batch:
+    __slots__ = ("entries", "full")
+
+    def __init__(self):
+        self.entries: List[_Entry] = []
+        self.full = threading.Event()
+
+
+class InsertBatcher(Generic[Item]):
+    """
+    Group commit of the inserts of concurrent requests (threads) of a
+    process. The first insert into a database opens a batch and waits up to
+    `window` seconds, or until `max_size` items joined it, for the inserts
+    of other threads, writing them all with `write` (e.g. a single multi-row
+    insert and commit) on behalf of the others, which wait for it. A batch
+    which fails to be written for the integrity of one of its items is
+    written again one item at a time, so each insert gets its own result:
+    `insert` returns once the item is written or raises its error. An item
+    whose write was cut short, or which is still not written `write_timeout`
+    seconds after the window, raises BatchWriteError instead, so no insert
+    returns without its item being written.
+
+    The latency of an insert grows by up to the window, in exchange for
+    sharing the round trips and the commit (the flush of the WAL) of the
+    database with the concurrent ones.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Item], str], None],
+        window: float,
+        max_size: int,
+        write_timeout: float = WRITE_TIMEOUT,
+    ):
+        self.write = write
+        self.window = window
+        self.max_size = max_size
+        self.write_timeout = write_timeout
+        self._batches: Dict[str, _Batch] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_size > 1
+
+    def insert(self, item: Item, using: str):
+        """Inserts an item into the given database along with a batch"""
+        entry = _Entry(item)
+        with self._lock:
+            batch = self._batches.get(using)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batches[using] = _Batch()
+            batch.entries.append(entry)
+            if len(batch.entries) >= self.max_size:
+                # closed, the next insert opens another batch
+                del self._batches[using]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(using) is batch:
+                    del self._batches[using]
+            self._write(batch.entries, using)
+        elif not entry.done.wait(self.window + self.write_timeout):
+            raise BatchWriteError("Timed out waiting for the batch write")
+
+        if entry.error is not None:
+            raise entry.error
+
+    def _write(self, entries: List[_Entry], using: str):
+        try:
+            try:
+                self.write([entry.item for entry in entries], using)
+            except IntegrityError:
+                if len(entries) == 1:
+                    raise
+                for entry in entries:
+                    try:
+                        self.write([entry.item], using)
+                    except IntegrityError as exc:
+                        entry.error = exc
+                    else:
+                        entry.written = True
+            else:
+                for entry in entries:
+                    entry.written = True
+        except Exception as exc:
+            # the items written one at a time before the error keep their
+            # result
+            for entry in entries:
+                if not entry.written:
+                    entry.error = entry.error or exc
+        finally:
+            # e.g. the leader was interrupted (SystemExit, KeyboardInterrupt)
+            for entry in entries:
+                if not entry.written and entry.error is None:
+                    entry.error = BatchWriteError("The batch was not written")
+                entry.done.set()
+
+
+def write_transactions(transactions: List[Transaction], shard: str):
+    # atomic, so a failed batch is rolled back on its own even within an
+    # outer transaction
+    with use_shard(shard), transaction.atomic(using=shard):
+        insert_transactions(transactions)
+
+
+transaction_batcher = InsertBatcher(
+    write_transactions,
+    window=settings.TRANSACTIONS_BATCHING["WINDOW"],
+    max_size=settings.TRANSACTIONS_BATCHING["MAX_SIZE"],
+    write_timeout=settings.TRANSACTIONS_BATCHING["WRITE_TIMEOUT"],
+)
@@ -0,0 +1,85 @@
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from companies.formats import normalize_cnpj
+
+
+def _key_part(param) -> str:
+    if param is None:
+        return ""
+    if isinstance(param, datetime):
+        return param.isoformat()
+    return str(param)
+
+
+class ReportCache:
+    """
+    Caches rendered reports in one of the Django caches (see the CACHES
+    setting), keyed by the CNPJ and id of the company (so a company recreated
+    with the same CNPJ does not get the reports of the former one), its
+    shard (as the summary versions are counted by each shard), the version
+    of its summary and the requested page.
+
+    The summary version is bumped by the database triggers whenever a
+    transaction of the company is recorded, so a cached report is served
+    until the version changes and stale ones are never looked up again,
+    being left to expire. Changes to the company itself are only picked up
+    once the report expires.
+
+    Hits and misses are counted per process.
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, company, version: int, *page) -> str:
+        """
+        Builds the key of the report of the given version of a company
+        summary. The page parameters must be normalized (e.g. a parsed limit
+        and a re-encoded cursor), so they are safe to be part of a key.
+        Datetimes and None are encoded so the key has no spaces.
+        """
+        page_key = ":".join(_key_part(param) for param in page)
+        cnpj = normalize_cnpj(company.cnpj)
+        return (
+            f"report:{cnpj}:{company.id}:{company.shard}:{version}:{page_key}"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self.cache.get(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes):
+        self.cache.set(key, body)
+
+    def clear(self):
+        self.cache.clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+report_cache = ReportCache(settings.REPORT_CACHE_ALIAS)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from companies.shards import get_shards
+from transactions.partitions import SCHEMES, get_table_scheme
+
+
+def _get_setting():
+    return settings.TRANSACTIONS_PARTITIONING["SCHEME"] or None
+
+
+@register()
+def check_partitioning_scheme(app_configs, **kwargs):
+    scheme = _get_setting()
+    if scheme is not None and scheme not in SCHEMES:
+        return [
+            Error(
+                f"Unknown transactions partitioning scheme {scheme!r}",
+                hint=f"Use one of {', '.join(map(repr, SCHEMES))} or none.",
+                id="transactions.E001",
+            )
+        ]
+    return []
+
+
+@register(Tags.database)
+def check_partitioning(app_configs, databases=None, **kwargs):
+    """
+    Warns about the shards whose transactions table is not partitioned as
+    set, as the table is only partitioned by the partition_transactions
+    command
+    """
+    scheme = _get_setting()
+    if not databases or scheme not in SCHEMES + (None,):
+        return []
+
+    warnings = []
+    for shard in get_shards():
+        if shard not in databases:
+            continue
+        try:
+            current = get_table_scheme(shard)
+        except LookupError:
+            # not migrated yet
+            continue
+        if current != scheme:
+            warnings.append(
+                Warning(
+                    f"The transactions table of the database {shard!r} is "
+                    f"partitioned by {current or 'nothing'}, while "
+                    f"TRANSACTIONS_PARTITIONING is set to "
+                    f"{scheme or 'nothing'}",
+                    hint="Run python manage.py partition_transactions.",
+                    id="transactions.W001",
+                )
+            )
+    return warnings
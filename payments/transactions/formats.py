@@ -0,0 +1,14 @@
+from companies.formats import DocumentNumber, normalize_digits
+
+CPF_DIGITS = 11
+
+
+def normalize_cpf(cpf: DocumentNumber) -> str:
+    """Strips any punctuation from a CPF, keeping only its digits"""
+    return normalize_digits(cpf, CPF_DIGITS)
+
+
+def format_cpf(cpf: DocumentNumber) -> str:
+    """Formats a CPF with its punctuation, as it is rendered"""
+    digits = normalize_cpf(cpf)
+    return f"{digits[:3]}.{digits[3:6]}.{digits[6:9]}-{digits[9:]}"
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from django.utils import timezone
+
+from companies.cache import company_cache
+from companies.validation import Reject
+from payments.uuids import stable_uuid7
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from transactions.api.serializers import TransactionImportSerializer
+from transactions.models import Transaction
+from transactions.utils import merge_transactions
+
+IMPORT_BATCH_SIZE = 5000
+FINGERPRINT_SIZE = 64 * 1024
+
+# time of the ids of the transactions without their creation time, which
+# must not depend on the import (e.g. its start), so importing them again
+# gives the same ids
+UNDATED_ID_TIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+UNKNOWN_COMPANY_ERRORS = {"estabelecimento": ["Company not found."]}
+
+TransactionData = Dict[str, str]
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def fingerprint(filepath: str) -> str:
+    """
+    Identifies the contents of a file by its size and the hash of its
+    beginning, which is cheap even for large files
+    """
+    with open(filepath, "rb") as source:
+        digest = hashlib.blake2b(source.read(FINGERPRINT_SIZE)).hexdigest()
+    return f"{os.path.getsize(filepath)}:{digest}"
+
+
+class Checkpoint:
+    """
+    Position of an import in its source file (how many records were
+    processed) along with the time the import started at, kept in a JSON
+    file, so an interrupted import can be resumed where it stopped. The
+    checkpoint only applies to the file it was saved for, as told by its
+    fingerprint.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.position = 0
+        self.started_at = timezone.now()
+
+    def load(self) -> "Checkpoint":
+        """Loads the saved checkpoint, if there is one"""
+        if not os.path.exists(self.path):
+            return self
+
+        with open(self.path, "r", encoding="utf-8") as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        if saved["fingerprint"] != self.fingerprint:
+            raise CheckpointError(
+                f"The checkpoint {self.path} was saved for another file"
+            )
+        self.position = saved["position"]
+        self.started_at = datetime.fromisoformat(saved["started_at"])
+        return self
+
+    def save(self, position: int):
+        """Saves the position, replacing the former checkpoint at once"""
+        self.position = position
+        saved = {
+            "fingerprint": self.fingerprint,
+            "position": position,
+            "started_at": self.started_at.isoformat(),
+        }
+        partial_path = f"{self.path}.partial"
+        with open(partial_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(saved, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(partial_path, self.path)
+
+
+class ImportSummary(NamedTuple):
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    rejected: int = 0
+
+
+def _errors_of(detail) -> Dict[str, List[str]]:
+    if not isinstance(detail, dict):
+        detail = {api_settings.NON_FIELD_ERRORS_KEY: detail}
+    return {
+        field: [str(error) for error in errors]
+        for field, errors in detail.items()
+    }
+
+
+def import_transactions(
+    data: Iterable[TransactionData],
+    checkpoint: Checkpoint,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportSummary], None]] = None,
+    reject: Optional[Callable[[Reject], None]] = None,
+) -> ImportSummary:
+    """
+    Imports transactions data streamed from any iterable in batches,
+    resuming after the position of the checkpoint, and returns how many
+    transactions were read, inserted, skipped as imported before and
+    rejected. Only a batch is kept in memory at a time.
+
+    The transactions of each batch are validated as the API does, their
+    companies are resolved with a single query per shard (see
+    companies.cache) and they are merged into the transactions table of each
+    shard through a staging table (see transactions.utils). The invalid
+    transactions and the ones of unknown companies are passed to `reject`
+    with the reasons. Once a batch is committed, the checkpoint is saved
+    and `progress` is called with the running summary.
+
+    The ids of the transactions are derived from their creation time and
+    their position in the source (as told by the fingerprint of the
+    checkpoint), so a batch imported again (e.g. after a crash between its
+    commit and the checkpoint) is skipped instead of duplicated.
+    Transactions without their creation time are taken as created at the
+    start of the import, as recorded by the checkpoint, while their ids
+    only depend on their position (see UNDATED_ID_TIME), so they are
+    skipped as well when imported again from the start (e.g. restarted or
+    with the checkpoint lost).
+    """
+    # a single serializer validates every record, as its fields are built
+    # (deep copied) once per instance
+    serializer = TransactionImportSerializer()
+    summary = ImportSummary()
+    position = checkpoint.position
+    records = islice(data, checkpoint.position, None)
+
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+
+        validated, rejects = [], []
+        for record_position, piece in enumerate(batch, start=position + 1):
+            try:
+                validated_data = serializer.run_validation(piece)
+            except ValidationError as exc:
+                errors = _errors_of(exc.detail)
+                rejects.append(Reject(record_position, piece, errors))
+            else:
+                validated.append((record_position, piece, validated_data))
+        position += len(batch)
+
+        companies = company_cache.get_many(
+            validated_data["cnpj"] for _, _, validated_data in validated
+        )
+        transactions_by_shard = defaultdict(list)
+        undated_by_shard = defaultdict(list)
+        for record_position, piece, validated_data in validated:
+            company = companies[validated_data["cnpj"]]
+            if company is None:
+                rejects.append(
+                    Reject(record_position, piece, UNKNOWN_COMPANY_ERRORS)
+                )
+                continue
+
+            created_at = validated_data.get("created_at")
+            key = f"{checkpoint.fingerprint}:{record_position}".encode()
+            transaction = Transaction(
+                id=stable_uuid7(created_at or UNDATED_ID_TIME, key),
+                company_id=company.id,
+                client=validated_data["client"],
+                value=validated_data["value"],
+                description=validated_data["description"],
+                created_at=created_at or checkpoint.started_at,
+            )
+            transactions_by_shard[company.shard].append(transaction)
+            if created_at is None:
+                undated_by_shard[company.shard].append(transaction.id)
+
+        merged = sum(map(len, transactions_by_shard.values()))
+
+        # the undated transactions imported before were created at another
+        # start, so they would not conflict with their former rows when the
+        # creation time is part of the primary key (partitioned by month)
+        for shard, ids in undated_by_shard.items():
+            imported = set(
+                Transaction.objects.using(shard)
+                .filter(id__in=ids)
+                .values_list("id", flat=True)
+            )
+            transactions_by_shard[shard] = [
+                transaction
+                for transaction in transactions_by_shard[shard]
+                if transaction.id not in imported
+            ]
+
+        inserted = sum(
+            merge_transactions(transactions, shard)
+            for shard, transactions in transactions_by_shard.items()
+            if transactions
+        )
+
+        # rejected before the checkpoint is saved, so none is left out of
+        # the rejects when resuming, at the risk of being repeated
+        if reject is not None:
+            for rejected in sorted(rejects, key=lambda item: item.position):
+                reject(rejected)
+        checkpoint.save(position)
+
+        summary = ImportSummary(
+            read=summary.read + len(batch),
+            inserted=summary.inserted + inserted,
+            skipped=summary.skipped + merged - inserted,
+            rejected=summary.rejected + len(rejects),
+        )
+        if progress is not None:
+            progress(summary)
+
+    return summary
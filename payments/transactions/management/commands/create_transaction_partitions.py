@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from companies.shards import get_shards
+from transactions.partitions import create_upcoming_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the monthly partitions of the transactions table for the "
+        "current and the upcoming months in every shard, when it is "
+        "partitioned by month"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=settings.TRANSACTIONS_PARTITIONING["MONTHS_AHEAD"],
+            help="Number of months ahead to create partitions for",
+        )
+
+    def handle(self, *args, **options):
+        created = []
+        for shard in get_shards():
+            created += create_upcoming_partitions(
+                max(options["months"], 0), using=shard
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully created {len(created)} partitions"
+                + (f": {', '.join(created)}" if created else "")
+            )
+        )
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.queue import WriteBehindQueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Flushes the transactions left in the write-behind queue by server "
+        "processes which are no longer running into the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            type=str,
+            default=settings.TRANSACTIONS_QUEUE["DIRECTORY"],
+            help="Directory of the queue (TRANSACTIONS_QUEUE_DIRECTORY)",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not directory:
+            raise CommandError("No queue directory was provided")
+
+        queue = WriteBehindQueue(
+            directory,
+            segment_size=settings.TRANSACTIONS_QUEUE["SEGMENT_SIZE"],
+            batch_size=settings.TRANSACTIONS_QUEUE["BATCH_SIZE"],
+            interval=settings.TRANSACTIONS_QUEUE["FLUSH_INTERVAL"],
+        )
+        queue.open()
+        try:
+            flushed = queue.flush()
+        finally:
+            queue.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully flushed {flushed} transactions from the "
+                f"queue in {directory}"
+            )
+        )
+        if queue.dead_lettered:
+            self.stderr.write(
+                f"{queue.dead_lettered} transactions of unknown companies "
+                f"were moved to the dead-letter directory of the queue"
+            )
@@ -0,0 +1,131 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.streaming import iter_csv_records, iter_json_records
+from companies.validation import RejectFile
+from payments.routers import use_primary
+from transactions.importing import (
+    IMPORT_BATCH_SIZE,
+    Checkpoint,
+    CheckpointError,
+    ImportSummary,
+    fingerprint,
+    import_transactions,
+)
+
+JSON_EXTENSIONS = (".json", ".ndjson", ".jsonl")
+CSV_EXTENSIONS = (".csv",)
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports transactions data from a JSON lines (or JSON array) or CSV "
+        "file into the database, resuming from the last checkpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filepath",
+            type=str,
+            required=True,
+            help=(
+                "Path to the source file, whose records have the fields of "
+                "the transactions API, along with an optional criado_em"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Number of transactions imported in each batch",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help=(
+                "Path to the checkpoint file the import is resumed from "
+                "(<filepath>.checkpoint by default)"
+            ),
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Imports the file from its start, ignoring the checkpoint",
+        )
+        parser.add_argument(
+            "--rejects",
+            type=str,
+            help=(
+                "Path to the JSON lines file the rejected transactions are "
+                "written to, along with the reasons "
+                "(<filepath>.rejects.ndjson by default)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        filepath = options["filepath"]
+        if not os.path.isfile(filepath):
+            raise CommandError(
+                f"Provided filepath {filepath} does not exist or is not a file"
+            )
+        if filepath.endswith(JSON_EXTENSIONS):
+            read_records = iter_json_records
+        elif filepath.endswith(CSV_EXTENSIONS):
+            read_records = iter_csv_records
+        else:
+            extensions = ", ".join(JSON_EXTENSIONS + CSV_EXTENSIONS)
+            raise CommandError(
+                f"Provided filepath {filepath} is not a JSON or CSV file "
+                f"({extensions})"
+            )
+
+        checkpoint = Checkpoint(
+            options["checkpoint"] or f"{filepath}.checkpoint",
+            fingerprint(filepath),
+        )
+        if not options["restart"]:
+            try:
+                checkpoint.load()
+            except CheckpointError as exc:
+                raise CommandError(f"{exc}, use --restart to ignore it")
+        if checkpoint.position:
+            self.stdout.write(
+                f"Resuming after {checkpoint.position} transactions"
+            )
+
+        started_at = time.monotonic()
+
+        def report(summary: ImportSummary):
+            rate = summary.read / max(time.monotonic() - started_at, 1e-6)
+            self.stdout.write(
+                f"Imported {summary.inserted} of {summary.read} transactions "
+                f"read ({rate:.0f} rows/s)"
+            )
+
+        rejects = options["rejects"] or f"{filepath}.rejects.ndjson"
+        # rejects of a resumed import are added to the ones written before
+        reject_file = RejectFile(rejects, append=bool(checkpoint.position))
+        source = open(filepath, "r", encoding="utf-8", newline="")
+        with source, reject_file, use_primary():
+            summary = import_transactions(
+                read_records(source),
+                checkpoint,
+                max(options["batch_size"], 1),
+                progress=report,
+                reject=reject_file,
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully imported transactions data from {filepath} in "
+                f"{time.monotonic() - started_at:.2f}s: {summary.inserted} "
+                f"inserted, {summary.skipped} imported before, "
+                f"{summary.rejected} rejected"
+            )
+        )
+        if summary.rejected:
+            self.stdout.write(
+                self.style.ERROR(f"Rejected transactions written to {rejects}")
+            )
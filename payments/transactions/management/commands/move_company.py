@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.formats import format_cnpj
+from transactions.rebalancing import MOVE_CHUNK_SIZE, MoveError, move_company
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves a company, along with its transactions, to another shard "
+        "(see the DB_SHARDS setting)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cnpj", type=str, required=True, help="CNPJ of the company"
+        )
+        parser.add_argument(
+            "--shard",
+            type=str,
+            required=True,
+            help="Database alias of the shard to move the company to",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=MOVE_CHUNK_SIZE,
+            help="Number of transactions copied with each insert",
+        )
+
+    def handle(self, *args, **options):
+        cnpj, target = options["cnpj"], options["shard"]
+        try:
+            source, moved = move_company(
+                cnpj, target, max(options["chunk_size"], 1)
+            )
+        except MoveError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully moved company {format_cnpj(cnpj)} with "
+                f"{moved} transactions from {source} to {target}"
+            )
+        )
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.shards import get_shards
+from transactions.partitions import (
+    SCHEMES,
+    get_table_scheme,
+    partition_transactions,
+)
+
+NONE = "none"
+
+
+class Command(BaseCommand):
+    help = (
+        "Partitions the transactions table of every shard with the given "
+        "scheme (see the TRANSACTIONS_PARTITIONING setting), copying the "
+        "transactions of the shards partitioned otherwise to a new table, "
+        "which is locked during the copy"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scheme",
+            type=str,
+            default=settings.TRANSACTIONS_PARTITIONING["SCHEME"] or NONE,
+            help=(
+                f"Partitioning scheme, one of {', '.join(SCHEMES)} or "
+                f"{NONE} (TRANSACTIONS_PARTITIONING by default)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        scheme = options["scheme"]
+        if scheme not in SCHEMES + (NONE,):
+            raise CommandError(
+                f"Unknown partitioning scheme {scheme!r}, expected one of "
+                f"{', '.join(SCHEMES + (NONE,))}"
+            )
+        scheme = None if scheme == NONE else scheme
+
+        for shard in get_shards():
+            try:
+                current = get_table_scheme(shard)
+            except LookupError as exc:
+                raise CommandError(f"{exc} in {shard}, run migrate first")
+
+            partitions = partition_transactions(scheme, using=shard)
+            action = "Kept" if current == scheme else "Rebuilt"
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{action} the transactions table of {shard} "
+                    f"partitioned by {scheme or NONE}"
+                    + (f": {len(partitions)} partitions" if scheme else "")
+                )
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from transactions.rebalancing import pin_companies
+
+
+class Command(BaseCommand):
+    help = (
+        "Records the shards holding the companies which are not held by the "
+        "shards picked by their CNPJs, to be run after enabling sharding or "
+        "adding shards (see the DB_SHARDS setting)"
+    )
+
+    def handle(self, *args, **options):
+        pinned = pin_companies()
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully pinned {pinned} companies")
+        )
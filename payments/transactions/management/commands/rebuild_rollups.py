@@ -0,0 +1,11 @@
+from transactions.management.rebuild import RebuildCommand
+from transactions.rollups import rebuild_rollups
+
+
+class Command(RebuildCommand):
+    help = (
+        "Rebuilds the hourly and daily transactions rollups of all "
+        "companies, processing chunks of companies in parallel"
+    )
+    rebuild = staticmethod(rebuild_rollups)
+    rebuilt_name = "rollups"
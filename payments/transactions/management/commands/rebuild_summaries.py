@@ -0,0 +1,11 @@
+from transactions.management.rebuild import RebuildCommand
+from transactions.summaries import rebuild_summaries
+
+
+class Command(RebuildCommand):
+    help = (
+        "Rebuilds the transactions summaries of all companies, processing "
+        "chunks of companies in parallel"
+    )
+    rebuild = staticmethod(rebuild_summaries)
+    rebuilt_name = "summaries"
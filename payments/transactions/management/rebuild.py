@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List
+from uuid import UUID
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from companies.models import Company
+from companies.shards import get_shards
+from payments.routers import use_primary, use_shard
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = 4
+
+
+def chunk_company_ids(chunk_size: int) -> Iterator[List[UUID]]:
+    company_ids = Company.objects.order_by("id").values_list("id", flat=True)
+    chunk = []
+    for company_id in company_ids.iterator(chunk_size=chunk_size):
+        chunk.append(company_id)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RebuildCommand(BaseCommand):
+    """
+    Base command for rebuilding data derived from the transactions of each
+    company, processing chunks of companies of every shard in parallel.
+    Subclasses set the `rebuild` function, which rebuilds the data of the
+    given companies in the given database and returns how many rows were
+    rebuilt, and the `rebuilt_name` reported.
+    """
+
+    rebuild: Callable[[List[UUID], str], int]
+    rebuilt_name = "rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of companies rebuilt in each database transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of chunks rebuilt in parallel",
+        )
+
+    def rebuild_chunk(self, shard: str, company_ids: List[UUID]) -> int:
+        """Rebuilds a chunk of companies on the connection of a worker thread"""
+        try:
+            return self.rebuild(company_ids, shard)
+        finally:
+            connections[shard].close()
+
+    def handle(self, *args, **options):
+        chunk_size = max(options["chunk_size"], 1)
+        workers = max(options["workers"], 1)
+        started_at = time.monotonic()
+
+        shards, chunks = [], []
+        for shard in get_shards():
+            # the rebuilt data is written to the primary, so it is read from it
+            with use_shard(shard), use_primary():
+                shard_chunks = list(chunk_company_ids(chunk_size))
+            shards += [shard] * len(shard_chunks)
+            chunks += shard_chunks
+
+        if workers == 1:
+            rebuilt = sum(map(self.rebuild, chunks, shards))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                rebuilt = sum(executor.map(self.rebuild_chunk, shards, chunks))
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully rebuilt {rebuilt} {self.rebuilt_name} in "
+                f"{len(chunks)} chunks ({elapsed:.2f}s)"
+            )
+        )
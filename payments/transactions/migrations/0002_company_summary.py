@@ -0,0 +1,115 @@
+# Generated by Django 3.1 on 2026-10-18 16:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+CREATE_SUMMARY_TRIGGERS = """
+CREATE FUNCTION transactions_refresh_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE transactions_companysummary AS summary SET
+            total_value = summary.total_value - old_totals.total_value,
+            transactions_count =
+                summary.transactions_count - old_totals.transactions_count
+        FROM (
+            SELECT
+                company_id,
+                SUM(value) AS total_value,
+                COUNT(*) AS transactions_count
+            FROM old_transactions
+            GROUP BY company_id
+        ) AS old_totals
+        WHERE summary.company_id = old_totals.company_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transactions_companysummary AS summary (
+            company_id, total_value, transactions_count, last_transaction_at
+        )
+        SELECT company_id, SUM(value), COUNT(*), MAX(created_at)
+        FROM new_transactions
+        GROUP BY company_id
+        ORDER BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            total_value = summary.total_value + EXCLUDED.total_value,
+            transactions_count =
+                summary.transactions_count + EXCLUDED.transactions_count,
+            last_transaction_at = GREATEST(
+                summary.last_transaction_at, EXCLUDED.last_transaction_at
+            );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_summary_insert
+AFTER INSERT ON transactions_transaction
+REFERENCING NEW TABLE AS new_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_summary();
+
+CREATE TRIGGER transactions_summary_update
+AFTER UPDATE ON transactions_transaction
+REFERENCING OLD TABLE AS old_transactions NEW TABLE AS new_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_summary();
+
+CREATE TRIGGER transactions_summary_delete
+AFTER DELETE ON transactions_transaction
+REFERENCING OLD TABLE AS old_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_summary();
+
+INSERT INTO transactions_companysummary (
+    company_id, total_value, transactions_count, last_transaction_at
+)
+SELECT company_id, SUM(value), COUNT(*), MAX(created_at)
+FROM transactions_transaction
+GROUP BY company_id;
+"""
+
+DROP_SUMMARY_TRIGGERS = """
+DROP TRIGGER transactions_summary_insert ON transactions_transaction;
+DROP TRIGGER transactions_summary_update ON transactions_transaction;
+DROP TRIGGER transactions_summary_delete ON transactions_transaction;
+DROP FUNCTION transactions_refresh_summary();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("transactions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompanySummary",
+            fields=[
+                (
+                    "company",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="companies.company",
+                    ),
+                ),
+                ("total_value", models.FloatField(default=0)),
+                (
+                    "transactions_count",
+                    models.PositiveBigIntegerField(default=0),
+                ),
+                ("last_transaction_at", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.RunSQL(CREATE_SUMMARY_TRIGGERS, DROP_SUMMARY_TRIGGERS),
+    ]
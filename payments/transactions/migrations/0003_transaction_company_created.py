@@ -0,0 +1,20 @@
+# Generated by Django 3.1 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0002_company_summary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["company", "created_at", "id"],
+                name="transaction_company_created",
+            ),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 3.1 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+VERSIONED_SUMMARY_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_refresh_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE transactions_companysummary AS summary SET
+            total_value = summary.total_value - old_totals.total_value,
+            transactions_count =
+                summary.transactions_count - old_totals.transactions_count,
+            version = summary.version + 1
+        FROM (
+            SELECT
+                company_id,
+                SUM(value) AS total_value,
+                COUNT(*) AS transactions_count
+            FROM old_transactions
+            GROUP BY company_id
+        ) AS old_totals
+        WHERE summary.company_id = old_totals.company_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transactions_companysummary AS summary (
+            company_id,
+            total_value,
+            transactions_count,
+            last_transaction_at,
+            version
+        )
+        SELECT company_id, SUM(value), COUNT(*), MAX(created_at), 1
+        FROM new_transactions
+        GROUP BY company_id
+        ORDER BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            total_value = summary.total_value + EXCLUDED.total_value,
+            transactions_count =
+                summary.transactions_count + EXCLUDED.transactions_count,
+            last_transaction_at = GREATEST(
+                summary.last_transaction_at, EXCLUDED.last_transaction_at
+            ),
+            version = summary.version + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+UNVERSIONED_SUMMARY_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_refresh_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE transactions_companysummary AS summary SET
+            total_value = summary.total_value - old_totals.total_value,
+            transactions_count =
+                summary.transactions_count - old_totals.transactions_count
+        FROM (
+            SELECT
+                company_id,
+                SUM(value) AS total_value,
+                COUNT(*) AS transactions_count
+            FROM old_transactions
+            GROUP BY company_id
+        ) AS old_totals
+        WHERE summary.company_id = old_totals.company_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transactions_companysummary AS summary (
+            company_id, total_value, transactions_count, last_transaction_at
+        )
+        SELECT company_id, SUM(value), COUNT(*), MAX(created_at)
+        FROM new_transactions
+        GROUP BY company_id
+        ORDER BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            total_value = summary.total_value + EXCLUDED.total_value,
+            transactions_count =
+                summary.transactions_count + EXCLUDED.transactions_count,
+            last_transaction_at = GREATEST(
+                summary.last_transaction_at, EXCLUDED.last_transaction_at
+            );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0003_transaction_company_created"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companysummary",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            VERSIONED_SUMMARY_FUNCTION, UNVERSIONED_SUMMARY_FUNCTION
+        ),
+    ]
@@ -0,0 +1,231 @@
+# Generated by Django 3.1 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CREATE_ROLLUP_TRIGGERS = """
+CREATE FUNCTION transactions_refresh_rollups() RETURNS trigger AS $$
+DECLARE
+    rollup RECORD;
+    changed TEXT;
+BEGIN
+    FOR rollup IN
+        SELECT * FROM (
+            VALUES
+                ('transactions_hourlyrollup', 'hour', '1 hour'),
+                ('transactions_dailyrollup', 'day', '24 hours')
+        ) AS rollups (table_name, grain, width)
+    LOOP
+        IF TG_OP = 'INSERT' THEN
+            EXECUTE format($sql$
+                INSERT INTO %1$I AS rollup (
+                    company_id,
+                    bucket,
+                    total_value,
+                    transactions_count,
+                    min_value,
+                    max_value
+                )
+                SELECT
+                    company_id,
+                    date_trunc(%2$L, created_at AT TIME ZONE 'UTC')
+                        AT TIME ZONE 'UTC' AS bucket,
+                    SUM(value),
+                    COUNT(*),
+                    MIN(value),
+                    MAX(value)
+                FROM new_transactions
+                GROUP BY company_id, bucket
+                ORDER BY company_id, bucket
+                ON CONFLICT (company_id, bucket) DO UPDATE SET
+                    total_value = rollup.total_value + EXCLUDED.total_value,
+                    transactions_count =
+                        rollup.transactions_count
+                        + EXCLUDED.transactions_count,
+                    min_value = LEAST(rollup.min_value, EXCLUDED.min_value),
+                    max_value = GREATEST(
+                        rollup.max_value, EXCLUDED.max_value
+                    )
+            $sql$, rollup.table_name, rollup.grain);
+        ELSE
+            -- the minimum and maximum values can not be taken back, so the
+            -- buckets of updated or deleted transactions are recomputed
+            changed := 'SELECT company_id, created_at FROM old_transactions';
+            IF TG_OP = 'UPDATE' THEN
+                changed := changed
+                    || ' UNION ALL'
+                    || ' SELECT company_id, created_at FROM new_transactions';
+            END IF;
+
+            EXECUTE format($sql$
+                WITH buckets AS (
+                    SELECT DISTINCT
+                        company_id,
+                        date_trunc(%2$L, created_at AT TIME ZONE 'UTC')
+                            AT TIME ZONE 'UTC' AS bucket
+                    FROM (%4$s) AS changed
+                ), totals AS (
+                    SELECT
+                        buckets.company_id,
+                        buckets.bucket,
+                        COALESCE(SUM(transaction.value), 0) AS total_value,
+                        COUNT(transaction.id) AS transactions_count,
+                        MIN(transaction.value) AS min_value,
+                        MAX(transaction.value) AS max_value
+                    FROM buckets
+                    LEFT JOIN transactions_transaction AS transaction
+                        ON transaction.company_id = buckets.company_id
+                        AND transaction.created_at >= buckets.bucket
+                        AND transaction.created_at
+                            < buckets.bucket + %3$L::interval
+                    GROUP BY buckets.company_id, buckets.bucket
+                ), emptied AS (
+                    DELETE FROM %1$I AS rollup
+                    USING totals
+                    WHERE rollup.company_id = totals.company_id
+                        AND rollup.bucket = totals.bucket
+                        AND totals.transactions_count = 0
+                )
+                INSERT INTO %1$I AS rollup (
+                    company_id,
+                    bucket,
+                    total_value,
+                    transactions_count,
+                    min_value,
+                    max_value
+                )
+                SELECT * FROM totals
+                WHERE transactions_count > 0
+                ORDER BY company_id, bucket
+                ON CONFLICT (company_id, bucket) DO UPDATE SET
+                    total_value = EXCLUDED.total_value,
+                    transactions_count = EXCLUDED.transactions_count,
+                    min_value = EXCLUDED.min_value,
+                    max_value = EXCLUDED.max_value
+            $sql$, rollup.table_name, rollup.grain, rollup.width, changed);
+        END IF;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- named so they fire after the summary triggers, which lock the summaries
+-- of the companies (see transactions.rollups)
+CREATE TRIGGER transactions_timeseries_insert
+AFTER INSERT ON transactions_transaction
+REFERENCING NEW TABLE AS new_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_rollups();
+
+CREATE TRIGGER transactions_timeseries_update
+AFTER UPDATE ON transactions_transaction
+REFERENCING OLD TABLE AS old_transactions NEW TABLE AS new_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_rollups();
+
+CREATE TRIGGER transactions_timeseries_delete
+AFTER DELETE ON transactions_transaction
+REFERENCING OLD TABLE AS old_transactions
+FOR EACH STATEMENT EXECUTE PROCEDURE transactions_refresh_rollups();
+"""
+
+DROP_ROLLUP_TRIGGERS = """
+DROP TRIGGER transactions_timeseries_insert ON transactions_transaction;
+DROP TRIGGER transactions_timeseries_update ON transactions_transaction;
+DROP TRIGGER transactions_timeseries_delete ON transactions_transaction;
+DROP FUNCTION transactions_refresh_rollups();
+"""
+
+BACKFILL_ROLLUPS = """
+INSERT INTO transactions_hourlyrollup (
+    company_id, bucket, total_value, transactions_count, min_value, max_value
+)
+SELECT
+    company_id,
+    date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+    SUM(value),
+    COUNT(*),
+    MIN(value),
+    MAX(value)
+FROM transactions_transaction
+GROUP BY 1, 2;
+
+INSERT INTO transactions_dailyrollup (
+    company_id, bucket, total_value, transactions_count, min_value, max_value
+)
+SELECT
+    company_id,
+    date_trunc('day', bucket AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+    SUM(total_value),
+    SUM(transactions_count),
+    MIN(min_value),
+    MAX(max_value)
+FROM transactions_hourlyrollup
+GROUP BY 1, 2;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("companies", "0001_initial"),
+        ("transactions", "0004_companysummary_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourlyRollup",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("bucket", models.DateTimeField()),
+                ("total_value", models.FloatField()),
+                ("transactions_count", models.PositiveBigIntegerField()),
+                ("min_value", models.FloatField()),
+                ("max_value", models.FloatField()),
+                (
+                    "company",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="companies.company",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("bucket", models.DateTimeField()),
+                ("total_value", models.FloatField()),
+                ("transactions_count", models.PositiveBigIntegerField()),
+                ("min_value", models.FloatField()),
+                ("max_value", models.FloatField()),
+                (
+                    "company",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="companies.company",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="hourlyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("company", "bucket"),
+                name="hourly_rollup_company_bucket",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("company", "bucket"),
+                name="daily_rollup_company_bucket",
+            ),
+        ),
+        migrations.RunSQL(CREATE_ROLLUP_TRIGGERS, DROP_ROLLUP_TRIGGERS),
+        migrations.RunSQL(BACKFILL_ROLLUPS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 3.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+# the totals are recomputed from the converted values, instead of converting
+# the float sums, so they are exact
+TO_CENTS = """
+ALTER TABLE transactions_transaction
+    ALTER COLUMN value TYPE bigint USING round(value * 100)::bigint;
+
+ALTER TABLE transactions_companysummary
+    ALTER COLUMN total_value TYPE bigint USING 0;
+
+UPDATE transactions_companysummary AS summary SET
+    total_value = totals.total_value
+FROM (
+    SELECT company_id, SUM(value) AS total_value
+    FROM transactions_transaction
+    GROUP BY company_id
+) AS totals
+WHERE summary.company_id = totals.company_id;
+""" + "".join(
+    f"""
+ALTER TABLE {table}
+    ALTER COLUMN total_value TYPE bigint USING 0,
+    ALTER COLUMN min_value TYPE bigint USING round(min_value * 100)::bigint,
+    ALTER COLUMN max_value TYPE bigint USING round(max_value * 100)::bigint;
+
+UPDATE {table} AS rollup SET
+    total_value = totals.total_value
+FROM (
+    SELECT
+        company_id,
+        date_trunc('{grain}', created_at AT TIME ZONE 'UTC')
+            AT TIME ZONE 'UTC' AS bucket,
+        SUM(value) AS total_value
+    FROM transactions_transaction
+    GROUP BY 1, 2
+) AS totals
+WHERE rollup.company_id = totals.company_id
+    AND rollup.bucket = totals.bucket;
+"""
+    for table, grain in (
+        ("transactions_hourlyrollup", "hour"),
+        ("transactions_dailyrollup", "day"),
+    )
+)
+
+FROM_CENTS = """
+ALTER TABLE transactions_transaction
+    ALTER COLUMN value TYPE double precision USING value / 100.0;
+
+ALTER TABLE transactions_companysummary
+    ALTER COLUMN total_value TYPE double precision
+    USING total_value / 100.0;
+""" + "".join(
+    f"""
+ALTER TABLE {table}
+    ALTER COLUMN total_value TYPE double precision USING total_value / 100.0,
+    ALTER COLUMN min_value TYPE double precision USING min_value / 100.0,
+    ALTER COLUMN max_value TYPE double precision USING max_value / 100.0;
+""" for table in ("transactions_hourlyrollup", "transactions_dailyrollup")
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0005_rollups"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            TO_CENTS,
+            FROM_CENTS,
+            state_operations=[
+                migrations.AlterField(
+                    model_name="companysummary",
+                    name="total_value",
+                    field=models.BigIntegerField(
+                        default=0, help_text="Total value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="dailyrollup",
+                    name="max_value",
+                    field=models.BigIntegerField(
+                        help_text="Maximum value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="dailyrollup",
+                    name="min_value",
+                    field=models.BigIntegerField(
+                        help_text="Minimum value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="dailyrollup",
+                    name="total_value",
+                    field=models.BigIntegerField(
+                        help_text="Total value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="hourlyrollup",
+                    name="max_value",
+                    field=models.BigIntegerField(
+                        help_text="Maximum value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="hourlyrollup",
+                    name="min_value",
+                    field=models.BigIntegerField(
+                        help_text="Minimum value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="hourlyrollup",
+                    name="total_value",
+                    field=models.BigIntegerField(
+                        help_text="Total value in cents"
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="transaction",
+                    name="value",
+                    field=models.BigIntegerField(help_text="Value in cents"),
+                ),
+            ],
+        ),
+    ]
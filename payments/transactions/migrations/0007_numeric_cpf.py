@@ -0,0 +1,48 @@
+# Generated by Django 3.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+import companies.fields
+import transactions.validators
+
+# altered in place, as updating the clients would fire the summary and rollup
+# triggers for every transaction
+CPF_TO_NUMBER = """
+ALTER TABLE transactions_transaction
+    ALTER COLUMN client TYPE bigint
+    USING regexp_replace(client, '\\D', '', 'g')::bigint
+"""
+
+CPF_TO_STRING = """
+ALTER TABLE transactions_transaction
+    ALTER COLUMN client TYPE varchar(14)
+    USING regexp_replace(
+        lpad(client::text, 11, '0'),
+        '^(\\d{3})(\\d{3})(\\d{3})(\\d{2})$',
+        '\\1.\\2.\\3-\\4'
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0006_integer_cents"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            CPF_TO_NUMBER,
+            CPF_TO_STRING,
+            state_operations=[
+                migrations.AlterField(
+                    model_name="transaction",
+                    name="client",
+                    field=companies.fields.DocumentNumberField(
+                        digits=11,
+                        validators=[transactions.validators.cpf_validator],
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1 on 2026-10-18 20:05
+
+from django.db import migrations
+
+from transactions.partitions import partition_transactions
+
+
+def unpartition_table(apps, schema_editor):
+    # the table is partitioned by the partition_transactions command rather
+    # than by the migrations, whatever the settings, so it is only brought
+    # back to the plain table the former migrations expect
+    partition_transactions(None, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0008_uuid7_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, unpartition_table),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 3.1 on 2026-10-18 21:40
+
+from django.db import migrations
+
+# the last transaction of a company is looked up again among its remaining
+# transactions (through the index by company and creation time) only when
+# the latest ones were deleted or updated, as the statement trigger runs
+# once they are gone, while the transactions inserted by an update are
+# taken into account right after
+SUMMARY_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_refresh_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE transactions_companysummary AS summary SET
+            total_value = summary.total_value - old_totals.total_value,
+            transactions_count =
+                summary.transactions_count - old_totals.transactions_count,
+            last_transaction_at = CASE
+                WHEN old_totals.last_transaction_at
+                    < summary.last_transaction_at
+                THEN summary.last_transaction_at
+                ELSE (
+                    SELECT MAX(transaction.created_at)
+                    FROM transactions_transaction AS transaction
+                    WHERE transaction.company_id = summary.company_id
+                )
+            END,
+            version = summary.version + 1
+        FROM (
+            SELECT
+                company_id,
+                SUM(value) AS total_value,
+                COUNT(*) AS transactions_count,
+                MAX(created_at) AS last_transaction_at
+            FROM old_transactions
+            GROUP BY company_id
+        ) AS old_totals
+        WHERE summary.company_id = old_totals.company_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transactions_companysummary AS summary (
+            company_id,
+            total_value,
+            transactions_count,
+            last_transaction_at,
+            version
+        )
+        SELECT company_id, SUM(value), COUNT(*), MAX(created_at), 1
+        FROM new_transactions
+        GROUP BY company_id
+        ORDER BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            total_value = summary.total_value + EXCLUDED.total_value,
+            transactions_count =
+                summary.transactions_count + EXCLUDED.transactions_count,
+            last_transaction_at = GREATEST(
+                summary.last_transaction_at, EXCLUDED.last_transaction_at
+            ),
+            version = summary.version + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+FORMER_SUMMARY_FUNCTION = """
+CREATE OR REPLACE FUNCTION transactions_refresh_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE transactions_companysummary AS summary SET
+            total_value = summary.total_value - old_totals.total_value,
+            transactions_count =
+                summary.transactions_count - old_totals.transactions_count,
+            version = summary.version + 1
+        FROM (
+            SELECT
+                company_id,
+                SUM(value) AS total_value,
+                COUNT(*) AS transactions_count
+            FROM old_transactions
+            GROUP BY company_id
+        ) AS old_totals
+        WHERE summary.company_id = old_totals.company_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO transactions_companysummary AS summary (
+            company_id,
+            total_value,
+            transactions_count,
+            last_transaction_at,
+            version
+        )
+        SELECT company_id, SUM(value), COUNT(*), MAX(created_at), 1
+        FROM new_transactions
+        GROUP BY company_id
+        ORDER BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            total_value = summary.total_value + EXCLUDED.total_value,
+            transactions_count =
+                summary.transactions_count + EXCLUDED.transactions_count,
+            last_transaction_at = GREATEST(
+                summary.last_transaction_at, EXCLUDED.last_transaction_at
+            ),
+            version = summary.version + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0009_partitioning"),
+    ]
+
+    operations = [
+        migrations.RunSQL(SUMMARY_FUNCTION, FORMER_SUMMARY_FUNCTION),
+    ]
@@ -1,8 +1,12 @@
-from uuid import uuid4
-
-from django.core.validators import MinLengthValidator
 from django.db import models
+from django.utils import timezone
 
+from companies.fields import DocumentNumberField
+from companies.formats import format_cnpj
+from payments.routers import use_primary
+from payments.uuids import uuid7
+from transactions.formats import CPF_DIGITS, format_cpf
+from transactions.money import from_cents
 from transactions.validators import cpf_validator
 
 CPF_SIZE = 14
@@ -10,7 +14,7 @@ DESCRIPTION_LENGTH = 1000
 
 
 class Transaction(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     company = models.ForeignKey(
         "companies.Company",
         related_name="transactions",
@@ -18,23 +22,126 @@ class Transaction(models.Model):
         blank=False,
         on_delete=models.PROTECT,
     )
-    client = models.CharField(
-        max_length=CPF_SIZE,
-        null=False,
-        blank=False,
-        validators=[MinLengthValidator(CPF_SIZE), cpf_validator],
+    client = DocumentNumberField(
+        digits=CPF_DIGITS, null=False, blank=False, validators=[cpf_validator]
+    )
+    value = models.BigIntegerField(
+        null=False, blank=False, help_text="Value in cents"
     )
-    value = models.FloatField(null=False, blank=False)
     description = models.TextField(
         max_length=DESCRIPTION_LENGTH, null=False, blank=False
     )
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["company", "created_at", "id"],
+                name="transaction_company_created",
+            )
+        ]
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        # validated against the primary, which the instance is written to
+        with use_primary():
+            self.full_clean()
         return super().save(*args, **kwargs)
 
     def __str__(self):
         return (
-            f"Transaction (Value: {self.value} | "
-            f"Company: {self.company.cnpj} | Client: {self.client})"
+            f"Transaction (Value: {from_cents(self.value)} | "
+            f"Company: {format_cnpj(self.company.cnpj)} | "
+            f"Client: {format_cpf(self.client)})"
+        )
+
+
+class CompanySummary(models.Model):
+    """
+    Totals of the transactions of a company. They are kept up to date by
+    database triggers on the transactions table, in the same database
+    transaction as any insert (see migration 0002), and can be rebuilt with
+    the rebuild_summaries management command.
+
+    The version is bumped on every change to the transactions of the
+    company, so anything derived from them (e.g. cached reports) can be told
+    apart from stale copies.
+    """
+
+    company = models.OneToOneField(
+        "companies.Company",
+        primary_key=True,
+        related_name="summary",
+        on_delete=models.CASCADE,
+    )
+    total_value = models.BigIntegerField(
+        default=0, help_text="Total value in cents"
+    )
+    transactions_count = models.PositiveBigIntegerField(default=0)
+    last_transaction_at = models.DateTimeField(null=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return (
+            f"Summary (Company: {self.company_id} | "
+            f"Total: {from_cents(self.total_value)} | "
+            f"Transactions: {self.transactions_count})"
+        )
+
+
+class TransactionRollup(models.Model):
+    """
+    Totals of the transactions of a company created within a time bucket,
+    which starts at `bucket` (in UTC). Rollups are kept up to date by
+    database triggers on the transactions table (see migration 0005) and
+    can be rebuilt with the rebuild_rollups management command.
+    """
+
+    grain = None
+
+    id = models.BigAutoField(primary_key=True)
+    company = models.ForeignKey(
+        "companies.Company",
+        related_name="+",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    bucket = models.DateTimeField()
+    total_value = models.BigIntegerField(help_text="Total value in cents")
+    transactions_count = models.PositiveBigIntegerField()
+    min_value = models.BigIntegerField(help_text="Minimum value in cents")
+    max_value = models.BigIntegerField(help_text="Maximum value in cents")
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return (
+            f"Rollup (Company: {self.company_id} | "
+            f"{self.grain.capitalize()}: {self.bucket.isoformat()} | "
+            f"Total: {from_cents(self.total_value)} | "
+            f"Transactions: {self.transactions_count})"
         )
+
+
+class HourlyRollup(TransactionRollup):
+    grain = "hour"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company", "bucket"],
+                name="hourly_rollup_company_bucket",
+            )
+        ]
+
+
+class DailyRollup(TransactionRollup):
+    grain = "day"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company", "bucket"],
+                name="daily_rollup_company_bucket",
+            )
+        ]
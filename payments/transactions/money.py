@@ -0,0 +1,23 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Union
+
+CENTS = 100
+
+Amount = Union[int, float, str, Decimal]
+
+
+def to_cents(amount: Amount) -> int:
+    """
+    Converts an amount of money (e.g. the `valor` of a transaction) into
+    integer cents, rounding half cents up
+    """
+    cents = Decimal(str(amount)) * CENTS
+    return int(cents.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: Union[int, Decimal]) -> float:
+    """
+    Converts integer cents (or their sum, which the database returns as a
+    decimal) back into an amount of money, as exposed by the API
+    """
+    return int(cents) / CENTS
@@ -0,0 +1,355 @@
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from transactions.models import Transaction
+
+MONTH = "month"
+COMPANY = "company"
+
+SCHEMES = (MONTH, COMPANY)
+PARTITION_KEYS = {MONTH: "created_at", COMPANY: "company_id"}
+STRATEGIES = {MONTH: "RANGE", COMPANY: "HASH"}
+
+GET_PARTITIONING = """
+SELECT partitioning.partstrat, attribute.attname
+FROM pg_partitioned_table AS partitioning
+JOIN pg_attribute AS attribute
+    ON attribute.attrelid = partitioning.partrelid
+    AND attribute.attnum = partitioning.partattrs[0]
+WHERE partitioning.partrelid = to_regclass(%s)
+"""
+
+GET_PARTITIONS = """
+SELECT inhrelid::regclass::text
+FROM pg_inherits
+WHERE inhparent = to_regclass(%s)
+ORDER BY 1
+"""
+
+# the primary key is rebuilt with the partition key, which the unique
+# indexes of a partitioned table must include
+GET_CONSTRAINTS = """
+SELECT conname, pg_get_constraintdef(oid)
+FROM pg_constraint
+WHERE conrelid = to_regclass(%s) AND contype IN ('c', 'f')
+    AND conparentid = 0
+ORDER BY conname
+"""
+
+GET_PRIMARY_KEY = """
+SELECT conname
+FROM pg_constraint
+WHERE conrelid = to_regclass(%s) AND contype = 'p'
+"""
+
+GET_INDEXES = """
+SELECT pg_get_indexdef(indexrelid)
+FROM pg_index
+WHERE indrelid = to_regclass(%s) AND NOT EXISTS (
+    SELECT FROM pg_constraint WHERE conindid = indexrelid
+)
+ORDER BY indexrelid::regclass::text
+"""
+
+GET_TRIGGERS = """
+SELECT pg_get_triggerdef(oid)
+FROM pg_trigger
+WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal
+ORDER BY tgname
+"""
+
+HAS_ROWS_BETWEEN = """
+SELECT EXISTS (
+    SELECT FROM {partition} WHERE created_at >= %s AND created_at < %s
+)
+"""
+
+MOVE_ROWS_BETWEEN = """
+WITH moved AS (
+    DELETE FROM {source} WHERE created_at >= %s AND created_at < %s
+    RETURNING *
+)
+INSERT INTO {target} SELECT * FROM moved
+"""
+
+TableDefinition = Tuple[str, List[Tuple[str, str]], List[str], List[str]]
+
+
+def _month(value: datetime) -> date:
+    return value.astimezone(timezone.utc).date().replace(day=1)
+
+
+def _add_months(month: date, months: int) -> date:
+    year, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + year, month_index + 1, 1)
+
+
+def _month_bound(month: date) -> datetime:
+    # months are split in UTC, as the rollups buckets
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def month_partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def hash_partition_name(table: str, remainder: int, modulus: int) -> str:
+    return f"{table}_p{remainder:0{len(str(modulus - 1))}d}"
+
+
+def get_scheme(cursor, table: str) -> Optional[str]:
+    """Gets how the given table is partitioned, if it is"""
+    cursor.execute(GET_PARTITIONING, [table])
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    strategy, key = row
+    for scheme, scheme_key in PARTITION_KEYS.items():
+        if key == scheme_key and strategy == STRATEGIES[scheme][0].lower():
+            return scheme
+    raise ValueError(f"Unknown partitioning of {table}: {row}")
+
+
+def get_table_scheme(using: str = DEFAULT_DB_ALIAS) -> Optional[str]:
+    """
+    Gets how the transactions table of the given database is partitioned,
+    raising LookupError when the table does not exist (not migrated yet)
+    """
+    table = Transaction._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [table])
+        if cursor.fetchone()[0] is None:
+            raise LookupError(f"The table {table} does not exist")
+        return get_scheme(cursor, table)
+
+
+def get_partitions(cursor, table: str) -> List[str]:
+    cursor.execute(GET_PARTITIONS, [table])
+    return [name for name, in cursor.fetchall()]
+
+
+def _create_month_partition(cursor, table: str, month: date) -> bool:
+    quote = cursor.db.ops.quote_name
+    partition = month_partition_name(table, month)
+    cursor.execute("SELECT to_regclass(%s)", [partition])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    start, end = _month_bound(month), _month_bound(_add_months(month, 1))
+    default = default_partition_name(table)
+    cursor.execute(
+        HAS_ROWS_BETWEEN.format(partition=quote(default)), [start, end]
+    )
+    misplaced = cursor.fetchone()[0]
+    if misplaced:
+        # the rows of the month recorded before its partition was created
+        # are moved out of the default partition, which must be detached
+        # meanwhile. The rows are moved between the partitions directly, so
+        # the summary and rollup triggers (of the table) are not fired.
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} " f"DETACH PARTITION {quote(default)}"
+        )
+
+    cursor.execute(
+        f"CREATE TABLE {quote(partition)} PARTITION OF {quote(table)} "
+        "FOR VALUES FROM (%s) TO (%s)",
+        [start, end],
+    )
+
+    if misplaced:
+        cursor.execute(
+            MOVE_ROWS_BETWEEN.format(
+                source=quote(default), target=quote(partition)
+            ),
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} "
+            f"ATTACH PARTITION {quote(default)} DEFAULT"
+        )
+    return True
+
+
+def create_month_partitions(
+    cursor, table: str, first: date, last: date
+) -> List[str]:
+    """
+    Creates the missing monthly partitions of the table, from the month of
+    `first` to the month of `last`, returning the names of the created ones
+    """
+    created = []
+    month = first.replace(day=1)
+    while month <= last:
+        if _create_month_partition(cursor, table, month):
+            created.append(month_partition_name(table, month))
+        month = _add_months(month, 1)
+    return created
+
+
+def _create_partitions(cursor, table: str, scheme: str, options: Dict):
+    quote = cursor.db.ops.quote_name
+    if scheme == COMPANY:
+        modulus = options["HASH_PARTITIONS"]
+        for remainder in range(modulus):
+            partition = hash_partition_name(table, remainder, modulus)
+            cursor.execute(
+                f"CREATE TABLE {quote(partition)} PARTITION OF "
+                f"{quote(table)} FOR VALUES WITH "
+                f"(MODULUS {modulus:d}, REMAINDER {remainder:d})"
+            )
+        return
+
+    cursor.execute(
+        f"CREATE TABLE {quote(default_partition_name(table))} "
+        f"PARTITION OF {quote(table)} DEFAULT"
+    )
+    current = _month(datetime.now(timezone.utc))
+    first = options.get("FIRST_MONTH") or current
+    last = _add_months(current, options["MONTHS_AHEAD"])
+    create_month_partitions(cursor, table, min(first, current), last)
+
+
+def _get_definition(cursor, table: str) -> TableDefinition:
+    cursor.execute(GET_PRIMARY_KEY, [table])
+    (primary_key,) = cursor.fetchone()
+    cursor.execute(GET_CONSTRAINTS, [table])
+    constraints = cursor.fetchall()
+    cursor.execute(GET_INDEXES, [table])
+    # the indexes of a partitioned table are defined on the table ONLY
+    indexes = [
+        definition.replace(" ON ONLY ", " ON ", 1)
+        for definition, in cursor.fetchall()
+    ]
+    cursor.execute(GET_TRIGGERS, [table])
+    triggers = [definition for definition, in cursor.fetchall()]
+    return primary_key, constraints, indexes, triggers
+
+
+def _rebuild(cursor, table: str, scheme: Optional[str], options: Dict):
+    quote = cursor.db.ops.quote_name
+    former = f"{table}_former"
+    primary_key, constraints, indexes, triggers = _get_definition(
+        cursor, table
+    )
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(former)}")
+
+    partition_by = (
+        f" PARTITION BY {STRATEGIES[scheme]} ({PARTITION_KEYS[scheme]})"
+        if scheme
+        else ""
+    )
+    cursor.execute(
+        f"CREATE TABLE {quote(table)} "
+        f"(LIKE {quote(former)} INCLUDING DEFAULTS INCLUDING STORAGE)"
+        f"{partition_by}"
+    )
+    if scheme:
+        cursor.execute(f"SELECT MIN(created_at) FROM {quote(former)}")
+        first_created_at = cursor.fetchone()[0]
+        first_month = first_created_at and _month(first_created_at)
+        _create_partitions(
+            cursor, table, scheme, {**options, "FIRST_MONTH": first_month}
+        )
+
+    # the triggers are only created afterwards, so the summaries and
+    # rollups are left untouched
+    cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(former)}")
+    cursor.execute(f"DROP TABLE {quote(former)}")
+
+    primary_key_columns = ["id"]
+    if scheme:
+        primary_key_columns.append(PARTITION_KEYS[scheme])
+    cursor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(primary_key)} "
+        f"PRIMARY KEY ({', '.join(map(quote, primary_key_columns))})"
+    )
+    for name, definition in constraints:
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+            f"{definition}"
+        )
+    for definition in indexes + triggers:
+        cursor.execute(definition)
+    cursor.execute(f"ANALYZE {quote(table)}")
+
+
+def partition_transactions(
+    scheme: Optional[str],
+    options: Optional[Dict] = None,
+    using: str = DEFAULT_DB_ALIAS,
+) -> List[str]:
+    """
+    Rebuilds the transactions table of the given database partitioned with
+    the given scheme, or as a plain table when it is None, returning the
+    names of its partitions:
+
+    - MONTH: range partitions by the month of creation (in UTC) from the
+      month of the first transaction up to `MONTHS_AHEAD` months from now
+      (see create_upcoming_partitions), along with a default partition for
+      the transactions of months without a partition
+    - COMPANY: `HASH_PARTITIONS` hash partitions by company
+
+    The options default to the TRANSACTIONS_PARTITIONING setting.
+
+    The transactions are copied to the new table, which takes over the
+    name, constraints, indexes and triggers of the former one, so the
+    table is locked for the whole copy. The primary key becomes the id
+    along with the partition key, as Postgres requires. Nothing is done
+    when the table is already partitioned with the given scheme.
+    """
+    options = options or settings.TRANSACTIONS_PARTITIONING
+    table = Transaction._meta.db_table
+
+    database = connections[using]
+    with database.cursor() as cursor:
+        # checked before locking the table, which is checked again once
+        # locked
+        if get_scheme(cursor, table) == scheme:
+            return get_partitions(cursor, table)
+
+    with transaction.atomic(using=using), database.cursor() as cursor:
+        cursor.execute(
+            f"LOCK TABLE {database.ops.quote_name(table)} "
+            "IN ACCESS EXCLUSIVE MODE"
+        )
+        # the (deferred) foreign key checks of the transactions recorded in
+        # this database transaction must run before the table is dropped
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        current = get_scheme(cursor, table)
+        if current != scheme:
+            if current and scheme:
+                # the partitions of both schemes could have the same names
+                _rebuild(cursor, table, None, options)
+            _rebuild(cursor, table, scheme, options)
+        return get_partitions(cursor, table)
+
+
+def create_upcoming_partitions(
+    months_ahead: int, using: str = DEFAULT_DB_ALIAS
+) -> List[str]:
+    """
+    Creates the missing monthly partitions of the transactions table of the
+    given database, from the current month up to the given number of months
+    ahead, returning the names of the created ones. Any transaction of those
+    months already in the default partition is moved to its partition.
+
+    Does nothing unless the table is partitioned by month.
+    """
+    table = Transaction._meta.db_table
+    database = connections[using]
+    with transaction.atomic(using=using), database.cursor() as cursor:
+        if get_scheme(cursor, table) != MONTH:
+            return []
+
+        current = _month(datetime.now(timezone.utc))
+        return create_month_partitions(
+            cursor, table, current, _add_months(current, months_ahead)
+        )
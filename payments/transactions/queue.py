@@ -0,0 +1,479 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import count, islice
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from companies.cache import company_cache
+from transactions.models import Transaction
+from transactions.utils import merge_transactions
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+SLOT_PREFIX = "slot-"
+LOCK_FILENAME = "lock"
+DEAD_LETTER_DIRECTORY = "dead-letter"
+DEAD_LETTER_SUFFIX = ".jsonl"
+
+
+def encode_record(transaction: Transaction, cnpj: int) -> bytes:
+    """
+    Encodes a transaction as a line of the log, along with the CNPJ of its
+    company, which tells its shard when it is flushed
+    """
+    record = {
+        "id": str(transaction.id),
+        "company_id": str(transaction.company_id),
+        "cnpj": cnpj,
+        "client": transaction.client,
+        "value": transaction.value,
+        "description": transaction.description,
+        "created_at": transaction.created_at.isoformat(),
+    }
+    return json.dumps(record).encode() + b"\n"
+
+
+class QueuedRecord(NamedTuple):
+    line: bytes
+    cnpj: int
+    transaction: Transaction
+
+
+def decode_record(line: bytes) -> QueuedRecord:
+    record = json.loads(line)
+    cnpj = record.pop("cnpj")
+    record["id"] = UUID(record["id"])
+    record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return QueuedRecord(line, cnpj, Transaction(**record))
+
+
+def _fsync_directory(directory: str):
+    # makes the entries of the directory (e.g. a new segment) durable
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class SegmentLog:
+    """
+    Append-only log kept in numbered segment files of a directory. Each line
+    is written through to the disk (fsync) before `append` returns, and the
+    current segment is sealed once it grows past the segment size, the next
+    line starting a new one. Sealed segments are read back whole and removed
+    once their lines are no longer needed.
+
+    The log is not thread safe, its callers serialize the appends.
+    """
+
+    def __init__(self, directory: str, segment_size: int):
+        self.directory = directory
+        self.segment_size = segment_size
+        self._file: IO[bytes] = None
+        segments = self.segments()
+        self._sequence = self._sequence_of(segments[-1]) + 1 if segments else 1
+
+    @staticmethod
+    def _sequence_of(path: str) -> int:
+        return int(os.path.basename(path)[: -len(SEGMENT_SUFFIX)])
+
+    def segments(self) -> List[str]:
+        """Lists the segments in the order they were written"""
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def append(self, line: bytes) -> str:
+        """Appends a line, returning the segment it was written to"""
+        if self._file is None:
+            path = os.path.join(
+                self.directory, f"{self._sequence:012d}{SEGMENT_SUFFIX}"
+            )
+            self._file = open(path, "ab")
+            _fsync_directory(self.directory)
+
+        segment = self._file.name
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._file.tell() >= self.segment_size:
+            self.seal()
+        return segment
+
+    def seal(self):
+        """Closes the current segment, so the next line starts a new one"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._sequence += 1
+
+    @staticmethod
+    def read(path: str) -> Iterator[bytes]:
+        """
+        Reads the lines of a segment. A line cut short by a crash while it
+        was appended, which was never acknowledged, is left out.
+        """
+        with open(path, "rb") as segment:
+            for line in segment:
+                if line.endswith(b"\n"):
+                    yield line
+
+
+def _lock_slot(directory: str) -> Optional[IO[str]]:
+    """
+    Locks a slot directory of the queue for the calling process, returning
+    the locked file, or None when another process holds the slot. The lock
+    is released once the file is closed or the process exits.
+    """
+    lock_file = open(os.path.join(directory, LOCK_FILENAME), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class WriteBehindQueue:
+    """
+    Durable write-behind queue of the transactions recorded by the API,
+    which are appended to a log on the local disk (see SegmentLog) instead
+    of being inserted, so recording a transaction costs a fsync instead of
+    a round trip and a commit. A flusher thread seals the current segment
+    and merges the sealed ones into the database every `interval` seconds,
+    in batches of `batch_size` transactions (see
+    transactions.utils.merge_transactions), removing each segment once it
+    is merged.
+
+    Each process using the queue claims a slot, a directory of the queue
+    locked by the process, for its log, so the processes of a server share
+    the queue directory. The slots left by processes which exited (e.g.
+    crashed) are replayed by the next process claiming them and drained by
+    the flushers of the other processes. The transactions get their ids
+    when queued, so replaying a segment merged before (e.g. by a process
+    which crashed before removing it) inserts nothing twice.
+
+    A transaction is never dropped once queued: the ones which can not be
+    merged, as their company is unknown or not found in its cached shard,
+    are retried with their companies looked up again, and what is still
+    left is kept in the dead-letter directory of the queue.
+
+    The depth (transactions queued and not flushed yet) and the lag (age of
+    the oldest of them) are tracked for the slot of the process.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int,
+        batch_size: int,
+        interval: float,
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.flushed = 0
+        self.dead_lettered = 0
+        self._log: Optional[SegmentLog] = None
+        self._slot_lock: Optional[IO[str]] = None
+        # queued transactions of each segment of the slot, along with the
+        # time the first of them was created at
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        # the process which started the queue, whose children (forked
+        # workers) inherit its state but not its flusher thread
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._log is not None
+
+    def _slots(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.startswith(SLOT_PREFIX)
+        )
+
+    def open(self):
+        """
+        Claims a slot for the process, picking up the transactions its
+        former process left queued, which are flushed along with the new ones
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for index in count():
+            slot = os.path.join(self.directory, f"{SLOT_PREFIX}{index}")
+            os.makedirs(slot, exist_ok=True)
+            self._slot_lock = _lock_slot(slot)
+            if self._slot_lock is not None:
+                break
+
+        log = SegmentLog(slot, self.segment_size)
+        for segment in log.segments():
+            lines = list(SegmentLog.read(segment))
+            if lines:
+                first = decode_record(lines[0]).transaction
+                created_at = first.created_at.timestamp()
+                self._pending[segment] = (len(lines), created_at)
+        self._log = log
+
+    def start(self):
+        """Opens the queue and starts flushing it in a background thread"""
+        self._pid = os.getpid()
+        self.open()
+        self._stopped.clear()
+        self._flusher = threading.Thread(
+            target=self._run, name="transactions-flusher", daemon=True
+        )
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _forget(self):
+        """
+        Drops the state inherited from the parent process, leaving the slot
+        of the parent to it (closing the inherited lock file does not
+        release the lock the parent holds)
+        """
+        self._log = None
+        self._pending = {}
+        self._flusher = None
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+            self._slot_lock = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def ensure_started(self):
+        """
+        Starts the queue unless it was started by the calling process. A
+        process forked from one which started it (e.g. a worker of a server
+        preloading the application) does not inherit the flusher thread, so
+        it starts the queue again in a slot of its own.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._forget()
+            self.start()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.flush()
+                except DatabaseError as exc:
+                    logger.warning(f"Could not flush the queue. Got {exc}")
+                    # the connections may be broken, new ones are opened
+                    connections.close_all()
+        finally:
+            # the connections of the thread are its own
+            connections.close_all()
+
+    def put(self, transaction: Transaction, cnpj: int):
+        """
+        Queues a transaction of the company with the given CNPJ, once it is
+        written through to the disk
+        """
+        line = encode_record(transaction, cnpj)
+        with self._lock:
+            segment = self._log.append(line)
+            queued, first_at = self._pending.get(
+                segment, (0, transaction.created_at.timestamp())
+            )
+            self._pending[segment] = (queued + 1, first_at)
+
+    def _merge_batch(
+        self, records: List[QueuedRecord], companies: Dict
+    ) -> Tuple[int, List[QueuedRecord]]:
+        """
+        Merges queued transactions into the shards of their companies,
+        returning how many were inserted along with the records which were
+        not merged: the ones of unknown companies, and the ones skipped by
+        the shard as their company is not there (e.g. moved meanwhile)
+        """
+        inserted = 0
+        unmerged = []
+        records_by_shard = defaultdict(list)
+        for record in records:
+            company = companies[record.cnpj]
+            if company is None:
+                unmerged.append(record)
+            else:
+                records_by_shard[company.shard].append(record)
+
+        for shard, shard_records in records_by_shard.items():
+            transactions = [record.transaction for record in shard_records]
+            merged = merge_transactions(transactions, shard)
+            inserted += merged
+            if merged < len(shard_records):
+                # the others were either merged before (replayed) or skipped
+                merged_ids = set(
+                    Transaction.objects.using(shard)
+                    .filter(id__in=[t.id for t in transactions])
+                    .values_list("id", flat=True)
+                )
+                unmerged.extend(
+                    record
+                    for record in shard_records
+                    if record.transaction.id not in merged_ids
+                )
+        return inserted, unmerged
+
+    def _dead_letter(self, segment: str, records: List[QueuedRecord]):
+        """
+        Keeps the records which could not be merged in a file of the
+        dead-letter directory of the queue, named after the first
+        transaction of their segment, so replaying the segment rewrites it
+        """
+        directory = os.path.join(self.directory, DEAD_LETTER_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        first = decode_record(next(SegmentLog.read(segment))).transaction
+        path = os.path.join(directory, f"{first.id}{DEAD_LETTER_SUFFIX}")
+        with open(path, "wb") as dead_letter:
+            dead_letter.writelines(record.line for record in records)
+            dead_letter.flush()
+            os.fsync(dead_letter.fileno())
+        _fsync_directory(directory)
+
+        self.dead_lettered += len(records)
+        logger.error(
+            f"Could not merge {len(records)} queued transactions, as their "
+            f"companies could not be found, keeping them in {path}"
+        )
+
+    def _merge_segment(self, segment: str) -> int:
+        inserted = 0
+        dead = []
+        lines = SegmentLog.read(segment)
+        while True:
+            batch = [
+                decode_record(line) for line in islice(lines, self.batch_size)
+            ]
+            if not batch:
+                break
+
+            companies = company_cache.get_many(r.cnpj for r in batch)
+            merged, unmerged = self._merge_batch(batch, companies)
+            inserted += merged
+            if unmerged:
+                # the cached companies (or their shards) may be stale
+                companies = company_cache.refresh_many(
+                    r.cnpj for r in unmerged
+                )
+                merged, unmerged = self._merge_batch(unmerged, companies)
+                inserted += merged
+            dead.extend(unmerged)
+
+        if dead:
+            self._dead_letter(segment, dead)
+        os.remove(segment)
+        return inserted
+
+    def _drain_slot(self, slot: str) -> int:
+        """Merges the segments of a slot left by a process which exited"""
+        lock = _lock_slot(slot)
+        if lock is None:
+            return 0
+        with lock:
+            log = SegmentLog(slot, self.segment_size)
+            return sum(map(self._merge_segment, log.segments()))
+
+    def flush(self) -> int:
+        """
+        Merges the queued transactions into the database, along with the
+        ones of the slots left by other processes, returning how many
+        transactions were inserted. The ones which can not be merged (their
+        companies no longer exist) are moved to the dead-letter directory
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._log.seal()
+                segments = self._log.segments()
+
+            flushed = 0
+            for segment in segments:
+                flushed += self._merge_segment(segment)
+                with self._lock:
+                    self._pending.pop(segment, None)
+
+            own_slot = self._log.directory
+            for slot in self._slots():
+                if slot != own_slot:
+                    flushed += self._drain_slot(slot)
+
+            self.flushed += flushed
+            return flushed
+
+    def close(self):
+        """
+        Stops the flusher and flushes what is left, which is otherwise
+        replayed by the next process claiming the slot
+        """
+        if self._flusher is not None:
+            self._stopped.set()
+            self._flusher.join()
+            self._flusher = None
+        if self._log is None:
+            return
+
+        try:
+            self.flush()
+        except DatabaseError as exc:
+            logger.warning(f"Could not flush the queue. Got {exc}")
+        self._log = None
+        self._pending.clear()
+        self._slot_lock.close()
+        self._slot_lock = None
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Reports the depth of the queue of the process, its lag in seconds,
+        how many segments it spans, how many transactions were flushed and
+        how many were moved to the dead-letter directory
+        """
+        with self._lock:
+            depth = sum(queued for queued, _ in self._pending.values())
+            first_at = min(
+                (first_at for _, first_at in self._pending.values()),
+                default=None,
+            )
+            segments = len(self._pending)
+        lag = 0.0 if first_at is None else max(time.time() - first_at, 0.0)
+        return {
+            "depth": depth,
+            "lag": lag,
+            "segments": segments,
+            "flushed": self.flushed,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+transaction_queue = WriteBehindQueue(
+    directory=settings.TRANSACTIONS_QUEUE["DIRECTORY"],
+    segment_size=settings.TRANSACTIONS_QUEUE["SEGMENT_SIZE"],
+    batch_size=settings.TRANSACTIONS_QUEUE["BATCH_SIZE"],
+    interval=settings.TRANSACTIONS_QUEUE["FLUSH_INTERVAL"],
+)
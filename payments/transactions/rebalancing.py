@@ -0,0 +1,139 @@
+from collections import defaultdict
+from typing import List, Tuple
+
+from django.db import transaction
+
+from companies.cache import company_cache
+from companies.formats import DocumentNumber, format_cnpj, normalize_cnpj
+from companies.models import Company, CompanyPlacement
+from companies.shards import get_shards, hash_shard, shard_directory
+from payments.routers import PRIMARY
+from transactions.models import Transaction
+
+MOVE_CHUNK_SIZE = 5000
+
+
+class MoveError(Exception):
+    pass
+
+
+def _copy_transactions(
+    company: Company, source: str, target: str, chunk_size: int
+) -> int:
+    transactions = (
+        Transaction.objects.using(source)
+        .filter(company_id=company.id)
+        .order_by("created_at", "id")
+    )
+    copied = 0
+    chunk: List[Transaction] = []
+    for transaction_to_copy in transactions.iterator(chunk_size=chunk_size):
+        chunk.append(transaction_to_copy)
+        if len(chunk) == chunk_size:
+            Transaction.objects.using(target).bulk_create(chunk)
+            copied += len(chunk)
+            chunk = []
+    Transaction.objects.using(target).bulk_create(chunk)
+    return copied + len(chunk)
+
+
+def _delete_company(company_id, using: str):
+    Transaction.objects.using(using).filter(company_id=company_id).delete()
+    # along with its summary and rollups
+    Company.objects.using(using).filter(id=company_id).delete()
+
+
+def move_company(
+    cnpj: DocumentNumber, target: str, chunk_size: int = MOVE_CHUNK_SIZE
+) -> Tuple[str, int]:
+    """
+    Moves the company with the given CNPJ, along with its transactions, to
+    the given shard, returning the shard it was moved from and how many
+    transactions were moved. The summaries and rollups of the company are
+    rebuilt in the target shard by its triggers as the transactions are
+    copied.
+
+    The company is locked in its former shard during the move, so the
+    transactions recorded meanwhile wait for it and are then rejected, as
+    the company no longer exists there. Other processes pick up the move
+    within the time to live of their company cache.
+
+    The copy is committed before the move is recorded in the directory,
+    which is committed before the company is deleted from its former shard,
+    so the company is never missing. A copy left by an interrupted move is
+    replaced when moving the company again.
+    """
+    if target not in get_shards():
+        raise MoveError(f"Unknown shard {target!r}")
+
+    source = shard_directory.get(cnpj)
+    if source == target:
+        raise MoveError(
+            f"Company {format_cnpj(cnpj)} is already in shard {target!r}"
+        )
+
+    cnpj = int(normalize_cnpj(cnpj))
+    with transaction.atomic(using=source):
+        company = (
+            Company.objects.using(source)
+            .select_for_update()
+            .filter(cnpj=cnpj)
+            .first()
+        )
+        if company is None:
+            raise MoveError(
+                f"Company {format_cnpj(cnpj)} not found in shard {source!r}"
+            )
+
+        duplicates = Company.objects.using(target).filter(cnpj=cnpj)
+        if duplicates.exclude(id=company.id).exists():
+            raise MoveError(
+                f"Another company {format_cnpj(cnpj)} exists in shard "
+                f"{target!r}"
+            )
+
+        with transaction.atomic(using=target):
+            _delete_company(company.id, target)
+            Company.objects.using(target).bulk_create([company])
+            moved = _copy_transactions(company, source, target, chunk_size)
+
+        placements = CompanyPlacement.objects.using(PRIMARY)
+        if hash_shard(cnpj, get_shards()) == target:
+            placements.filter(cnpj=cnpj).delete()
+        else:
+            placements.update_or_create(cnpj=cnpj, defaults={"shard": target})
+
+        _delete_company(company.id, source)
+
+    company_cache.invalidate(cnpj, company_id=company.id)
+    return source, moved
+
+
+def pin_companies() -> int:
+    """
+    Records the placements of the companies held by shards other than the
+    ones picked by the hash of their CNPJs, returning how many were pinned,
+    so they keep being served from the shards holding them. Meant to be run
+    when enabling sharding or adding shards, which changes the shards picked
+    by the hash for about 1/N of the companies, before serving requests.
+
+    A company held by more than one shard (e.g. by an interrupted move) is
+    served from the shard picked by its hash if that shard holds it, from
+    the first shard holding it otherwise.
+    """
+    shards = get_shards()
+    holders = defaultdict(list)
+    for shard in shards:
+        cnpjs = Company.objects.using(shard).values_list("cnpj", flat=True)
+        for cnpj in cnpjs.iterator():
+            holders[cnpj].append(shard)
+
+    placements = [
+        CompanyPlacement(cnpj=cnpj, shard=cnpj_shards[0])
+        for cnpj, cnpj_shards in holders.items()
+        if hash_shard(cnpj, shards) not in cnpj_shards
+    ]
+    with transaction.atomic(using=PRIMARY):
+        CompanyPlacement.objects.using(PRIMARY).all().delete()
+        CompanyPlacement.objects.using(PRIMARY).bulk_create(placements)
+    return len(placements)
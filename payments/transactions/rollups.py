@@ -0,0 +1,58 @@
+from typing import List
+from uuid import UUID
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from transactions.models import DailyRollup, HourlyRollup
+from transactions.summaries import CREATE_MISSING_SUMMARIES, LOCK_SUMMARIES
+
+ROLLUPS = (HourlyRollup, DailyRollup)
+
+DELETE_ROLLUPS = """
+DELETE FROM {table}
+WHERE company_id = ANY(%s)
+"""
+
+REBUILD_ROLLUPS = """
+INSERT INTO {table} (
+    company_id, bucket, total_value, transactions_count, min_value, max_value
+)
+SELECT
+    company_id,
+    date_trunc(%s, created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+    SUM(value),
+    COUNT(*),
+    MIN(value),
+    MAX(value)
+FROM transactions_transaction
+WHERE company_id = ANY(%s)
+GROUP BY 1, 2
+"""
+
+
+def rebuild_rollups(
+    company_ids: List[UUID], using: str = DEFAULT_DB_ALIAS
+) -> int:
+    """
+    Recomputes the hourly and daily rollups of the given companies from
+    their transactions, returning how many rollups were rebuilt.
+
+    As with rebuild_summaries, the summaries of the companies are locked
+    first. The rollup triggers fire after the summary ones, so transactions
+    recorded concurrently wait for the rebuild to be committed before
+    touching the rollups.
+    """
+    rebuilt = 0
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(CREATE_MISSING_SUMMARIES, [company_ids])
+        cursor.execute(LOCK_SUMMARIES, [company_ids])
+        for rollup in ROLLUPS:
+            table = connection.ops.quote_name(rollup._meta.db_table)
+            cursor.execute(DELETE_ROLLUPS.format(table=table), [company_ids])
+            cursor.execute(
+                REBUILD_ROLLUPS.format(table=table),
+                [rollup.grain, company_ids],
+            )
+            rebuilt += cursor.rowcount
+    return rebuilt
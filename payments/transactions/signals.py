@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.dispatch import receiver
+
+from transactions.queue import transaction_queue
+
+
+@receiver(request_started)
+def start_transaction_queue(sender, **kwargs):
+    # started by the processes serving the requests, rather than when the
+    # application is loaded, which may happen in a parent process (e.g. a
+    # server preloading the application) whose threads the workers it forks
+    # do not inherit
+    if settings.TRANSACTIONS_QUEUE["DIRECTORY"]:
+        transaction_queue.ensure_started()
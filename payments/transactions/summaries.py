@@ -0,0 +1,62 @@
+from typing import List
+from uuid import UUID
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+CREATE_MISSING_SUMMARIES = """
+INSERT INTO transactions_companysummary (
+    company_id, total_value, transactions_count, version
+)
+SELECT id, 0, 0, 0
+FROM companies_company
+WHERE id = ANY(%s)
+ON CONFLICT (company_id) DO NOTHING
+"""
+
+LOCK_SUMMARIES = """
+SELECT company_id
+FROM transactions_companysummary
+WHERE company_id = ANY(%s)
+ORDER BY company_id
+FOR UPDATE
+"""
+
+REBUILD_SUMMARIES = """
+UPDATE transactions_companysummary AS summary SET
+    total_value = totals.total_value,
+    transactions_count = totals.transactions_count,
+    last_transaction_at = totals.last_transaction_at,
+    version = summary.version + 1
+FROM (
+    SELECT
+        company.id AS company_id,
+        COALESCE(SUM(transaction.value), 0) AS total_value,
+        COUNT(transaction.id) AS transactions_count,
+        MAX(transaction.created_at) AS last_transaction_at
+    FROM companies_company AS company
+    LEFT JOIN transactions_transaction AS transaction
+        ON transaction.company_id = company.id
+    WHERE company.id = ANY(%s)
+    GROUP BY company.id
+) AS totals
+WHERE summary.company_id = totals.company_id
+"""
+
+
+def rebuild_summaries(
+    company_ids: List[UUID], using: str = DEFAULT_DB_ALIAS
+) -> int:
+    """
+    Recomputes the summaries of the given companies from their transactions,
+    returning how many summaries were rebuilt.
+
+    The summaries are locked before the transactions are aggregated, so
+    transactions recorded concurrently are either part of the aggregation or
+    added by the summary triggers once the rebuild is committed.
+    """
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(CREATE_MISSING_SUMMARIES, [company_ids])
+        cursor.execute(LOCK_SUMMARIES, [company_ids])
+        cursor.execute(REBUILD_SUMMARIES, [company_ids])
+        return cursor.rowcount
@@ -1,19 +1,30 @@
+from companies.shards import shard_directory
 from companies.tests.factories import CompanyFactory
 from factory import Faker, SubFactory
 from factory.django import DjangoModelFactory
-from factory.fuzzy import FuzzyAttribute, FuzzyFloat
+from factory.fuzzy import FuzzyAttribute, FuzzyInteger
+from payments.routers import use_shard
 from pycpfcnpj.gen import cpf_with_punctuation
 from transactions.models import Transaction
+from transactions.money import CENTS
 
-MIN_VALUE = 150.00
-MAX_VALUE = 5000.00
+MIN_VALUE = 150 * CENTS
+MAX_VALUE = 5000 * CENTS
 
 
 class TransactionFactory(DjangoModelFactory):
     company = SubFactory(CompanyFactory)
     client = FuzzyAttribute(cpf_with_punctuation)
-    value = FuzzyFloat(MIN_VALUE, high=MAX_VALUE, precision=2)
+    value = FuzzyInteger(MIN_VALUE, high=MAX_VALUE)
     description = Faker("catch_phrase", locale="pt_BR")
 
     class Meta:
         model = Transaction
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        # created in the shard of its company, along with it
+        shard = shard_directory.get(kwargs["company"].cnpj)
+        with use_shard(shard):
+            manager = cls._get_manager(model_class).using(shard)
+            return manager.create(*args, **kwargs)
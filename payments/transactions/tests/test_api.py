@@ -1,17 +1,38 @@
+import gzip
+import json
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.db import IntegrityError
 from django.urls import reverse
 
 from companies.api.serializers import CompanyReportSerializer
+from companies.cache import company_cache
+from companies.formats import format_cnpj, normalize_cnpj
 from rest_framework import status
 from rest_framework.test import APITestCase
+from transactions.api.pagination import TransactionKeysetPagination
 from transactions.api.serializers import (
     TransactionReportSerializer,
     TransactionSerializer,
 )
+from transactions.api.views import (
+    RecordTransactionView,
+    TransactionsReportView,
+)
+from transactions.batching import InsertBatcher, write_transactions
+from transactions.cache import report_cache
 from transactions.models import Transaction
+from transactions.money import from_cents
+from transactions.queue import WriteBehindQueue
 from transactions.tests.factories import TransactionFactory
 
 TRANSACTION_VIEW_NAME = "v1:transaction"
+TRANSACTIONS_BATCH_VIEW_NAME = "v1:transactions_batch"
+TRANSACTION_CREATION_QUERIES = 2
 REPORT_VIEW_NAME = "v1:report"
+TIME_SERIES_VIEW_NAME = "v1:time_series"
 
 
 class TestTransactionEndpoint(APITestCase):
@@ -33,6 +54,103 @@ class TestTransactionEndpoint(APITestCase):
         self.assertEqual(response.data, {"aceito": True})
         self.assertEqual(Transaction.objects.count(), 1)
 
+    def test_transaction_creation_query_budget(self):
+        """
+        Should create a Transaction record with a single query for resolving
+        the company and a single insert
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.build()
+        transaction.company.save()
+        payload = TransactionSerializer(transaction).data
+
+        with self.assertNumQueries(TRANSACTION_CREATION_QUERIES):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transaction_creation_cached_company(self):
+        """
+        Should create a Transaction record with a single insert when the
+        company has already been resolved by a previous request
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.build()
+        transaction.company.save()
+        payload = TransactionSerializer(transaction).data
+        company_cache.get(transaction.company.cnpj)
+
+        with self.assertNumQueries(1):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transaction_creation_queued(self):
+        """
+        Should accept a Transaction once written to the write-behind queue,
+        without inserting it, when the queue is open
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.build()
+        transaction.company.save()
+        payload = TransactionSerializer(transaction).data
+        company_cache.get(transaction.company.cnpj)
+
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=1
+            )
+            queue.open()
+            with patch.object(RecordTransactionView, "queue", queue):
+                with self.assertNumQueries(0):
+                    response = self.client.post(url, payload)
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data, {"aceito": True})
+            self.assertEqual(Transaction.objects.count(), 0)
+            self.assertEqual(queue.stats()["depth"], 1)
+
+            queue.close()
+
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transaction_creation_batched(self):
+        """
+        Should create a Transaction record through the batcher, with a single
+        insert, when the batching is enabled
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.build()
+        transaction.company.save()
+        payload = TransactionSerializer(transaction).data
+        company_cache.get(transaction.company.cnpj)
+        batcher = InsertBatcher(write_transactions, window=0.001, max_size=10)
+
+        with patch.object(RecordTransactionView, "batcher", batcher):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"aceito": True})
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transaction_creation_unknown_company_cached(self):
+        """
+        Should reject a Transaction of an unknown company without querying
+        the database once the company is known to not exist
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.build()
+        payload = TransactionSerializer(transaction).data
+        company_cache.get(transaction.company.cnpj)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(url, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"aceito": False})
+
     def test_transaction_creation_company_does_not_exist(self):
         """
         Should fail to create a Transaction record in the database when
@@ -50,6 +168,27 @@ class TestTransactionEndpoint(APITestCase):
         self.assertEqual(response.data, {"aceito": False})
         self.assertEqual(Transaction.objects.count(), 0)
 
+    def test_transaction_creation_refused(self):
+        """
+        Should not take a Transaction refused by a constraint other than
+        the foreign key of its company as of an unknown company
+        """
+        url = reverse(TRANSACTION_VIEW_NAME)
+        transaction = TransactionFactory.create()
+        payload = TransactionSerializer(transaction).data
+        cnpj = transaction.company.cnpj
+        cached = company_cache.get(cnpj)
+
+        # as a transaction whose id was taken
+        with patch(
+            "transactions.api.views.build_transaction",
+            return_value=transaction,
+        ):
+            with self.assertRaises(IntegrityError):
+                self.client.post(url, payload)
+
+        self.assertEqual(company_cache.get_cached(cnpj), (True, cached))
+
     def test_transaction_creation_invalid_client(self):
         """
         Should fail to create a Transaction record in the database when
@@ -89,7 +228,121 @@ class TestTransactionEndpoint(APITestCase):
         self.assertEqual(Transaction.objects.count(), 0)
 
 
+class TestTransactionsBatchEndpoint(APITestCase):
+    def _build_payload(self, size):
+        payload = []
+        for _ in range(size):
+            transaction = TransactionFactory.build()
+            transaction.company.save()
+            payload.append(TransactionSerializer(transaction).data)
+        return payload
+
+    def test_batch_creation(self):
+        """
+        Should successfully create all Transaction records in the database
+        when POSTing a list of transactions to the endpoint, returning HTTP
+        Status 201 and an accepted flag for each transaction
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+        payload = self._build_payload(3)
+
+        self.assertEqual(Transaction.objects.count(), 0)
+
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, [{"aceito": True}] * 3)
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_batch_creation_gzip(self):
+        """
+        Should successfully create all Transaction records in the database
+        when POSTing a gzip compressed list of transactions to the endpoint
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+        payload = self._build_payload(2)
+        body = gzip.compress(json.dumps(payload).encode("utf-8"))
+
+        response = self.client.post(
+            url,
+            body,
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, [{"aceito": True}] * 2)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_batch_creation_invalid_gzip(self):
+        """
+        Should fail to create Transaction records when POSTing a body that
+        claims to be gzip compressed but is not, returning HTTP Status 400
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+        body = json.dumps(self._build_payload(1))
+
+        response = self.client.post(
+            url,
+            body,
+            content_type="application/json",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_batch_creation_partial_failure(self):
+        """
+        Should create only the valid Transaction records when POSTing a list
+        with invalid transactions or unknown companies, flagging each
+        transaction as accepted or not
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+        payload = self._build_payload(3)
+        payload[0]["cliente"] = "111.111.111-11"
+        payload[2]["estabelecimento"] = TransactionFactory.build().company.cnpj
+
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data,
+            [{"aceito": False}, {"aceito": True}, {"aceito": False}],
+        )
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_batch_creation_all_rejected(self):
+        """
+        Should return HTTP Status 400 when none of the POSTed transactions
+        is accepted
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+        payload = self._build_payload(2)
+        for piece in payload:
+            piece["valor"] = "invalid"
+
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{"aceito": False}] * 2)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_batch_creation_invalid_payload(self):
+        """
+        Should fail to create Transaction records when POSTing something
+        other than a non empty list of transactions, returning HTTP Status
+        400 and the expected message
+        """
+        url = reverse(TRANSACTIONS_BATCH_VIEW_NAME)
+
+        for payload in ({"valor": 10.0}, []):
+            response = self.client.post(url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {"aceito": False})
+
+        self.assertEqual(Transaction.objects.count(), 0)
+
+
 class TestReportEndpoint(APITestCase):
+    def setUp(self):
+        report_cache.clear()
+
     def test_report_missing_cnpj(self):
         """
         Should fail to get a transactions report when GETting the endpoint
@@ -127,7 +380,7 @@ class TestReportEndpoint(APITestCase):
         """
         url = reverse(REPORT_VIEW_NAME)
         transaction = TransactionFactory.build()
-        cnpj = transaction.company.cnpj
+        cnpj = format_cnpj(transaction.company.cnpj)
 
         expected_message = f"Estabelecimento com cnpj '{cnpj}' nao encontrado"
         response = self.client.get(url, {"cnpj": cnpj})
@@ -154,15 +407,24 @@ class TestReportEndpoint(APITestCase):
                 TransactionReportSerializer(transaction_one).data,
                 TransactionReportSerializer(transaction_two).data,
             ],
-            "total_recebido": transaction_one.value + transaction_two.value,
+            "total_recebido": from_cents(
+                transaction_one.value + transaction_two.value
+            ),
+            "proximo_cursor": None,
         }
 
         url = reverse(REPORT_VIEW_NAME)
-        cnpj = company.cnpj
+        cnpj = format_cnpj(company.cnpj)
 
         response = self.client.get(url, {"cnpj": cnpj})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.json(), expected_data)
+        self.assertEqual(response.json()["estabelecimento"]["cnpj"], cnpj)
+
+        # the cnpj may be given without punctuation as well
+        response = self.client.get(url, {"cnpj": normalize_cnpj(cnpj)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected_data)
 
     def test_report_no_transactions(self):
         """
@@ -178,11 +440,515 @@ class TestReportEndpoint(APITestCase):
             "estabelecimento": CompanyReportSerializer(company).data,
             "recebimentos": [],
             "total_recebido": 0.00,
+            "proximo_cursor": None,
         }
 
         url = reverse(REPORT_VIEW_NAME)
-        cnpj = company.cnpj
+        cnpj = format_cnpj(company.cnpj)
 
         response = self.client.get(url, {"cnpj": cnpj})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.json(), expected_data)
+
+    def _create_transactions(self, size):
+        company = TransactionFactory.build().company
+        company.save()
+        return [
+            TransactionFactory.create(company=company) for _ in range(size)
+        ]
+
+    def test_report_pagination(self):
+        """
+        Should paginate the report transactions in creation order following
+        the returned cursors, keeping pages stable while new transactions are
+        recorded
+        """
+        transactions = self._create_transactions(5)
+        company = transactions[0].company
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj), "limite": 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()["recebimentos"],
+            TransactionReportSerializer(transactions[:2], many=True).data,
+        )
+        self.assertIsNotNone(response.json()["proximo_cursor"])
+
+        transactions.append(TransactionFactory.create(company=company))
+
+        received = list(response.json()["recebimentos"])
+        cursor = response.json()["proximo_cursor"]
+        while cursor:
+            response = self.client.get(
+                url,
+                {
+                    "cnpj": format_cnpj(company.cnpj),
+                    "limite": 2,
+                    "cursor": cursor,
+                },
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response.json()["total_recebido"],
+                from_cents(
+                    sum(transaction.value for transaction in transactions)
+                ),
+            )
+            received.extend(response.json()["recebimentos"])
+            cursor = response.json()["proximo_cursor"]
+
+        self.assertEqual(
+            received,
+            TransactionReportSerializer(transactions, many=True).data,
+        )
+
+    def test_report_default_page_size(self):
+        """
+        Should limit the report transactions to the default page size when
+        no limit is given
+        """
+        transactions = self._create_transactions(3)
+        url = reverse(REPORT_VIEW_NAME)
+
+        with patch.object(TransactionKeysetPagination, "default_limit", 2):
+            response = self.client.get(
+                url, {"cnpj": format_cnpj(transactions[0].company.cnpj)}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["recebimentos"]), 2)
+        self.assertIsNotNone(response.json()["proximo_cursor"])
+
+    def test_report_invalid_pagination(self):
+        """
+        Should fail to get a transactions report when providing an invalid
+        limit or cursor, returning HTTP Status 400 and the expected message
+        """
+        transactions = self._create_transactions(1)
+        cnpj = format_cnpj(transactions[0].company.cnpj)
+        url = reverse(REPORT_VIEW_NAME)
+        max_limit = TransactionKeysetPagination.max_limit
+        expected_limit_message = f"Informe um 'limite' entre 1 e {max_limit}"
+
+        for limit in (0, max_limit + 1, "invalid"):
+            response = self.client.get(url, {"cnpj": cnpj, "limite": limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {"erro": expected_limit_message})
+
+        response = self.client.get(url, {"cnpj": cnpj, "cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"erro": "Informe um 'cursor' valido"})
+
+    def test_report_cached(self):
+        """
+        Should serve a cached transactions report while no transaction is
+        recorded for the company, only querying its summary version
+        """
+        transaction = TransactionFactory.create()
+        url = reverse(REPORT_VIEW_NAME)
+        cnpj = format_cnpj(transaction.company.cnpj)
+        company_cache.get(cnpj)
+
+        response = self.client.get(url, {"cnpj": cnpj})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            cached_response = self.client.get(url, {"cnpj": cnpj})
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(report_cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_report_cache_pages(self):
+        """
+        Should cache each page of a transactions report on its own
+        """
+        transaction = TransactionFactory.create()
+        TransactionFactory.create(company=transaction.company)
+        url = reverse(REPORT_VIEW_NAME)
+        cnpj = format_cnpj(transaction.company.cnpj)
+
+        first_page = self.client.get(url, {"cnpj": cnpj, "limite": 1})
+        cursor = first_page.json()["proximo_cursor"]
+        second_page = self.client.get(
+            url, {"cnpj": cnpj, "limite": 1, "cursor": cursor}
+        )
+        self.assertNotEqual(first_page.content, second_page.content)
+        self.assertEqual(report_cache.stats(), {"hits": 0, "misses": 2})
+
+    def test_report_cache_invalidation(self):
+        """
+        Should stop serving a cached transactions report once a transaction
+        is recorded for the company
+        """
+        transaction = TransactionFactory.create()
+        company = transaction.company
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(url, {"cnpj": format_cnpj(company.cnpj)})
+        self.assertEqual(len(response.json()["recebimentos"]), 1)
+
+        payload = TransactionSerializer(
+            TransactionFactory.build(company=company)
+        ).data
+        response = self.client.post(
+            reverse(TRANSACTION_VIEW_NAME), payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url, {"cnpj": format_cnpj(company.cnpj)})
+        self.assertEqual(len(response.json()["recebimentos"]), 2)
+        self.assertEqual(report_cache.stats(), {"hits": 0, "misses": 2})
+
+    def test_report_exact_total(self):
+        """
+        Should sum the transactions values exactly, as integer cents, both
+        in the company summary and over a date range
+        """
+        company = TransactionFactory.build().company
+        company.save()
+        url = reverse(TRANSACTION_VIEW_NAME)
+        for valor in ("0.10", "0.20"):
+            payload = TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            payload["valor"] = valor
+            response = self.client.post(url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        url = reverse(REPORT_VIEW_NAME)
+        for params in ({}, {"inicio": "2020-01-01"}):
+            response = self.client.get(
+                url, {"cnpj": format_cnpj(company.cnpj), **params}
+            )
+            data = response.json()
+            self.assertEqual(data["total_recebido"], 0.3)
+            self.assertEqual(
+                [item["valor"] for item in data["recebimentos"]], [0.1, 0.2]
+            )
+
+    def test_report_not_modified(self):
+        """
+        Should answer a transactions report request with HTTP Status 304 and
+        no body when the If-None-Match header matches the report ETag, only
+        querying the company summary
+        """
+        transaction = TransactionFactory.create()
+        url = reverse(REPORT_VIEW_NAME)
+        cnpj = format_cnpj(transaction.company.cnpj)
+        company_cache.get(cnpj)
+
+        response = self.client.get(url, {"cnpj": cnpj})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.assertNumQueries(1):
+                response = self.client.get(
+                    url, {"cnpj": cnpj}, HTTP_IF_NONE_MATCH=if_none_match
+                )
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response["ETag"], etag)
+
+    def test_report_etag_changes(self):
+        """
+        Should change the ETag of a transactions report when a transaction is
+        recorded for the company or another page is requested
+        """
+        transaction = TransactionFactory.create()
+        company = transaction.company
+        url = reverse(REPORT_VIEW_NAME)
+
+        etag = self.client.get(url, {"cnpj": format_cnpj(company.cnpj)})[
+            "ETag"
+        ]
+        page_etag = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj), "limite": 1}
+        )["ETag"]
+        self.assertNotEqual(page_etag, etag)
+
+        TransactionFactory.create(company=company)
+        response = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj)}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["recebimentos"]), 2)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_report_date_range(self):
+        """
+        Should only list and sum the transactions created within the
+        informed dates, both when paginating and streaming the report
+        """
+        company = TransactionFactory.build().company
+        company.save()
+        created_at = [
+            datetime(2020, 7, 31, 23, 59, tzinfo=timezone.utc),
+            datetime(2020, 8, 1, tzinfo=timezone.utc),
+            datetime(2020, 8, 2, 12, tzinfo=timezone.utc),
+            datetime(2020, 8, 3, tzinfo=timezone.utc),
+        ]
+        transactions = [
+            TransactionFactory.create(company=company, created_at=moment)
+            for moment in created_at
+        ]
+        expected_transactions = transactions[1:3]
+        url = reverse(REPORT_VIEW_NAME)
+        params = {"cnpj": format_cnpj(company.cnpj), "inicio": "2020-08-01"}
+        params["fim"] = "2020-08-02"
+
+        expected_data = {
+            "estabelecimento": CompanyReportSerializer(company).data,
+            "recebimentos": [
+                TransactionReportSerializer(transaction).data
+                for transaction in expected_transactions
+            ],
+            "total_recebido": from_cents(
+                sum(transaction.value for transaction in expected_transactions)
+            ),
+            "proximo_cursor": None,
+        }
+
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected_data)
+
+        response = self.client.get(url, {**params, "completo": "true"})
+        self.assertEqual(
+            json.loads(b"".join(response.streaming_content)), expected_data
+        )
+
+        response = self.client.get(url, {**params, "fim": "2020-08-01"})
+        self.assertEqual(
+            response.json()["recebimentos"], expected_data["recebimentos"][:1]
+        )
+
+    def test_report_invalid_date_range(self):
+        """
+        Should fail to get a transactions report when providing invalid
+        dates, returning HTTP Status 400 and the expected message
+        """
+        transaction = TransactionFactory.create()
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(
+            url,
+            {"cnpj": format_cnpj(transaction.company.cnpj), "inicio": "ontem"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {
+                "erro": "Informe um 'inicio' valido (AAAA-MM-DD ou "
+                "AAAA-MM-DDTHH:MM:SS)"
+            },
+        )
+
+    def test_report_streaming(self):
+        """
+        Should stream the complete transactions report, with the same format
+        as the paginated report, when requesting the complete report
+        """
+        transactions = self._create_transactions(5)
+        company = transactions[0].company
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(
+            url,
+            {
+                "cnpj": format_cnpj(company.cnpj),
+                "limite": 5,
+                "completo": "true",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+        paginated_response = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj), "limite": 5}
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content), paginated_response.content
+        )
+        self.assertNotEqual(response["ETag"], paginated_response["ETag"])
+
+    def test_report_streaming_chunks(self):
+        """
+        Should stream a report whose transactions span many chunks
+        """
+        transactions = self._create_transactions(5)
+        company = transactions[0].company
+        url = reverse(REPORT_VIEW_NAME)
+
+        with patch.object(TransactionsReportView, "stream_chunk_size", 2):
+            response = self.client.get(
+                url, {"cnpj": format_cnpj(company.cnpj), "completo": "true"}
+            )
+            chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 5)
+        data = json.loads(b"".join(chunks))
+        self.assertEqual(
+            data["recebimentos"],
+            TransactionReportSerializer(transactions, many=True).data,
+        )
+        self.assertEqual(
+            data["total_recebido"],
+            from_cents(sum(transaction.value for transaction in transactions)),
+        )
+        self.assertIsNone(data["proximo_cursor"])
+
+    def test_report_streaming_no_transactions(self):
+        """
+        Should stream the report of a company without transactions
+        """
+        company = TransactionFactory.build().company
+        company.save()
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj), "completo": "true"}
+        )
+        paginated_response = self.client.get(
+            url, {"cnpj": format_cnpj(company.cnpj)}
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content), paginated_response.content
+        )
+
+    def test_report_browsable_api(self):
+        """
+        Should render the transactions report through the serializers when
+        an HTML response is requested
+        """
+        transactions = self._create_transactions(2)
+        url = reverse(REPORT_VIEW_NAME)
+
+        response = self.client.get(
+            url,
+            {"cnpj": format_cnpj(transactions[0].company.cnpj)},
+            HTTP_ACCEPT="text/html",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["recebimentos"],
+            TransactionReportSerializer(transactions, many=True).data,
+        )
+
+
+class TestTimeSeriesEndpoint(APITestCase):
+    def setUp(self):
+        self.company = TransactionFactory.build().company
+        self.company.save()
+        created_at = [
+            datetime(2020, 8, 1, 10, 5, tzinfo=timezone.utc),
+            datetime(2020, 8, 1, 10, 55, tzinfo=timezone.utc),
+            datetime(2020, 8, 2, 9, tzinfo=timezone.utc),
+        ]
+        self.transactions = [
+            TransactionFactory.create(company=self.company, created_at=moment)
+            for moment in created_at
+        ]
+        self.url = reverse(TIME_SERIES_VIEW_NAME)
+
+    def _expected_bucket(self, start, transactions):
+        values = [transaction.value for transaction in transactions]
+        return {
+            "inicio": start,
+            "total_recebido": from_cents(sum(values)),
+            "recebimentos": len(values),
+            "menor_valor": from_cents(min(values)),
+            "maior_valor": from_cents(max(values)),
+        }
+
+    def test_time_series(self):
+        """
+        Should get the daily time series of a company by default, reading
+        only its rollups
+        """
+        company_cache.get(self.company.cnpj)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, {"cnpj": format_cnpj(self.company.cnpj)}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(
+            data["estabelecimento"],
+            CompanyReportSerializer(self.company).data,
+        )
+        self.assertEqual(data["intervalo"], "dia")
+        self.assertEqual(len(data["serie"]), 2)
+        for bucket, expected in zip(
+            data["serie"],
+            [
+                self._expected_bucket(
+                    "2020-08-01T00:00:00Z", self.transactions[:2]
+                ),
+                self._expected_bucket(
+                    "2020-08-02T00:00:00Z", self.transactions[2:]
+                ),
+            ],
+        ):
+            self.assertEqual(bucket, expected)
+
+    def test_time_series_hourly_window(self):
+        """
+        Should get the hourly time series of a company within the informed
+        dates
+        """
+        response = self.client.get(
+            self.url,
+            {
+                "cnpj": format_cnpj(self.company.cnpj),
+                "intervalo": "hora",
+                "inicio": "2020-08-01",
+                "fim": "2020-08-01",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data["intervalo"], "hora")
+        self.assertEqual(len(data["serie"]), 1)
+        self.assertEqual(data["serie"][0]["inicio"], "2020-08-01T10:00:00Z")
+        self.assertEqual(data["serie"][0]["recebimentos"], 2)
+
+    def test_time_series_invalid_parameters(self):
+        """
+        Should fail to get a time series when providing an invalid interval
+        or dates, returning HTTP Status 400 and the expected message
+        """
+        for params, message in (
+            (
+                {"intervalo": "semana"},
+                "Informe um 'intervalo' valido ('hora' ou 'dia')",
+            ),
+            (
+                {"inicio": "2020-08-02", "fim": "2020-08-01"},
+                "O 'inicio' deve ser anterior ao 'fim'",
+            ),
+        ):
+            response = self.client.get(
+                self.url, {"cnpj": format_cnpj(self.company.cnpj), **params}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {"erro": message})
+
+    def test_time_series_company_not_found(self):
+        """
+        Should fail to get a time series of a company that is not in the
+        database, returning HTTP Status 404
+        """
+        cnpj = format_cnpj(TransactionFactory.build().company.cnpj)
+
+        response = self.client.get(self.url, {"cnpj": cnpj})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,403 @@
+import asyncio
+import json
+from tempfile import TemporaryDirectory
+from urllib.parse import urlencode
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.db import IntegrityError
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import path, reverse
+
+from companies.cache import company_cache
+from companies.formats import format_cnpj
+from payments import aiodb
+from payments.handlers import get_asgi_application
+from rest_framework import status
+from transactions.api.async_views import (
+    AsyncCompanyRetrieveView,
+    AsyncRecordTransactionView,
+    AsyncTransactionsReportView,
+)
+from transactions.api.serializers import TransactionSerializer
+from transactions.api.views import STREAM_CONTENT_TYPE, TransactionsReportView
+from transactions.cache import report_cache
+from transactions.models import Transaction
+from transactions.queue import WriteBehindQueue
+from transactions.tests.factories import TransactionFactory
+
+TRANSACTION_VIEW_NAME = "v1:transaction"
+REPORT_VIEW_NAME = "v1:report"
+
+
+class AsyncViewTestCase(TransactionTestCase):
+    """
+    Calls the async views in an event loop of their own. The views query
+    the databases through their own connections (see payments.aiodb), so
+    the tests commit their data instead of running within a transaction.
+
+    The requests are built by the RequestFactory, as the AsyncRequestFactory
+    of this Django version leaves out their query strings and headers.
+    """
+
+    def setUp(self):
+        company_cache.clear()
+        report_cache.clear()
+        self.factory = RequestFactory()
+
+    def call(self, view_class, request, **initkwargs):
+        view = view_class.as_view(**initkwargs)
+
+        async def respond():
+            try:
+                response = await view(request)
+                if response.streaming:
+                    # read within the loop holding the connections
+                    response.streamed_content = b"".join(
+                        [part async for part in response.streaming_content]
+                    )
+                return response
+            finally:
+                aiodb.close_pools()
+
+        return async_to_sync(respond)()
+
+
+class TestAsyncRecordTransactionView(AsyncViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(TRANSACTION_VIEW_NAME)
+        self.transaction = TransactionFactory.build()
+        self.transaction.company.save()
+        self.payload = TransactionSerializer(self.transaction).data
+
+    def post(self, payload, **initkwargs):
+        request = self.factory.post(
+            self.url, json.dumps(payload), content_type="application/json"
+        )
+        return self.call(AsyncRecordTransactionView, request, **initkwargs)
+
+    def test_as_view(self):
+        """Should build a coroutine view, served natively under ASGI"""
+        view = AsyncRecordTransactionView.as_view()
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
+
+    def test_transaction_creation(self):
+        """
+        Should create a Transaction record when POSTing valid JSON or form
+        data, returning HTTP Status 201 as the synchronous view
+        """
+        response = self.post(self.payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content), {"aceito": True})
+
+        request = self.factory.post(self.url, self.payload)
+        response = self.call(AsyncRecordTransactionView, request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        transactions = Transaction.objects.all()
+        self.assertEqual(len(transactions), 2)
+        for transaction in transactions:
+            self.assertEqual(transaction.company, self.transaction.company)
+            self.assertEqual(
+                transaction.description, self.transaction.description
+            )
+            self.assertEqual(transaction.value, self.transaction.value)
+
+    def test_transaction_creation_invalid(self):
+        """
+        Should reject invalid transactions and bodies which can not be
+        parsed with HTTP Status 400, as the synchronous view
+        """
+        response = self.post({**self.payload, "valor": "dez"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content), {"aceito": False})
+
+        request = self.factory.post(
+            self.url, "{", content_type="application/json"
+        )
+        response = self.call(AsyncRecordTransactionView, request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            json.loads(response.content),
+            self.client.post(
+                self.url, "{", content_type="application/json"
+            ).json(),
+        )
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_transaction_creation_company_does_not_exist(self):
+        """
+        Should reject the transactions of unknown companies, as well as the
+        ones of cached companies deleted meanwhile, with HTTP Status 404
+        """
+        response = self.post(
+            TransactionSerializer(TransactionFactory.build()).data
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {"aceito": False})
+
+        cnpj = self.transaction.company.cnpj
+        cached = company_cache.get(cnpj)
+        self.transaction.company.delete()
+        with patch.object(
+            company_cache, "get_cached", return_value=(True, cached)
+        ):
+            response = self.post(self.payload)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(company_cache.get_cached(cnpj), (False, None))
+
+    def test_transaction_creation_refused(self):
+        """
+        Should not take a Transaction refused by a constraint other than
+        the foreign key of its company as of an unknown company
+        """
+        transaction = TransactionFactory.create(
+            company=self.transaction.company
+        )
+        cnpj = transaction.company.cnpj
+        cached = company_cache.get(cnpj)
+
+        # as a transaction whose id was taken
+        with patch(
+            "transactions.api.async_views.build_transaction",
+            return_value=transaction,
+        ):
+            with self.assertRaises(IntegrityError):
+                self.post(self.payload)
+
+        self.assertEqual(company_cache.get_cached(cnpj), (True, cached))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transaction_creation_queued(self):
+        """
+        Should accept a Transaction once written to the write-behind queue,
+        without inserting it, when the queue is open
+        """
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=1
+            )
+            queue.open()
+            response = self.post(self.payload, queue=queue)
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(Transaction.objects.count(), 0)
+            self.assertEqual(queue.stats()["depth"], 1)
+            queue.close()
+
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class TestAsyncTransactionsReportView(AsyncViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(REPORT_VIEW_NAME)
+        self.transactions = TransactionFactory.create_batch(5)
+        self.company = self.transactions[0].company
+        for transaction in self.transactions[1:]:
+            transaction.company = self.company
+            transaction.save()
+        self.cnpj = format_cnpj(self.company.cnpj)
+
+    def get(self, params, **headers):
+        request = self.factory.get(self.url, params, **headers)
+        return self.call(AsyncTransactionsReportView, request)
+
+    def assertSameResponse(self, params, **headers):
+        """
+        Asserts the async view answers the same as the synchronous one,
+        returning the response
+        """
+        expected = self.client.get(self.url, params, **headers)
+        report_cache.clear()
+        response = self.get(params, **headers)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response["Content-Type"], expected["Content-Type"])
+        self.assertEqual(response.get("ETag"), expected.get("ETag"))
+        self.assertEqual(response.streaming, expected.streaming)
+        if expected.streaming:
+            content = b"".join(expected.streaming_content)
+            self.assertEqual(response.streamed_content, content)
+        else:
+            self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_as_view(self):
+        """Should build a coroutine view, only allowing GET requests"""
+        view = AsyncTransactionsReportView.as_view()
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+
+        response = self.call(
+            AsyncTransactionsReportView, self.factory.post(self.url)
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    def test_retrieve_abstract(self):
+        """Should require the views retrieving companies to define retrieve"""
+        with self.assertRaises(TypeError):
+            AsyncCompanyRetrieveView()
+
+        self.assertIsInstance(
+            AsyncTransactionsReportView(), AsyncCompanyRetrieveView
+        )
+
+    def test_report(self):
+        """
+        Should answer the reports, their pages and windows the same as the
+        synchronous view
+        """
+        response = self.assertSameResponse({"cnpj": self.cnpj})
+        self.assertEqual(len(json.loads(response.content)["recebimentos"]), 5)
+
+        response = self.assertSameResponse({"cnpj": self.cnpj, "limite": 2})
+        cursor = json.loads(response.content)["proximo_cursor"]
+        self.assertIsNotNone(cursor)
+        self.assertSameResponse(
+            {"cnpj": self.cnpj, "limite": 2, "cursor": cursor}
+        )
+        self.assertSameResponse({"cnpj": self.cnpj, "inicio": "2020-01-01"})
+        self.assertSameResponse({"cnpj": self.cnpj, "fim": "2020-01-01"})
+
+        company = TransactionFactory.build().company
+        company.save()
+        self.assertSameResponse({"cnpj": format_cnpj(company.cnpj)})
+
+    def test_report_errors(self):
+        """Should answer the invalid requests as the synchronous view"""
+        unknown = TransactionFactory.build().company
+
+        for params in (
+            {},
+            {"cnpj": "11.111.111/1111-11"},
+            {"cnpj": format_cnpj(unknown.cnpj)},
+            {"cnpj": self.cnpj, "limite": 0},
+            {"cnpj": self.cnpj, "cursor": "invalido"},
+            {"cnpj": self.cnpj, "inicio": "ontem"},
+        ):
+            with self.subTest(params=params):
+                response = self.assertSameResponse(params)
+                self.assertIn("erro", json.loads(response.content))
+
+    def test_report_complete(self):
+        """
+        Should stream the complete report as the synchronous view does,
+        reading the transactions in chunks
+        """
+        params = {"cnpj": self.cnpj, "completo": "true"}
+        self.assertSameResponse(params)
+
+        with patch.object(AsyncTransactionsReportView, "stream_chunk_size", 2):
+            self.assertSameResponse(params)
+            self.assertSameResponse({**params, "inicio": "2020-01-01"})
+
+    def test_report_cached(self):
+        """
+        Should serve a cached report without rendering it again, and answer
+        with HTTP Status 304 when the client already has it
+        """
+        response = self.get({"cnpj": self.cnpj})
+        self.assertEqual(report_cache.stats()["misses"], 1)
+
+        cached = self.get({"cnpj": self.cnpj})
+        self.assertEqual(report_cache.stats()["hits"], 1)
+        self.assertEqual(cached.content, response.content)
+
+        response = self.get(
+            {"cnpj": self.cnpj}, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+
+urlpatterns = [
+    path("sync", TransactionsReportView.as_view()),
+    path("async", AsyncTransactionsReportView.as_view()),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestASGIHandler(AsyncViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.transactions = TransactionFactory.create_batch(5)
+        self.company = self.transactions[0].company
+        for transaction in self.transactions[1:]:
+            transaction.company = self.company
+            transaction.save()
+        self.params = {
+            "cnpj": format_cnpj(self.company.cnpj),
+            "completo": "true",
+        }
+        self.query = urlencode(self.params)
+        self.application = get_asgi_application()
+
+    def request(self, path):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": self.query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        async def respond():
+            try:
+                await self.application(scope, receive, send)
+            finally:
+                aiodb.close_pools()
+
+        async_to_sync(respond)()
+        return messages
+
+    def test_stream(self):
+        """
+        Should stream the complete report of both the synchronous and the
+        async views in parts, reading the transactions in chunks without
+        querying the database from the event loop
+        """
+        expected = b"".join(
+            self.client.get("/sync", self.params).streaming_content
+        )
+
+        for url in ("/sync", "/async"):
+            with self.subTest(url=url):
+                with patch.object(
+                    TransactionsReportView, "stream_chunk_size", 2
+                ), patch.object(
+                    AsyncTransactionsReportView, "stream_chunk_size", 2
+                ):
+                    report_cache.clear()
+                    start, *body = self.request(url)
+
+                self.assertEqual(start["status"], status.HTTP_200_OK)
+                self.assertIn(
+                    (b"Content-Type", STREAM_CONTENT_TYPE.encode()),
+                    start["headers"],
+                )
+                # the head, 3 chunks of rows, the tail and the closing message
+                self.assertEqual(len(body), 6)
+                self.assertEqual(
+                    b"".join(message.get("body", b"") for message in body),
+                    expected,
+                )
+                self.assertFalse(body[-1].get("more_body", False))
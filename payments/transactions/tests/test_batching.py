@@ -0,0 +1,195 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    IntegrityError,
+    OperationalError,
+    connections,
+)
+from django.test import SimpleTestCase, TransactionTestCase
+
+from companies.cache import company_cache
+from companies.tests.factories import CompanyFactory
+from transactions.batching import (
+    BatchWriteError,
+    InsertBatcher,
+    _Entry,
+    transaction_batcher,
+)
+from transactions.models import Transaction
+from transactions.tests.factories import TransactionFactory
+
+
+class TestInsertBatcher(SimpleTestCase):
+    def setUp(self):
+        self.written = []
+
+    def write(self, items, using):
+        if "invalid" in items:
+            raise IntegrityError("invalid item")
+        if "unavailable" in items:
+            raise OperationalError("database unavailable")
+        self.written.append((using, items))
+
+    def insert_concurrently(self, batcher, items, using=DEFAULT_DB_ALIAS):
+        def insert(item):
+            try:
+                batcher.insert(item, using)
+            except Exception as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=len(items)) as executor:
+            return list(executor.map(insert, items))
+
+    def test_insert_batch(self):
+        """
+        Should write the concurrent inserts in a single batch, as soon as it
+        is full
+        """
+        batcher = InsertBatcher(self.write, window=10, max_size=4)
+
+        results = self.insert_concurrently(batcher, [1, 2, 3, 4])
+
+        self.assertEqual(results, [None] * 4)
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual(sorted(self.written[0][1]), [1, 2, 3, 4])
+
+    def test_insert_window(self):
+        """Should write a batch which is not full once the window expires"""
+        batcher = InsertBatcher(self.write, window=0.01, max_size=100)
+
+        batcher.insert(1, DEFAULT_DB_ALIAS)
+        batcher.insert(2, "shard1")
+
+        self.assertEqual(
+            self.written, [(DEFAULT_DB_ALIAS, [1]), ("shard1", [2])]
+        )
+
+    def test_insert_invalid(self):
+        """
+        Should write the items of a batch which failed for one of them one
+        at a time, raising the error only for the invalid one
+        """
+        batcher = InsertBatcher(self.write, window=10, max_size=3)
+
+        results = self.insert_concurrently(batcher, [1, "invalid", 2])
+
+        self.assertEqual(results[0], None)
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertEqual(results[2], None)
+        self.assertEqual(sorted(items[0] for _, items in self.written), [1, 2])
+
+    def test_insert_unavailable(self):
+        """Should raise any other error for every item of the batch"""
+        batcher = InsertBatcher(self.write, window=10, max_size=2)
+
+        results = self.insert_concurrently(batcher, [1, "unavailable"])
+
+        for result in results:
+            self.assertIsInstance(result, OperationalError)
+        self.assertEqual(self.written, [])
+
+    def test_insert_unavailable_one_at_a_time(self):
+        """
+        Should keep the result of the items written one at a time before
+        any other error, raising it for the items not written yet
+        """
+        batcher = InsertBatcher(self.write, window=10, max_size=4)
+        entries = [_Entry(item) for item in (1, "invalid", "unavailable", 2)]
+
+        batcher._write(entries, DEFAULT_DB_ALIAS)
+
+        self.assertEqual(self.written, [(DEFAULT_DB_ALIAS, [1])])
+        self.assertTrue(entries[0].written)
+        self.assertIsNone(entries[0].error)
+        self.assertIsInstance(entries[1].error, IntegrityError)
+        for entry in entries[2:]:
+            self.assertFalse(entry.written)
+            self.assertIsInstance(entry.error, OperationalError)
+        self.assertTrue(all(entry.done.is_set() for entry in entries))
+
+    def test_insert_interrupted(self):
+        """
+        Should fail the items of a batch whose write was interrupted, as
+        when the process is shutting down
+        """
+
+        def write(items, using):
+            raise SystemExit()
+
+        batcher = InsertBatcher(write, window=10, max_size=2)
+        entries = [_Entry(1), _Entry(2)]
+
+        with self.assertRaises(SystemExit):
+            batcher._write(entries, DEFAULT_DB_ALIAS)
+
+        for entry in entries:
+            self.assertTrue(entry.done.is_set())
+            self.assertIsInstance(entry.error, BatchWriteError)
+
+    def test_insert_timeout(self):
+        """
+        Should fail the items waiting for a batch which is not written in
+        time, instead of waiting forever
+        """
+        released = threading.Event()
+
+        def write(items, using):
+            released.wait(5)
+            self.written.append((using, items))
+
+        batcher = InsertBatcher(
+            write, window=0.01, max_size=2, write_timeout=0.05
+        )
+        timer = threading.Timer(0.5, released.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        results = self.insert_concurrently(batcher, [1, 2])
+
+        self.assertEqual(results.count(None), 1)
+        (error,) = [result for result in results if result is not None]
+        self.assertIsInstance(error, BatchWriteError)
+
+    def test_enabled(self):
+        """Should only be enabled with a window and room for a batch"""
+        self.assertTrue(InsertBatcher(self.write, 0.002, 100).enabled)
+        self.assertFalse(InsertBatcher(self.write, 0, 100).enabled)
+        self.assertFalse(InsertBatcher(self.write, 0.002, 1).enabled)
+
+
+class TestTransactionBatcher(TransactionTestCase):
+    def test_insert_transactions(self):
+        """
+        Should insert the transactions of concurrent requests together,
+        rejecting only the ones of companies deleted in the meantime
+        """
+        company_cache.clear()
+        company = CompanyFactory()
+        deleted = CompanyFactory()
+        transactions = TransactionFactory.build_batch(3, company=company)
+        transactions.append(TransactionFactory.build(company=deleted))
+        deleted.delete()
+        batcher = InsertBatcher(
+            transaction_batcher.write, window=10, max_size=len(transactions)
+        )
+
+        def insert(transaction):
+            try:
+                batcher.insert(transaction, DEFAULT_DB_ALIAS)
+            except IntegrityError:
+                return False
+            finally:
+                # as done at the end of each request
+                connections.close_all()
+            return True
+
+        with ThreadPoolExecutor(max_workers=len(transactions)) as executor:
+            accepted = list(executor.map(insert, transactions))
+
+        self.assertEqual(accepted, [True, True, True, False])
+        self.assertEqual(
+            set(Transaction.objects.values_list("id", flat=True)),
+            {transaction.id for transaction in transactions[:3]},
+        )
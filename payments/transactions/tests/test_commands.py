@@ -0,0 +1,237 @@
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from io import StringIO
+from tempfile import TemporaryDirectory
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from companies.cache import company_cache
+from companies.tests.factories import CompanyFactory
+from transactions.api.serializers import TransactionSerializer
+from transactions.models import (
+    CompanySummary,
+    DailyRollup,
+    HourlyRollup,
+    Transaction,
+)
+from transactions.tests.factories import TransactionFactory
+
+
+class TestRebuildSummariesCommand(TestCase):
+    def test_rebuild_summaries(self):
+        """
+        Should recompute the summaries of all companies from their
+        transactions, including companies without transactions
+        """
+        transactions = TransactionFactory.create_batch(3)
+        company = transactions[0].company
+        company_without_transactions = CompanyFactory()
+        CompanySummary.objects.update(
+            total_value=0, transactions_count=0, last_transaction_at=None
+        )
+
+        output = StringIO()
+        call_command(
+            "rebuild_summaries", chunk_size=2, workers=1, stdout=output
+        )
+
+        self.assertIn(
+            "Successfully rebuilt 4 summaries in 2 chunks", output.getvalue()
+        )
+        summary = CompanySummary.objects.get(company=company)
+        self.assertEqual(summary.total_value, transactions[0].value)
+        self.assertEqual(summary.transactions_count, 1)
+        self.assertEqual(
+            summary.last_transaction_at, transactions[0].created_at
+        )
+
+        summary = CompanySummary.objects.get(
+            company=company_without_transactions
+        )
+        self.assertEqual(summary.total_value, 0)
+        self.assertEqual(summary.transactions_count, 0)
+        self.assertIsNone(summary.last_transaction_at)
+
+
+class TestRebuildSummariesCommandParallel(TransactionTestCase):
+    databases = "__all__"
+
+    def test_rebuild_summaries_in_parallel(self):
+        """
+        Should recompute the summaries when rebuilding chunks of companies
+        in parallel workers
+        """
+        transactions = TransactionFactory.create_batch(5)
+        CompanySummary.objects.update(total_value=0, transactions_count=0)
+
+        output = StringIO()
+        call_command(
+            "rebuild_summaries", chunk_size=2, workers=3, stdout=output
+        )
+
+        self.assertIn(
+            "Successfully rebuilt 5 summaries in 3 chunks", output.getvalue()
+        )
+        for transaction in transactions:
+            summary = CompanySummary.objects.get(company=transaction.company)
+            self.assertEqual(summary.total_value, transaction.value)
+            self.assertEqual(summary.transactions_count, 1)
+
+
+class TestRebuildRollupsCommand(TestCase):
+    def test_rebuild_rollups(self):
+        """
+        Should recompute the hourly and daily rollups of all companies from
+        their transactions
+        """
+        transaction = TransactionFactory.create(
+            created_at=datetime(2020, 8, 1, 10, 5, tzinfo=timezone.utc)
+        )
+        TransactionFactory.create(
+            company=transaction.company,
+            created_at=datetime(2020, 8, 1, 11, 5, tzinfo=timezone.utc),
+        )
+        HourlyRollup.objects.all().delete()
+        DailyRollup.objects.update(total_value=0, transactions_count=0)
+
+        output = StringIO()
+        call_command("rebuild_rollups", workers=1, stdout=output)
+
+        self.assertIn(
+            "Successfully rebuilt 3 rollups in 1 chunks", output.getvalue()
+        )
+        self.assertEqual(
+            HourlyRollup.objects.filter(company=transaction.company).count(),
+            2,
+        )
+        rollup = DailyRollup.objects.get(company=transaction.company)
+        self.assertEqual(rollup.transactions_count, 2)
+        self.assertEqual(
+            rollup.total_value,
+            sum(
+                transaction.company.transactions.values_list(
+                    "value", flat=True
+                )
+            ),
+        )
+
+
+class TestImportTransactionsCommand(TestCase):
+    def setUp(self):
+        company_cache.clear()
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        company = CompanyFactory()
+        self.data = [
+            TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            for _ in range(3)
+        ]
+        self.data[0]["criado_em"] = "2020-03-01T12:00:00Z"
+        self.data[2]["valor"] = "muito"
+
+    def write_file(self, name: str) -> str:
+        filepath = os.path.join(self.directory.name, name)
+        with open(filepath, "w", newline="") as source:
+            if name.endswith(".csv"):
+                fields = [*self.data[1], "criado_em"]
+                writer = csv.DictWriter(source, fields)
+                writer.writeheader()
+                writer.writerows(self.data)
+            else:
+                source.writelines(
+                    json.dumps(piece) + "\n" for piece in self.data
+                )
+        return filepath
+
+    def test_import_transactions(self):
+        """
+        Should import the transactions of JSON lines and CSV files, writing
+        the rejected ones to the rejects file and resuming from the
+        checkpoint when run again
+        """
+        for name in ("transactions.ndjson", "transactions.csv"):
+            Transaction.objects.all().delete()
+            filepath = self.write_file(name)
+
+            output = StringIO()
+            call_command(
+                "import_transactions",
+                filepath=filepath,
+                batch_size=2,
+                stdout=output,
+            )
+
+            self.assertIn(
+                "Imported 2 of 2 transactions read", output.getvalue()
+            )
+            self.assertIn(
+                f"Successfully imported transactions data from {filepath}",
+                output.getvalue(),
+            )
+            self.assertIn(
+                ": 2 inserted, 0 imported before, 1 rejected",
+                output.getvalue(),
+            )
+            self.assertEqual(Transaction.objects.count(), 2)
+            self.assertEqual(
+                Transaction.objects.filter(
+                    created_at=datetime(2020, 3, 1, 12, tzinfo=timezone.utc)
+                ).count(),
+                1,
+            )
+            with open(f"{filepath}.rejects.ndjson") as rejects:
+                self.assertEqual(
+                    [json.loads(line)["position"] for line in rejects], [3]
+                )
+
+            output = StringIO()
+            call_command(
+                "import_transactions", filepath=filepath, stdout=output
+            )
+            self.assertIn("Resuming after 3 transactions", output.getvalue())
+            self.assertIn(": 0 inserted", output.getvalue())
+            self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_import_transactions_changed_file(self):
+        """
+        Should refuse to resume from the checkpoint of a file which changed
+        since, unless restarting
+        """
+        filepath = self.write_file("transactions.ndjson")
+        call_command(
+            "import_transactions", filepath=filepath, stdout=StringIO()
+        )
+        self.data.pop()
+        self.write_file("transactions.ndjson")
+
+        with self.assertRaisesMessage(CommandError, "use --restart"):
+            call_command("import_transactions", filepath=filepath)
+
+        output = StringIO()
+        call_command(
+            "import_transactions",
+            filepath=filepath,
+            restart=True,
+            stdout=output,
+        )
+        self.assertIn(
+            ": 2 inserted, 0 imported before, 0 rejected", output.getvalue()
+        )
+
+    def test_import_transactions_invalid_file(self):
+        """Should refuse missing files and files of unknown formats"""
+        for name, message in (
+            ("missing.ndjson", "does not exist"),
+            ("transactions.xml", "is not a JSON or CSV file"),
+        ):
+            filepath = os.path.join(self.directory.name, name)
+            if name.endswith(".xml"):
+                open(filepath, "w").close()
+            with self.assertRaisesMessage(CommandError, message):
+                call_command("import_transactions", filepath=filepath)
@@ -0,0 +1,122 @@
+from django.test import TestCase
+
+from companies.tests.factories import CompanyFactory
+from rest_framework.renderers import JSONRenderer
+from transactions.api.encoders import ReportEncoder
+from transactions.api.serializers import ReportSerializer
+from transactions.money import from_cents
+from transactions.tests.factories import TransactionFactory
+
+TRICKY_DESCRIPTIONS = [
+    'Descrição com "aspas", \\ barras e \t tabulações',
+    "Separadores \u2028 de linha \u2029 e parágrafo",
+    "Emoji 💳 e caracteres de controle \x00\x1f",
+]
+
+
+class AsciiJSONRenderer(JSONRenderer):
+    ensure_ascii = True
+    compact = False
+
+
+class TestReportEncoder(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory.build(name="Padaria São João \u2028")
+        self.transactions = [
+            TransactionFactory.build(company=self.company, description=text)
+            for text in TRICKY_DESCRIPTIONS
+        ]
+        self.transactions.append(
+            TransactionFactory.build(company=self.company, value=1000)
+        )
+        self.transactions.append(
+            TransactionFactory.build(company=self.company, value=-1)
+        )
+
+    def _rows(self, encoder):
+        return [
+            tuple(getattr(transaction, field) for field in encoder.row_fields)
+            for transaction in self.transactions
+        ]
+
+    def _render(self, renderer, transactions, total_value, next_cursor):
+        report = {
+            "company": self.company,
+            "transactions": transactions,
+            "total_value": total_value,
+            "next_cursor": next_cursor,
+        }
+        return renderer.render(ReportSerializer(report).data)
+
+    def test_encode_report(self):
+        """
+        Should encode a report exactly as rendering the ReportSerializer
+        data with the JSONRenderer
+        """
+        encoder = ReportEncoder()
+        total_value = sum(
+            transaction.value for transaction in self.transactions
+        )
+
+        for next_cursor in (None, "WyIyMDIwIiwgImlkIl0="):
+            self.assertEqual(
+                encoder.encode_report(
+                    self.company, self._rows(encoder), total_value, next_cursor
+                ),
+                self._render(
+                    JSONRenderer(), self.transactions, total_value, next_cursor
+                ),
+            )
+
+    def test_encode_report_no_transactions(self):
+        """
+        Should encode a report without transactions exactly as rendering the
+        ReportSerializer data with the JSONRenderer
+        """
+        encoder = ReportEncoder()
+        self.assertEqual(
+            encoder.encode_report(self.company, [], None, None),
+            self._render(JSONRenderer(), [], None, None),
+        )
+
+    def test_encode_report_renderer_settings(self):
+        """
+        Should follow the ascii and separators settings of the given
+        renderer
+        """
+        renderer = AsciiJSONRenderer()
+        encoder = ReportEncoder(renderer)
+        total_value = sum(
+            transaction.value for transaction in self.transactions
+        )
+
+        self.assertEqual(
+            encoder.encode_report(
+                self.company, self._rows(encoder), total_value, None
+            ),
+            self._render(renderer, self.transactions, total_value, None),
+        )
+
+    def test_encode_rows(self):
+        """
+        Should encode rows into the items of a list, ignoring any trailing
+        values of the rows
+        """
+        encoder = ReportEncoder()
+        rows = [row + ("ignored",) for row in self._rows(encoder)]
+
+        encoded = encoder.encode_rows(rows)
+        self.assertEqual(
+            b"[" + encoded + b"]",
+            encoder.renderer.render(
+                [
+                    {
+                        "cliente": transaction.client,
+                        "valor": from_cents(transaction.value),
+                        "descricao": transaction.description,
+                    }
+                    for transaction in self.transactions
+                ]
+            ),
+        )
+        self.assertEqual(encoder.encode_rows([]), b"")
@@ -1,7 +1,8 @@
 from django.test import TestCase
 
 from companies.models import Company
-from transactions.models import CPF_SIZE, DESCRIPTION_LENGTH, Transaction
+from transactions.formats import CPF_DIGITS, normalize_cpf
+from transactions.models import DESCRIPTION_LENGTH, Transaction
 from transactions.tests.factories import (
     MAX_VALUE,
     MIN_VALUE,
@@ -18,9 +19,9 @@ class TestFactories(TestCase):
         transaction = TransactionFactory()
         self.assertIsInstance(transaction, Transaction)
         self.assertIsInstance(transaction.company, Company)
-        self.assertIsInstance(transaction.client, str)
-        self.assertEqual(len(transaction.client), CPF_SIZE)
-        self.assertIsInstance(transaction.value, float)
+        self.assertIsInstance(transaction.client, int)
+        self.assertEqual(len(normalize_cpf(transaction.client)), CPF_DIGITS)
+        self.assertIsInstance(transaction.value, int)
         self.assertGreaterEqual(transaction.value, MIN_VALUE)
         self.assertLessEqual(transaction.value, MAX_VALUE)
         self.assertIsInstance(transaction.description, str)
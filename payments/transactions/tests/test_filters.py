@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import RequestFactory, TestCase
+
+from transactions.api.filters import (
+    NO_WINDOW,
+    InvalidFilter,
+    TransactionDateRangeFilter,
+)
+
+
+class TestTransactionDateRangeFilter(TestCase):
+    def setUp(self):
+        self.date_range = TransactionDateRangeFilter()
+        self.request_factory = RequestFactory()
+
+    def _get_window(self, **params):
+        request = self.request_factory.get("/", params)
+        return self.date_range.get_window(request)
+
+    def test_no_window(self):
+        """Should get no window when no date parameter is informed"""
+        self.assertEqual(self._get_window(), NO_WINDOW)
+
+    def test_date_window(self):
+        """
+        Should get a window covering the whole days of the informed dates
+        """
+        self.assertEqual(
+            self._get_window(inicio="2020-08-01", fim="2020-08-01"),
+            (
+                datetime(2020, 8, 1, tzinfo=timezone.utc),
+                datetime(2020, 8, 2, tzinfo=timezone.utc),
+            ),
+        )
+
+    def test_datetime_window(self):
+        """
+        Should get a window including the informed datetimes, taking the
+        current time zone for datetimes without an offset
+        """
+        start, end = self._get_window(
+            inicio="2020-08-01T10:30:00", fim="2020-08-01T12:00:00-03:00"
+        )
+        self.assertEqual(
+            start, datetime(2020, 8, 1, 10, 30, tzinfo=timezone.utc)
+        )
+        self.assertEqual(
+            end,
+            datetime(2020, 8, 1, 15, tzinfo=timezone.utc)
+            + timedelta(microseconds=1),
+        )
+
+    def test_open_window(self):
+        """Should get a window open on the side without a parameter"""
+        start, end = self._get_window(fim="2020-08-01")
+        self.assertIsNone(start)
+        self.assertEqual(end, datetime(2020, 8, 2, tzinfo=timezone.utc))
+
+    def test_invalid_window(self):
+        """
+        Should fail to get a window out of invalid dates or when it starts
+        after it ends
+        """
+        for params in (
+            {"inicio": "01/08/2020"},
+            {"fim": "2020-13-01"},
+            {"inicio": "2020-08-02", "fim": "2020-08-01"},
+        ):
+            with self.assertRaises(InvalidFilter):
+                self._get_window(**params)
+
+    def test_last_day_window(self):
+        """
+        Should leave a window ending at the last representable day open
+        instead of failing
+        """
+        for end in ("9999-12-31", "9999-12-31T23:59:59.999999"):
+            self.assertEqual(
+                self._get_window(inicio="2020-08-01", fim=end),
+                (datetime(2020, 8, 1, tzinfo=timezone.utc), None),
+            )
@@ -0,0 +1,167 @@
+import os
+from datetime import datetime, timezone
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from companies.cache import company_cache
+from companies.formats import format_cnpj
+from companies.tests.factories import CompanyFactory
+from transactions.api.serializers import TransactionSerializer
+from transactions.importing import (
+    Checkpoint,
+    CheckpointError,
+    ImportSummary,
+    fingerprint,
+    import_transactions,
+)
+from transactions.models import CompanySummary, Transaction
+from transactions.partitions import MONTH, partition_transactions
+from transactions.tests.factories import TransactionFactory
+from transactions.utils import merge_transactions
+
+CREATED_AT = datetime(2020, 3, 1, 12, tzinfo=timezone.utc)
+OPTIONS = {"HASH_PARTITIONS": 4, "MONTHS_AHEAD": 0}
+
+
+class TestImportTransactions(TestCase):
+    def setUp(self):
+        company_cache.clear()
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.checkpoint_path = os.path.join(self.directory.name, "checkpoint")
+
+        company = CompanyFactory()
+        self.data = [
+            {
+                **TransactionSerializer(
+                    TransactionFactory.build(company=company)
+                ).data,
+                "criado_em": CREATED_AT.isoformat(),
+            }
+            for _ in range(5)
+        ]
+        self.data[1]["cliente"] = "111.111.111-11"
+        self.data[3]["estabelecimento"] = format_cnpj(
+            CompanyFactory.build().cnpj
+        )
+        del self.data[4]["criado_em"]
+
+    def checkpoint(self) -> Checkpoint:
+        return Checkpoint(self.checkpoint_path, "source").load()
+
+    def test_import_transactions(self):
+        """
+        Should import the valid transactions of known companies in batches,
+        rejecting the others and saving the checkpoint after each batch
+        """
+        checkpoint = self.checkpoint()
+        progress, rejects = [], []
+
+        summary = import_transactions(
+            iter(self.data), checkpoint, 2, progress.append, rejects.append
+        )
+
+        self.assertEqual(summary, ImportSummary(5, 3, 0, 2))
+        self.assertEqual(
+            progress,
+            [
+                ImportSummary(2, 1, 0, 1),
+                ImportSummary(4, 2, 0, 2),
+                ImportSummary(5, 3, 0, 2),
+            ],
+        )
+        self.assertEqual([reject.position for reject in rejects], [2, 4])
+        self.assertEqual(list(rejects[0].errors), ["cliente"])
+        self.assertEqual(
+            rejects[1].errors, {"estabelecimento": ["Company not found."]}
+        )
+        self.assertEqual(self.checkpoint().position, 5)
+
+        transactions = Transaction.objects.order_by("created_at")
+        self.assertEqual(
+            [transaction.description for transaction in transactions],
+            [self.data[index]["descricao"] for index in (0, 2, 4)],
+        )
+        self.assertEqual(transactions[0].created_at, CREATED_AT)
+        self.assertEqual(
+            transactions[2].created_at.replace(microsecond=0),
+            checkpoint.started_at.replace(microsecond=0),
+        )
+        summary = CompanySummary.objects.get()
+        self.assertEqual(summary.transactions_count, 3)
+
+    def test_resume_import(self):
+        """
+        Should resume an interrupted import after its checkpoint, skipping
+        the transactions of a batch imported before its checkpoint was saved
+        """
+        merge = merge_transactions
+        merged_batches = []
+
+        def crash_on_third_batch(transactions, shard):
+            merged_batches.append(transactions)
+            if len(merged_batches) == 3:
+                raise RuntimeError("crash")
+            return merge(transactions, shard)
+
+        with patch(
+            "transactions.importing.merge_transactions", crash_on_third_batch
+        ):
+            with self.assertRaises(RuntimeError):
+                import_transactions(iter(self.data), self.checkpoint(), 2)
+        self.assertEqual(self.checkpoint().position, 4)
+
+        # the checkpoint of the second batch was lost
+        checkpoint = self.checkpoint()
+        checkpoint.save(2)
+        summary = import_transactions(iter(self.data), self.checkpoint(), 2)
+
+        self.assertEqual(summary, ImportSummary(3, 1, 1, 1))
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(CompanySummary.objects.get().transactions_count, 3)
+        self.assertEqual(self.checkpoint().started_at, checkpoint.started_at)
+
+    def test_restart_import(self):
+        """
+        Should skip the transactions imported before when importing again
+        from the start, including the ones without their creation time,
+        whatever the partitioning of the table
+        """
+        import_transactions(iter(self.data), self.checkpoint(), 2)
+        ids = set(Transaction.objects.values_list("id", flat=True))
+
+        for scheme in (None, MONTH):
+            partition_transactions(scheme, OPTIONS)
+            os.remove(self.checkpoint_path)
+            summary = import_transactions(
+                iter(self.data), self.checkpoint(), 2
+            )
+
+            self.assertEqual(summary, ImportSummary(5, 0, 3, 2))
+            self.assertEqual(
+                set(Transaction.objects.values_list("id", flat=True)), ids
+            )
+            self.assertEqual(
+                CompanySummary.objects.get().transactions_count, 3
+            )
+
+    def test_checkpoint_of_another_file(self):
+        """Should not resume from the checkpoint of another file"""
+        Checkpoint(self.checkpoint_path, "source").save(3)
+
+        with self.assertRaisesMessage(CheckpointError, "another file"):
+            Checkpoint(self.checkpoint_path, "other").load()
+
+    def test_fingerprint(self):
+        """Should tell files apart by their contents"""
+        path = os.path.join(self.directory.name, "source.ndjson")
+        fingerprints = set()
+        for content in ("{}\n", "{}\n{}\n", "[]\n\n"):
+            with open(path, "w") as source:
+                source.write(content)
+            fingerprints.add(fingerprint(path))
+            self.assertEqual(fingerprint(path), fingerprint(path))
+
+        self.assertEqual(len(fingerprints), 3)
@@ -1,7 +1,16 @@
+from datetime import datetime, timezone
+
 from django.core.validators import ValidationError
 from django.test import TestCase
 
-from transactions.models import CPF_SIZE, Transaction
+from transactions.formats import CPF_DIGITS
+from transactions.models import (
+    CompanySummary,
+    DailyRollup,
+    HourlyRollup,
+    Transaction,
+)
+from transactions.money import from_cents
 from transactions.tests.factories import TransactionFactory
 
 
@@ -50,10 +59,9 @@ class TestTransactionModel(TestCase):
         transaction.client = transaction.client + "1"
         expected_messages = {
             "client": [
-                f"Ensure the CPF is valid (it is {transaction.client}).",
-                f"Ensure this value has at most {CPF_SIZE} characters "
-                f"(it has {len(transaction.client)}).",
-            ],
+                f"Ensure this value has {CPF_DIGITS} digits "
+                f"(it has {CPF_DIGITS + 1})."
+            ]
         }
 
         with self.assertRaises(ValidationError) as raised:
@@ -82,7 +90,250 @@ class TestTransactionModel(TestCase):
         transaction = TransactionFactory.build()
         self.assertEqual(
             str(transaction),
-            f"Transaction (Value: {transaction.value} | "
+            f"Transaction (Value: {from_cents(transaction.value)} | "
             f"Company: {transaction.company.cnpj} | "
             f"Client: {transaction.client})",
         )
+
+
+class TestCompanySummaryModel(TestCase):
+    def test_summary_on_insert(self):
+        """
+        Should keep the summary of a company up to date when its
+        transactions are inserted one by one or in bulk
+        """
+        transaction = TransactionFactory.create()
+        company = transaction.company
+        transactions = TransactionFactory.build_batch(2, company=company)
+        Transaction.objects.bulk_create(transactions)
+        transactions.append(transaction)
+
+        summary = CompanySummary.objects.get(company=company)
+        self.assertEqual(
+            summary.total_value, sum(item.value for item in transactions)
+        )
+        self.assertEqual(summary.transactions_count, 3)
+        self.assertEqual(
+            summary.last_transaction_at,
+            max(item.created_at for item in transactions),
+        )
+
+    def test_summary_on_update_and_delete(self):
+        """
+        Should keep the summary of a company up to date when its
+        transactions are updated or deleted
+        """
+        transaction_one, transaction_two = TransactionFactory.create_batch(2)
+
+        transaction_one.value = 1000
+        transaction_one.save()
+        summary = CompanySummary.objects.get(company=transaction_one.company)
+        self.assertEqual(summary.total_value, 1000)
+        self.assertEqual(summary.transactions_count, 1)
+
+        Transaction.objects.filter(company=transaction_two.company).update(
+            company=transaction_one.company
+        )
+        summary.refresh_from_db()
+        self.assertEqual(summary.total_value, 1000 + transaction_two.value)
+        self.assertEqual(summary.transactions_count, 2)
+        summary_two = CompanySummary.objects.get(
+            company=transaction_two.company
+        )
+        self.assertEqual(summary_two.total_value, 0)
+        self.assertEqual(summary_two.transactions_count, 0)
+
+        transaction_one.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.total_value, transaction_two.value)
+        self.assertEqual(summary.transactions_count, 1)
+
+    def test_summary_last_transaction(self):
+        """
+        Should look the last transaction of a company up again when its
+        latest transactions are updated or deleted
+        """
+        company = TransactionFactory.create().company
+        TransactionFactory.create_batch(2, company=company)
+        first, second, third = Transaction.objects.order_by("created_at")
+        summary = CompanySummary.objects.get(company=company)
+        self.assertEqual(summary.last_transaction_at, third.created_at)
+
+        first.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.last_transaction_at, third.created_at)
+
+        third.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.last_transaction_at, second.created_at)
+
+        earlier = datetime(2020, 3, 1, tzinfo=timezone.utc)
+        Transaction.objects.filter(id=second.id).update(created_at=earlier)
+        summary.refresh_from_db()
+        self.assertEqual(summary.last_transaction_at, earlier)
+
+        second.delete()
+        summary.refresh_from_db()
+        self.assertIsNone(summary.last_transaction_at)
+        self.assertEqual(summary.transactions_count, 0)
+
+    def test_summary_version(self):
+        """
+        Should bump the version of the summary of a company on every change
+        to its transactions
+        """
+        transaction = TransactionFactory.create()
+        summary = CompanySummary.objects.get(company=transaction.company)
+        self.assertEqual(summary.version, 1)
+
+        TransactionFactory.create(company=transaction.company)
+        summary.refresh_from_db()
+        self.assertEqual(summary.version, 2)
+
+        transaction.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.version, 3)
+
+    def test_summary_string_representation(self):
+        transaction = TransactionFactory.create()
+        summary = CompanySummary.objects.get(company=transaction.company)
+        self.assertEqual(
+            str(summary),
+            f"Summary (Company: {transaction.company.id} | "
+            f"Total: {from_cents(summary.total_value)} | Transactions: 1)",
+        )
+
+
+class TestRollupModels(TestCase):
+    def _get_rollups(self, rollup, company):
+        return list(
+            rollup.objects.filter(company=company)
+            .order_by("bucket")
+            .values_list(
+                "bucket",
+                "total_value",
+                "transactions_count",
+                "min_value",
+                "max_value",
+            )
+        )
+
+    def test_rollups_on_insert(self):
+        """
+        Should keep the hourly and daily rollups of a company up to date when
+        its transactions are inserted one by one or in bulk
+        """
+        company = TransactionFactory.build().company
+        company.save()
+        TransactionFactory.create(
+            company=company,
+            value=1000,
+            created_at=datetime(2020, 8, 1, 10, 5, tzinfo=timezone.utc),
+        )
+        Transaction.objects.bulk_create(
+            [
+                TransactionFactory.build(
+                    company=company,
+                    value=3000,
+                    created_at=datetime(
+                        2020, 8, 1, 10, 55, tzinfo=timezone.utc
+                    ),
+                ),
+                TransactionFactory.build(
+                    company=company,
+                    value=500,
+                    created_at=datetime(2020, 8, 1, 12, tzinfo=timezone.utc),
+                ),
+            ]
+        )
+
+        self.assertEqual(
+            self._get_rollups(HourlyRollup, company),
+            [
+                (
+                    datetime(2020, 8, 1, 10, tzinfo=timezone.utc),
+                    4000,
+                    2,
+                    1000,
+                    3000,
+                ),
+                (
+                    datetime(2020, 8, 1, 12, tzinfo=timezone.utc),
+                    500,
+                    1,
+                    500,
+                    500,
+                ),
+            ],
+        )
+        self.assertEqual(
+            self._get_rollups(DailyRollup, company),
+            [(datetime(2020, 8, 1, tzinfo=timezone.utc), 4500, 3, 500, 3000)],
+        )
+
+    def test_rollups_on_update_and_delete(self):
+        """
+        Should recompute the rollups of the buckets of updated or deleted
+        transactions, removing the buckets left without transactions
+        """
+        company = TransactionFactory.build().company
+        company.save()
+        transaction_one, transaction_two = [
+            TransactionFactory.create(
+                company=company,
+                value=value,
+                created_at=datetime(2020, 8, 1, 10, tzinfo=timezone.utc),
+            )
+            for value in (1000, 3000)
+        ]
+
+        transaction_two.value = 2000
+        transaction_two.created_at = datetime(
+            2020, 8, 2, 10, tzinfo=timezone.utc
+        )
+        transaction_two.save()
+        self.assertEqual(
+            self._get_rollups(DailyRollup, company),
+            [
+                (
+                    datetime(2020, 8, 1, tzinfo=timezone.utc),
+                    1000,
+                    1,
+                    1000,
+                    1000,
+                ),
+                (
+                    datetime(2020, 8, 2, tzinfo=timezone.utc),
+                    2000,
+                    1,
+                    2000,
+                    2000,
+                ),
+            ],
+        )
+
+        transaction_one.delete()
+        self.assertEqual(
+            self._get_rollups(HourlyRollup, company),
+            [
+                (
+                    datetime(2020, 8, 2, 10, tzinfo=timezone.utc),
+                    2000,
+                    1,
+                    2000,
+                    2000,
+                )
+            ],
+        )
+
+    def test_rollup_string_representation(self):
+        transaction = TransactionFactory.create(
+            created_at=datetime(2020, 8, 1, 10, 5, tzinfo=timezone.utc)
+        )
+        rollup = HourlyRollup.objects.get(company=transaction.company)
+        self.assertEqual(
+            str(rollup),
+            f"Rollup (Company: {transaction.company.id} | "
+            f"Hour: 2020-08-01T10:00:00+00:00 | "
+            f"Total: {from_cents(rollup.total_value)} | Transactions: 1)",
+        )
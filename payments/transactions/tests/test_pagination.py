@@ -0,0 +1,34 @@
+from django.test import TestCase
+
+from transactions.api.pagination import (
+    InvalidPage,
+    TransactionKeysetPagination,
+)
+from transactions.tests.factories import TransactionFactory
+
+
+class TestTransactionKeysetPagination(TestCase):
+    def test_cursor_encoding(self):
+        """
+        Should encode a cursor pointing to a transaction which decodes back
+        to the transaction key
+        """
+        pagination = TransactionKeysetPagination()
+        transaction = TransactionFactory.build()
+
+        cursor = pagination.encode_cursor(
+            (transaction.created_at, transaction.id)
+        )
+        self.assertIsInstance(cursor, str)
+        self.assertEqual(
+            pagination.decode_cursor(cursor),
+            (transaction.created_at, transaction.id),
+        )
+
+    def test_invalid_cursor_decoding(self):
+        """Should raise InvalidPage when decoding an invalid cursor"""
+        pagination = TransactionKeysetPagination()
+
+        for cursor in ("invalid", "W10=", "WyJpbnZhbGlkIiwgMV0="):
+            with self.assertRaises(InvalidPage):
+                pagination.decode_cursor(cursor)
@@ -0,0 +1,300 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+
+from django.core import checks
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from companies.formats import format_cnpj
+from companies.tests.factories import CompanyFactory
+from transactions.models import CompanySummary, DailyRollup, Transaction
+from transactions.partitions import (
+    COMPANY,
+    MONTH,
+    create_upcoming_partitions,
+    default_partition_name,
+    get_partitions,
+    get_scheme,
+    month_partition_name,
+    partition_transactions,
+)
+from transactions.tests.factories import TransactionFactory
+
+TABLE = Transaction._meta.db_table
+OPTIONS = {"HASH_PARTITIONS": 4, "MONTHS_AHEAD": 2}
+REPORT_VIEW_NAME = "v1:report"
+
+
+def month_of(months_ago: int) -> date:
+    current = datetime.now(timezone.utc).date()
+    year, month = divmod(
+        current.year * 12 + current.month - 1 - months_ago, 12
+    )
+    return date(year, month + 1, 1)
+
+
+def created_at_of(month: date) -> datetime:
+    return datetime(month.year, month.month, 10, tzinfo=timezone.utc)
+
+
+def partition_of(transaction) -> str:
+    return month_partition_name(TABLE, transaction.created_at.date())
+
+
+def scanned_partitions(queries):
+    """Gets the partitions scanned by the plans of the given queries"""
+    scanned = set()
+    with connection.cursor() as cursor:
+        for query in queries:
+            if TABLE not in query["sql"]:
+                continue
+            cursor.execute(f"EXPLAIN {query['sql']}")
+            plan = "\n".join(line for line, in cursor.fetchall())
+            scanned.update(re.findall(rf"\b{TABLE}_(?:p\w+|default)", plan))
+    return scanned
+
+
+class TestPartitions(TestCase):
+    def setUp(self):
+        self.company = CompanyFactory()
+        self.transactions = [
+            TransactionFactory(
+                company=self.company, created_at=created_at_of(month_of(ago))
+            )
+            for ago in (3, 2, 0)
+        ]
+        self.summary = CompanySummary.objects.get(company=self.company)
+
+    def get_scheme(self):
+        with connection.cursor() as cursor:
+            return get_scheme(cursor, TABLE)
+
+    def assert_transactions_kept(self):
+        self.assertEqual(
+            set(Transaction.objects.values_list("id", flat=True)),
+            {transaction.id for transaction in self.transactions},
+        )
+        summary = CompanySummary.objects.get(company=self.company)
+        self.assertEqual(summary.version, self.summary.version)
+        self.assertEqual(summary.total_value, self.summary.total_value)
+
+    def assert_triggers_kept(self):
+        transaction = TransactionFactory(company=self.company)
+        self.transactions.append(transaction)
+        summary = CompanySummary.objects.get(company=self.company)
+        self.assertEqual(summary.transactions_count, len(self.transactions))
+        self.assertTrue(
+            DailyRollup.objects.filter(
+                company=self.company,
+                bucket__lte=transaction.created_at,
+            ).exists()
+        )
+
+    def test_partition_by_month(self):
+        """
+        Should rebuild the transactions table partitioned by month, from
+        the month of the first transaction up to the months ahead, keeping
+        the transactions, summaries and triggers
+        """
+        partitions = partition_transactions(MONTH, OPTIONS)
+
+        self.assertEqual(self.get_scheme(), MONTH)
+        self.assertEqual(
+            partitions,
+            sorted(
+                [default_partition_name(TABLE)]
+                + [
+                    month_partition_name(TABLE, month_of(ago))
+                    for ago in range(3, -3, -1)
+                ]
+            ),
+        )
+        self.assert_transactions_kept()
+
+        rows = Transaction.objects.extra(
+            select={"partition": "tableoid::regclass::text"}
+        ).values_list("id", "partition")
+        self.assertEqual(
+            dict(rows),
+            {
+                transaction.id: partition_of(transaction)
+                for transaction in self.transactions
+            },
+        )
+        self.assert_triggers_kept()
+
+    def test_partition_by_company(self):
+        """
+        Should rebuild the transactions table with hash partitions by
+        company, keeping the transactions, summaries and triggers
+        """
+        partitions = partition_transactions(COMPANY, OPTIONS)
+
+        self.assertEqual(self.get_scheme(), COMPANY)
+        self.assertEqual(
+            partitions, [f"{TABLE}_p{remainder}" for remainder in range(4)]
+        )
+        self.assert_transactions_kept()
+        self.assert_triggers_kept()
+
+    def test_unpartition(self):
+        """
+        Should rebuild the transactions table as a plain table, keeping
+        the transactions, summaries and triggers, even when switching
+        between schemes
+        """
+        partition_transactions(MONTH, OPTIONS)
+        partition_transactions(COMPANY, OPTIONS)
+        self.assertEqual(self.get_scheme(), COMPANY)
+
+        self.assertEqual(partition_transactions(None, OPTIONS), [])
+        self.assertIsNone(self.get_scheme())
+        self.assert_transactions_kept()
+        self.assert_triggers_kept()
+
+    def test_create_upcoming_partitions(self):
+        """
+        Should create the missing partitions of the current and upcoming
+        months, moving their transactions out of the default partition
+        """
+        self.assertEqual(create_upcoming_partitions(1), [])
+
+        partition_transactions(MONTH, {**OPTIONS, "MONTHS_AHEAD": 0})
+        transaction = TransactionFactory(
+            company=self.company, created_at=created_at_of(month_of(-2))
+        )
+        self.transactions.append(transaction)
+        self.summary.refresh_from_db()
+
+        with connection.cursor() as cursor:
+            partitions = get_partitions(cursor, TABLE)
+        self.assertNotIn(partition_of(transaction), partitions)
+
+        created = create_upcoming_partitions(2)
+        self.assertEqual(
+            created,
+            [
+                month_partition_name(TABLE, month_of(-1)),
+                partition_of(transaction),
+            ],
+        )
+        self.assertEqual(create_upcoming_partitions(2), [])
+
+        moved = Transaction.objects.extra(
+            select={"partition": "tableoid::regclass::text"}
+        ).get(id=transaction.id)
+        self.assertEqual(moved.partition, partition_of(transaction))
+        self.assert_transactions_kept()
+
+    def test_create_transaction_partitions_command(self):
+        """
+        Should create the upcoming monthly partitions, reporting them
+        """
+        partition_transactions(MONTH, {**OPTIONS, "MONTHS_AHEAD": 0})
+        output = StringIO()
+        call_command("create_transaction_partitions", months=1, stdout=output)
+        self.assertIn(
+            "Successfully created 1 partitions: "
+            f"{month_partition_name(TABLE, month_of(-1))}",
+            output.getvalue(),
+        )
+
+    def test_partition_transactions_command(self):
+        """
+        Should partition the transactions table with the given scheme,
+        defaulting to the setting, reporting it and refusing unknown schemes
+        """
+        output = StringIO()
+        with override_settings(
+            TRANSACTIONS_PARTITIONING={**OPTIONS, "SCHEME": COMPANY}
+        ):
+            call_command("partition_transactions", stdout=output)
+            call_command("partition_transactions", stdout=output)
+        self.assertEqual(self.get_scheme(), COMPANY)
+        self.assertIn(
+            f"Rebuilt the transactions table of {DEFAULT_DB_ALIAS} "
+            "partitioned by company: 4 partitions",
+            output.getvalue(),
+        )
+        self.assertIn(
+            f"Kept the transactions table of {DEFAULT_DB_ALIAS} "
+            "partitioned by company: 4 partitions",
+            output.getvalue(),
+        )
+
+        call_command("partition_transactions", scheme="none", stdout=output)
+        self.assertIsNone(self.get_scheme())
+        self.assert_transactions_kept()
+
+        with self.assertRaisesMessage(CommandError, "Unknown partitioning"):
+            call_command("partition_transactions", scheme="year")
+
+    def test_partitioning_check(self):
+        """
+        Should warn when the transactions table is not partitioned as set,
+        and fail on unknown schemes
+        """
+        databases = [DEFAULT_DB_ALIAS]
+        for scheme, expected, expected_without_databases in (
+            ("", [], []),
+            (MONTH, ["transactions.W001"], []),
+            ("year", ["transactions.E001"], ["transactions.E001"]),
+        ):
+            options = {**OPTIONS, "SCHEME": scheme}
+            with override_settings(TRANSACTIONS_PARTITIONING=options):
+                errors = checks.run_checks(databases=databases)
+                self.assertEqual([error.id for error in errors], expected)
+                # the databases are only checked when asked for (migrate)
+                errors = checks.run_checks()
+                self.assertEqual(
+                    [error.id for error in errors], expected_without_databases
+                )
+
+        partition_transactions(MONTH, OPTIONS)
+        with override_settings(
+            TRANSACTIONS_PARTITIONING={**OPTIONS, "SCHEME": MONTH}
+        ):
+            self.assertEqual(checks.run_checks(databases=databases), [])
+
+    def test_report_partition_pruning(self):
+        """
+        Should scan only the partitions of the requested window and of the
+        requested page when reporting the transactions of a company
+        """
+        partition_transactions(MONTH, OPTIONS)
+        url = reverse(REPORT_VIEW_NAME)
+        cnpj = format_cnpj(self.company.cnpj)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                url,
+                {
+                    "cnpj": cnpj,
+                    "inicio": month_of(2).isoformat(),
+                    "fim": (month_of(1) - timedelta(days=1)).isoformat(),
+                },
+            )
+        self.assertEqual(len(response.json()["recebimentos"]), 1)
+        self.assertEqual(
+            scanned_partitions(context.captured_queries),
+            {partition_of(self.transactions[1])},
+        )
+
+        first_page = self.client.get(url, {"cnpj": cnpj, "limite": 2})
+        cursor = first_page.json()["proximo_cursor"]
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {"cnpj": cnpj, "limite": 2, "cursor": cursor})
+        self.assertNotIn(
+            partition_of(self.transactions[0]),
+            scanned_partitions(context.captured_queries),
+        )
+
+        partition_transactions(COMPANY, OPTIONS)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"cnpj": cnpj, "completo": "true"})
+            b"".join(response.streaming_content)
+        self.assertEqual(len(scanned_partitions(context.captured_queries)), 1)
@@ -0,0 +1,332 @@
+import os
+import shutil
+import time
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from companies.cache import company_cache
+from companies.tests.factories import CompanyFactory
+from transactions.models import Transaction
+from transactions.queue import (
+    DEAD_LETTER_DIRECTORY,
+    SegmentLog,
+    WriteBehindQueue,
+    decode_record,
+    transaction_queue,
+)
+from transactions.tests.factories import TransactionFactory
+
+REPORT_VIEW_NAME = "v1:report"
+
+
+def build_transactions(company, count):
+    return [TransactionFactory.build(company=company) for _ in range(count)]
+
+
+class TestSegmentLog(TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_append_and_read(self):
+        """
+        Should append lines to the current segment, starting a new one once
+        it grows past the segment size, and carry on numbering the segments
+        when opened again
+        """
+        log = SegmentLog(self.directory.name, segment_size=10)
+        first = log.append(b"first line\n")
+        second = log.append(b"second\n")
+        third = log.append(b"third\n")
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(second, third)
+        self.assertEqual(log.segments(), [first, second])
+        self.assertEqual(list(SegmentLog.read(first)), [b"first line\n"])
+        self.assertEqual(
+            list(SegmentLog.read(second)), [b"second\n", b"third\n"]
+        )
+
+        log.seal()
+        fourth = SegmentLog(self.directory.name, 10).append(b"fourth\n")
+        self.assertEqual(log.segments(), [first, second, fourth])
+
+    def test_read_torn_line(self):
+        """Should leave out a line cut short by a crash while appended"""
+        log = SegmentLog(self.directory.name, segment_size=1024)
+        segment = log.append(b"whole\n")
+        log.seal()
+        with open(segment, "ab") as segment_file:
+            segment_file.write(b"tor")
+
+        self.assertEqual(list(SegmentLog.read(segment)), [b"whole\n"])
+
+
+class TestWriteBehindQueue(TestCase):
+    def setUp(self):
+        company_cache.clear()
+        self.directory = TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.company = CompanyFactory()
+
+    def make_queue(self, **options) -> WriteBehindQueue:
+        options = {"segment_size": 1024, "batch_size": 2, **options}
+        queue = WriteBehindQueue(self.directory.name, interval=1, **options)
+        queue.open()
+        self.addCleanup(queue.close)
+        return queue
+
+    def test_put_and_flush(self):
+        """
+        Should only insert the queued transactions once flushed, in
+        batches, reporting the depth and the lag of the queue
+        """
+        queue = self.make_queue()
+        transactions = build_transactions(self.company, 3)
+        for transaction in transactions:
+            queue.put(transaction, self.company.cnpj)
+
+        self.assertEqual(Transaction.objects.count(), 0)
+        stats = queue.stats()
+        self.assertEqual(stats["depth"], 3)
+        self.assertEqual(stats["segments"], 1)
+        self.assertGreaterEqual(stats["lag"], 0)
+
+        self.assertEqual(queue.flush(), 3)
+
+        self.assertEqual(
+            set(Transaction.objects.values_list("id", "value")),
+            {
+                (transaction.id, transaction.value)
+                for transaction in transactions
+            },
+        )
+        self.assertEqual(
+            queue.stats(),
+            {
+                "depth": 0,
+                "lag": 0.0,
+                "segments": 0,
+                "flushed": 3,
+                "dead_lettered": 0,
+            },
+        )
+        self.assertEqual(queue.flush(), 0)
+
+    def test_replay(self):
+        """
+        Should replay the transactions a crashed process left queued when
+        its slot is claimed, inserting the ones merged before only once and
+        not counting them as flushed
+        """
+        crashed = WriteBehindQueue(
+            self.directory.name, segment_size=1024, batch_size=2, interval=1
+        )
+        crashed.open()
+        transactions = build_transactions(self.company, 3)
+        for transaction in transactions:
+            crashed.put(transaction, self.company.cnpj)
+        segment = crashed._log.segments()[0]
+        # merged, but crashed before removing the segment
+        shutil.copy(segment, f"{segment}.copy")
+        crashed.flush()
+        os.rename(f"{segment}.copy", segment)
+        crashed._slot_lock.close()
+
+        queue = self.make_queue()
+
+        self.assertEqual(queue.stats()["depth"], 3)
+        self.assertEqual(queue.flush(), 0)
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(os.listdir(os.path.dirname(segment)), ["lock"])
+        self.assertEqual(queue.stats()["dead_lettered"], 0)
+
+    def test_drain_other_slots(self):
+        """
+        Should flush the transactions of slots left by other processes,
+        leaving the ones of running processes alone
+        """
+        running = self.make_queue()
+        running.put(build_transactions(self.company, 1)[0], self.company.cnpj)
+        crashed = WriteBehindQueue(
+            self.directory.name, segment_size=1024, batch_size=2, interval=1
+        )
+        crashed.open()
+        for transaction in build_transactions(self.company, 2):
+            crashed.put(transaction, self.company.cnpj)
+        crashed._slot_lock.close()
+
+        queue = self.make_queue()
+
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(running.stats()["depth"], 1)
+
+    def test_flush_unknown_company(self):
+        """
+        Should keep the transactions of companies deleted meanwhile in the
+        dead-letter directory, only counting the inserted ones as flushed
+        """
+        queue = self.make_queue()
+        company = CompanyFactory()
+        lost = build_transactions(company, 1)[0]
+        queue.put(lost, company.cnpj)
+        queue.put(build_transactions(self.company, 1)[0], self.company.cnpj)
+        company.delete()
+
+        with self.assertLogs("transactions.queue", "ERROR"):
+            self.assertEqual(queue.flush(), 1)
+
+        self.assertEqual(
+            list(Transaction.objects.values_list("company_id", flat=True)),
+            [self.company.id],
+        )
+        self.assertEqual(queue.stats()["depth"], 0)
+        self.assertEqual(queue.stats()["dead_lettered"], 1)
+
+        directory = os.path.join(self.directory.name, DEAD_LETTER_DIRECTORY)
+        (name,) = os.listdir(directory)
+        lines = list(SegmentLog.read(os.path.join(directory, name)))
+        self.assertEqual(len(lines), 1)
+        cnpj, transaction = decode_record(lines[0])[1:]
+        self.assertEqual(cnpj, company.cnpj)
+        self.assertEqual(transaction.id, lost.id)
+
+    def test_flush_stale_company(self):
+        """
+        Should look the companies up again when their cached entries are
+        stale, merging their transactions
+        """
+        queue = self.make_queue()
+        company = CompanyFactory.build()
+        self.assertIsNone(company_cache.get(company.cnpj))
+        company.save()
+        transaction = build_transactions(company, 1)[0]
+        queue.put(transaction, company.cnpj)
+
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(
+            list(Transaction.objects.values_list("id", flat=True)),
+            [transaction.id],
+        )
+        self.assertEqual(queue.stats()["dead_lettered"], 0)
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.directory.name, DEAD_LETTER_DIRECTORY)
+            )
+        )
+
+    def test_flush_command(self):
+        """Should flush the slots left by other processes"""
+        crashed = WriteBehindQueue(
+            self.directory.name, segment_size=1024, batch_size=2, interval=1
+        )
+        crashed.open()
+        for transaction in build_transactions(self.company, 2):
+            crashed.put(transaction, self.company.cnpj)
+        crashed._slot_lock.close()
+
+        output = StringIO()
+        call_command(
+            "flush_transaction_queue",
+            directory=self.directory.name,
+            stdout=output,
+        )
+
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertIn(
+            "Successfully flushed 2 transactions from the queue in "
+            f"{self.directory.name}",
+            output.getvalue(),
+        )
+        with self.assertRaises(CommandError):
+            call_command("flush_transaction_queue", directory="")
+
+
+class TestWriteBehindQueueFlusher(TransactionTestCase):
+    def test_background_flush(self):
+        """
+        Should flush the queued transactions in the background every
+        interval, along with what is left once closed
+        """
+        company_cache.clear()
+        company = CompanyFactory()
+
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=0.05
+            )
+            queue.start()
+            queue.put(build_transactions(company, 1)[0], company.cnpj)
+            for _ in range(100):
+                if queue.stats()["depth"] == 0:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(queue.stats()["flushed"], 1)
+
+            queue.put(build_transactions(company, 1)[0], company.cnpj)
+            queue.close()
+
+        self.assertFalse(queue.is_open)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_start_after_fork(self):
+        """
+        Should start the queue again, in a slot of its own, in a process
+        forked from one which started it, as its flusher is not inherited
+        """
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=60
+            )
+            queue.start()
+            flusher = queue._flusher
+            queue.ensure_started()
+            self.assertIs(queue._flusher, flusher)
+
+            read_end, write_end = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # the child reports back without touching the database
+                try:
+                    queue.ensure_started()
+                    report = (
+                        f"{queue._flusher.is_alive()} "
+                        f"{os.path.basename(queue._log.directory)}"
+                    )
+                    os.write(write_end, report.encode())
+                finally:
+                    os._exit(0)
+
+            os.close(write_end)
+            with os.fdopen(read_end) as pipe:
+                report = pipe.read()
+            os.waitpid(pid, 0)
+
+            self.assertEqual(report, "True slot-1")
+            self.assertIs(queue._flusher, flusher)
+            self.assertEqual(os.path.basename(queue._log.directory), "slot-0")
+            queue.close()
+
+    def test_start_on_request(self):
+        """
+        Should start the queue in the processes serving the requests, once
+        its directory is configured
+        """
+        with patch.object(transaction_queue, "ensure_started") as started:
+            self.client.get(reverse(REPORT_VIEW_NAME))
+            started.assert_not_called()
+
+            queue_settings = {
+                **settings.TRANSACTIONS_QUEUE,
+                "DIRECTORY": "/var/lib/shipay/fila",
+            }
+            with override_settings(TRANSACTIONS_QUEUE=queue_settings):
+                self.client.get(reverse(REPORT_VIEW_NAME))
+            started.assert_called_once_with()
@@ -0,0 +1,248 @@
+import asyncio
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from companies.cache import company_cache
+from companies.formats import format_cnpj
+from companies.models import Company
+from payments.routers import (
+    PRIMARY,
+    PRIMARY_COOKIE,
+    DatabaseRouter,
+    ReplicaMiddleware,
+    use_primary,
+    use_shard,
+)
+from transactions.api.serializers import TransactionSerializer
+from transactions.models import Transaction
+from transactions.tests.factories import TransactionFactory
+
+REPLICA = "replica1"
+SHARD = "shard1"
+REPLICATION = {"REPLICAS": [REPLICA], "STICKINESS": 60}
+TRANSACTION_VIEW_NAME = "v1:transaction"
+REPORT_VIEW_NAME = "v1:report"
+
+
+def read_database(request):
+    """View answering the database the transactions would be read from"""
+    return HttpResponse(router.db_for_read(Transaction))
+
+
+@override_settings(DATABASE_REPLICATION=REPLICATION)
+class TestDatabaseRouter(SimpleTestCase):
+    def setUp(self):
+        self.router = DatabaseRouter()
+
+    def test_routing(self):
+        """
+        Should send reads to the replicas and writes and migrations to the
+        primary
+        """
+        self.assertEqual(self.router.db_for_read(Transaction), REPLICA)
+        self.assertEqual(self.router.db_for_write(Transaction), PRIMARY)
+        self.assertIsNone(self.router.allow_migrate(PRIMARY, "transactions"))
+        self.assertFalse(self.router.allow_migrate(REPLICA, "transactions"))
+
+    def test_use_primary(self):
+        """Should send the reads within the block to the primary"""
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Transaction), PRIMARY)
+        self.assertEqual(self.router.db_for_read(Transaction), REPLICA)
+
+    @skipUnless(SHARD in settings.DATABASES, "no shards configured")
+    def test_use_shard(self):
+        """
+        Should send the queries within the block to the given shard, which
+        has no replicas
+        """
+        with use_shard(SHARD):
+            self.assertEqual(self.router.db_for_read(Transaction), SHARD)
+            self.assertEqual(self.router.db_for_write(Transaction), SHARD)
+        self.assertEqual(self.router.db_for_write(Transaction), PRIMARY)
+
+    def test_instance_database(self):
+        """
+        Should send the reads related to an instance to the database it was
+        loaded from
+        """
+        company = Company()
+        company._state.db = PRIMARY
+        self.assertEqual(
+            self.router.db_for_read(Transaction, instance=company), PRIMARY
+        )
+        self.assertTrue(
+            self.router.allow_relation(company, Transaction(company=company))
+        )
+
+    @override_settings(DATABASE_REPLICATION={"REPLICAS": [], "STICKINESS": 0})
+    def test_without_replicas(self):
+        """Should send reads to the primary when there are no replicas"""
+        self.assertEqual(self.router.db_for_read(Transaction), PRIMARY)
+
+
+class TestDatabaseRouterTransaction(TestCase):
+    @override_settings(DATABASE_REPLICATION=REPLICATION)
+    def test_reads_within_transaction(self):
+        """
+        Should send the reads performed within a transaction of the primary
+        to the primary
+        """
+        self.assertEqual(DatabaseRouter().db_for_read(Transaction), PRIMARY)
+
+
+@override_settings(DATABASE_REPLICATION=REPLICATION)
+class TestReplicaMiddleware(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(read_database)
+
+    def test_read_only_request(self):
+        """Should read from a replica when handling a read-only request"""
+        response = self.middleware(self.factory.get("/"))
+
+        self.assertEqual(response.content.decode(), REPLICA)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_writing_request(self):
+        """
+        Should read from the primary when handling a request which may
+        write, keeping the client on the primary for the stickiness window
+        """
+        response = self.middleware(self.factory.post("/"))
+
+        self.assertEqual(response.content.decode(), PRIMARY)
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]["max-age"], 60)
+
+        request = self.factory.get("/")
+        request.COOKIES[PRIMARY_COOKIE] = response.cookies[PRIMARY_COOKIE]
+        response = self.middleware(request)
+        self.assertEqual(response.content.decode(), PRIMARY)
+
+    @override_settings(
+        DATABASE_REPLICATION={"REPLICAS": [REPLICA], "STICKINESS": 0}
+    )
+    def test_writing_request_without_stickiness(self):
+        """Should not keep the client on the primary unless enabled"""
+        response = self.middleware(self.factory.post("/"))
+
+        self.assertEqual(response.content.decode(), PRIMARY)
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_streaming_response(self):
+        """
+        Should read the content of a streaming response from the database
+        chosen for the request
+        """
+
+        def stream_database(request):
+            return StreamingHttpResponse(
+                router.db_for_read(Transaction) for _ in range(2)
+            )
+
+        middleware = ReplicaMiddleware(stream_database)
+        request = self.factory.get("/")
+        request.COOKIES[PRIMARY_COOKIE] = "1"
+        response = middleware(request)
+
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(), PRIMARY * 2
+        )
+
+    async def test_async_request(self):
+        """
+        Should run asynchronously when the next handler does, choosing the
+        database of the request as well
+        """
+
+        async def read_database_async(request):
+            return read_database(request)
+
+        middleware = ReplicaMiddleware(read_database_async)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        response = await middleware(self.factory.get("/"))
+        self.assertEqual(response.content.decode(), REPLICA)
+
+        response = await middleware(self.factory.post("/"))
+        self.assertEqual(response.content.decode(), PRIMARY)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        self.assertFalse(
+            asyncio.iscoroutinefunction(ReplicaMiddleware(read_database))
+        )
+
+
+@skipUnless(
+    settings.DATABASE_REPLICATION["REPLICAS"], "no replicas configured"
+)
+class TestReplicaRouting(TransactionTestCase):
+    """Routes requests through the configured replicas (see DB_REPLICAS)"""
+
+    databases = "__all__"
+
+    def setUp(self):
+        company_cache.clear()
+        self.transaction = TransactionFactory()
+        self.cnpj = format_cnpj(self.transaction.company.cnpj)
+
+    def request(self, method, url, data):
+        """Performs a request, counting the queries of each database"""
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in connections
+            }
+            response = method(url, data)
+        return response, {
+            alias: len(context) for alias, context in contexts.items()
+        }
+
+    @override_settings(
+        DATABASE_REPLICATION={
+            **settings.DATABASE_REPLICATION,
+            "STICKINESS": 60,
+        }
+    )
+    def test_report_routing(self):
+        """
+        Should serve reports from the replicas and record transactions in
+        the primary, serving the next reports of the client from the primary
+        """
+        report_url = reverse(REPORT_VIEW_NAME)
+        response, queries = self.request(
+            self.client.get, report_url, {"cnpj": self.cnpj}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[PRIMARY], 0)
+        self.assertGreater(sum(queries.values()), 0)
+
+        payload = TransactionSerializer(
+            TransactionFactory.build(company=self.transaction.company)
+        ).data
+        response, queries = self.request(
+            self.client.post, reverse(TRANSACTION_VIEW_NAME), payload
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(queries[PRIMARY], sum(queries.values()))
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+
+        response, queries = self.request(
+            self.client.get, report_url, {"cnpj": self.cnpj}
+        )
+        self.assertEqual(len(response.json()["recebimentos"]), 2)
+        self.assertEqual(queries[PRIMARY], sum(queries.values()))
@@ -1,16 +1,15 @@
-from django.core.exceptions import ValidationError
-from django.db.models import Sum
 from django.test import TestCase
 
 from companies.api.serializers import CompanyReportSerializer
-from companies.models import Company
 from transactions.api.serializers import (
     ReportSerializer,
+    TransactionIngestSerializer,
     TransactionReportSerializer,
     TransactionSerializer,
-    WritableTransactionSerializer,
 )
+from transactions.formats import CPF_DIGITS, normalize_cpf
 from transactions.models import Transaction
+from transactions.money import from_cents
 from transactions.tests.factories import TransactionFactory
 
 transaction_report_fields_mapping = {
@@ -22,9 +21,6 @@ transaction_report_fields_mapping = {
 transaction_reader_fields_mapping = {"estabelecimento": "company.cnpj"}
 transaction_reader_fields_mapping.update(transaction_report_fields_mapping)
 
-transaction_writer_fields_mapping = {"estabelecimento": "company"}
-transaction_writer_fields_mapping.update(transaction_report_fields_mapping)
-
 
 class TestSerializers(TestCase):
     def test_reader_serializer(self):
@@ -44,6 +40,9 @@ class TestSerializers(TestCase):
             else:
                 value = getattr(transaction, model_field)
 
+            if serializer_field == "valor":
+                value = from_cents(value)
+
             self.assertEqual(serialized_data[serializer_field], value)
 
         # tests if serializer validates
@@ -66,88 +65,100 @@ class TestSerializers(TestCase):
         self.assertIn(expected_message, str(raised.exception))
         self.assertEqual(Transaction.objects.count(), 0)
 
-    def test_writer_serializer(self):
-        """Should successfully serialize a Transaction instance"""
+    def test_ingest_serializer(self):
+        """
+        Should successfully validate Transaction data with the ingestion
+        serializer, mapping it to the Transaction fields
+        """
         transaction = TransactionFactory.build()
-        transaction.company.save()
-        serializer = WritableTransactionSerializer(transaction)
-        data = serializer.data
+        data = TransactionSerializer(transaction).data
+        serializer = TransactionIngestSerializer(data=data)
 
-        for (
-            serializer_field,
-            model_field,
-        ) in transaction_writer_fields_mapping.items():
-            self.assertIn(serializer_field, data)
-            value = getattr(transaction, model_field)
-
-            if serializer_field == "estabelecimento":
-                value = transaction.company.id
-
-            self.assertEqual(data[serializer_field], value)
-
-        # tests if serializer validates
-        serializer = WritableTransactionSerializer(data=data)
         self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            serializer.validated_data,
+            {
+                "cnpj": transaction.company.cnpj,
+                "client": int(normalize_cpf(transaction.client)),
+                "value": transaction.value,
+                "description": transaction.description,
+            },
+        )
 
-    def test_writer_serializer_save(self):
+    def test_ingest_serializer_unpunctuated_client(self):
         """
-        Should successfully write data with the Transaction writer serializer
-        when the Company for the given Transaction exists
+        Should validate the client cpf with the ingestion serializer whether
+        it is given with or without punctuation
         """
         transaction = TransactionFactory.build()
-        transaction.company.save()
-        self.assertEqual(Transaction.objects.count(), 0)
+        data = TransactionSerializer(transaction).data
+        data["cliente"] = normalize_cpf(transaction.client)
+        serializer = TransactionIngestSerializer(data=data)
 
-        data = WritableTransactionSerializer(transaction).data
-        serializer = WritableTransactionSerializer(data=data)
         self.assertTrue(serializer.is_valid())
+        self.assertEqual(
+            serializer.validated_data["client"], int(data["cliente"])
+        )
 
-        serializer.save()
-        self.assertEqual(Transaction.objects.count(), 1)
+        # a digit too many is not taken for another cpf
+        data["cliente"] = normalize_cpf(transaction.client) + "1"
+        serializer = TransactionIngestSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors["cliente"],
+            [f"Ensure this field has {CPF_DIGITS} digits."],
+        )
 
-    def test_writer_serializer_no_company(self):
+    def test_ingest_serializer_value_cents(self):
         """
-        Should fail to validate data with the Transaction writer serializer
-        when the Company for the given Transaction does not exist
+        Should validate the Transaction value with the ingestion serializer
+        as integer cents, rounding it to the nearest cent
         """
         transaction = TransactionFactory.build()
-        self.assertEqual(Transaction.objects.count(), 0)
-
-        data = WritableTransactionSerializer(transaction).data
-        serializer = WritableTransactionSerializer(data=data)
-        self.assertFalse(serializer.is_valid())
-
-        expected_key = "estabelecimento"
-        expected_text = "object does not exist."
-        self.assertIn(expected_key, serializer.errors)
-        self.assertIn(expected_text, str(serializer.errors[expected_key]))
-        self.assertEqual(Transaction.objects.count(), 0)
-
-    def test_writer_serializer_save_invalid_client(self):
+        data = TransactionSerializer(transaction).data
+
+        for valor, cents in (
+            (150.37, 15037),
+            ("0.1", 10),
+            (0.125, 13),
+            (10, 1000),
+        ):
+            data["valor"] = valor
+            serializer = TransactionIngestSerializer(data=data)
+            self.assertTrue(serializer.is_valid())
+            self.assertEqual(serializer.validated_data["value"], cents)
+
+    def test_ingest_serializer_invalid_value(self):
         """
-        Should fail to save data with the Transaction writer serializer
-        when the client cpf is invalid
+        Should fail to validate Transaction data with the ingestion
+        serializer when the value is not a finite amount which fits in cents
         """
         transaction = TransactionFactory.build()
-        transaction.company.save()
-        transaction.client = "111.111.111-11"
-        self.assertEqual(Transaction.objects.count(), 0)
-
-        data = WritableTransactionSerializer(transaction).data
-        serializer = WritableTransactionSerializer(data=data)
-        self.assertTrue(serializer.is_valid())
+        data = TransactionSerializer(transaction).data
 
-        expected_messages = {
-            "client": [
-                f"Ensure the CPF is valid (it is {transaction.client})."
-            ]
-        }
+        for valor in ("invalid", "inf", "nan", 1e20):
+            data["valor"] = valor
+            serializer = TransactionIngestSerializer(data=data)
+            self.assertFalse(serializer.is_valid())
+            self.assertEqual(
+                serializer.errors["valor"], ["A valid number is required."]
+            )
 
-        with self.assertRaises(ValidationError) as raised:
-            serializer.save()
+    def test_ingest_serializer_invalid_client(self):
+        """
+        Should fail to validate Transaction data with the ingestion
+        serializer when the client cpf is invalid
+        """
+        transaction = TransactionFactory.build()
+        data = TransactionSerializer(transaction).data
+        data["cliente"] = "111.111.111-11"
+        serializer = TransactionIngestSerializer(data=data)
 
-        self.assertEqual(raised.exception.message_dict, expected_messages)
-        self.assertEqual(Transaction.objects.count(), 0)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors["cliente"],
+            [f"Ensure the CPF is valid (it is {data['cliente']})."],
+        )
 
     def test_transaction_report_serializer(self):
         """
@@ -164,6 +175,8 @@ class TestSerializers(TestCase):
         ) in transaction_report_fields_mapping.items():
             self.assertIn(serializer_field, data)
             value = getattr(transaction, model_field)
+            if serializer_field == "valor":
+                value = from_cents(value)
             self.assertEqual(data[serializer_field], value)
 
         # tests if serializer validates
@@ -183,22 +196,23 @@ class TestSerializers(TestCase):
         transaction_two.company = company
         transaction_two.save()
 
-        # query for annotating the total value
-        company = (
-            Company.objects.filter(cnpj=company.cnpj)
-            .prefetch_related("transactions")
-            .annotate(total_value=Sum("transactions__value"))
-            .first()
-        )
+        transactions = Transaction.objects.filter(company=company)
+        report = {
+            "company": company,
+            "transactions": transactions,
+            "total_value": transaction_one.value + transaction_two.value,
+            "next_cursor": None,
+        }
 
-        serializer = ReportSerializer(company)
+        serializer = ReportSerializer(report)
         expected_data = {
             "estabelecimento": CompanyReportSerializer(company).data,
             "recebimentos": [
                 TransactionReportSerializer(transaction_one).data,
                 TransactionReportSerializer(transaction_two).data,
             ],
-            "total_recebido": company.total_value,
+            "total_recebido": from_cents(report["total_value"]),
+            "proximo_cursor": None,
         }
 
         self.assertEqual(serializer.data, expected_data)
@@ -0,0 +1,310 @@
+import json
+import os
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TransactionTestCase
+from django.urls import reverse
+
+from companies.cache import company_cache
+from companies.formats import format_cnpj
+from companies.models import Company, CompanyPlacement
+from companies.shards import get_shards, hash_shard, shard_directory
+from companies.tests.factories import CompanyFactory
+from companies.utils import copy_companies
+from payments import aiodb
+from pycpfcnpj.gen import cnpj_with_punctuation
+from transactions.api.async_views import (
+    AsyncRecordTransactionView,
+    AsyncTransactionsReportView,
+)
+from transactions.api.serializers import TransactionSerializer
+from transactions.importing import Checkpoint, import_transactions
+from transactions.models import CompanySummary, DailyRollup, Transaction
+from transactions.queue import WriteBehindQueue
+from transactions.tests.factories import TransactionFactory
+
+TRANSACTION_VIEW_NAME = "v1:transaction"
+TRANSACTIONS_BATCH_VIEW_NAME = "v1:transactions_batch"
+REPORT_VIEW_NAME = "v1:report"
+
+
+def cnpj_of_shard(shard: str) -> str:
+    """Generates a CNPJ whose company is held by the given shard"""
+    while True:
+        cnpj = cnpj_with_punctuation()
+        if hash_shard(cnpj, get_shards()) == shard:
+            return cnpj
+
+
+@skipUnless(len(get_shards()) > 1, "no shards configured")
+class TestSharding(TransactionTestCase):
+    """Shards the companies across the configured shards (see DB_SHARDS)"""
+
+    databases = "__all__"
+
+    def setUp(self):
+        company_cache.clear()
+        self.first_shard, self.second_shard = get_shards()[:2]
+        self.companies = [
+            CompanyFactory(cnpj=cnpj_of_shard(shard))
+            for shard in (self.first_shard, self.second_shard)
+        ]
+
+    def get_shards_of(self, model, **filters):
+        return [
+            shard
+            for shard in get_shards()
+            if model.objects.using(shard).filter(**filters).exists()
+        ]
+
+    def test_import_companies(self):
+        """Should import each company into its shard only"""
+        data = [
+            CompanyFactory.build(cnpj=cnpj_of_shard(shard)).__dict__
+            for shard in get_shards()
+        ]
+        for piece in data:
+            del piece["_state"], piece["id"]
+
+        copy_companies(data)
+
+        for shard, piece in zip(get_shards(), data):
+            self.assertEqual(
+                self.get_shards_of(Company, cnpj=piece["cnpj"]), [shard]
+            )
+
+    def test_record_and_report(self):
+        """
+        Should record the transactions of each company in its shard, serving
+        the report of each company from its shard
+        """
+        for company in self.companies:
+            payload = TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            response = self.client.post(
+                reverse(TRANSACTION_VIEW_NAME), payload
+            )
+            self.assertEqual(response.status_code, 201)
+
+        payload = [
+            TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            for company in self.companies
+        ]
+        response = self.client.post(
+            reverse(TRANSACTIONS_BATCH_VIEW_NAME),
+            json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        for company in self.companies:
+            self.assertEqual(
+                self.get_shards_of(Transaction, company_id=company.id),
+                [company._state.db],
+            )
+            self.assertEqual(
+                Transaction.objects.using(company._state.db)
+                .filter(company_id=company.id)
+                .count(),
+                2,
+            )
+            response = self.client.get(
+                reverse(REPORT_VIEW_NAME), {"cnpj": format_cnpj(company.cnpj)}
+            )
+            self.assertEqual(len(response.json()["recebimentos"]), 2)
+
+    def test_async_record_and_report(self):
+        """
+        Should record the transactions of each company in its shard, serving
+        the report of each company from its shard, with the async views
+        """
+        factory = RequestFactory()
+
+        def call(view_class, request):
+            async def respond():
+                try:
+                    return await view_class.as_view()(request)
+                finally:
+                    aiodb.close_pools()
+
+            return async_to_sync(respond)()
+
+        for company in self.companies:
+            payload = TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            request = factory.post(reverse(TRANSACTION_VIEW_NAME), payload)
+            response = call(AsyncRecordTransactionView, request)
+            self.assertEqual(response.status_code, 201)
+
+        for company in self.companies:
+            self.assertEqual(
+                self.get_shards_of(Transaction, company_id=company.id),
+                [company._state.db],
+            )
+            request = factory.get(
+                reverse(REPORT_VIEW_NAME), {"cnpj": format_cnpj(company.cnpj)}
+            )
+            response = call(AsyncTransactionsReportView, request)
+            data = json.loads(response.content)
+            self.assertEqual(len(data["recebimentos"]), 1)
+
+    def test_queued_transactions(self):
+        """Should flush the queued transactions of each company to its shard"""
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=1
+            )
+            queue.open()
+            for company in self.companies:
+                transaction = TransactionFactory.build(company=company)
+                queue.put(transaction, company.cnpj)
+            queue.close()
+
+        for company in self.companies:
+            self.assertEqual(
+                self.get_shards_of(Transaction, company_id=company.id),
+                [company._state.db],
+            )
+
+    def test_queued_transactions_stale_shard(self):
+        """
+        Should merge the queued transactions of a company moved meanwhile
+        into its new shard, though its cached shard is stale
+        """
+        company = self.companies[0]
+        cnpj = format_cnpj(company.cnpj)
+        cached = company_cache.get(cnpj)
+        call_command("move_company", cnpj=cnpj, shard=self.second_shard)
+        stale = iter([{company.cnpj: cached}])
+
+        def get_many(cnpjs):
+            return next(stale, None) or real_get_many(cnpjs)
+
+        real_get_many = company_cache.get_many
+        with TemporaryDirectory() as directory:
+            queue = WriteBehindQueue(
+                directory, segment_size=1024, batch_size=10, interval=1
+            )
+            queue.open()
+            transaction = TransactionFactory.build(company=company)
+            queue.put(transaction, company.cnpj)
+            with patch.object(company_cache, "get_many", get_many):
+                self.assertEqual(queue.flush(), 1)
+            queue.close()
+
+        self.assertEqual(queue.stats()["dead_lettered"], 0)
+        self.assertEqual(
+            self.get_shards_of(Transaction, id=transaction.id),
+            [self.second_shard],
+        )
+
+    def test_import_transactions(self):
+        """Should import the transactions of each company into its shard"""
+        data = [
+            TransactionSerializer(
+                TransactionFactory.build(company=company)
+            ).data
+            for company in self.companies * 2
+        ]
+
+        with TemporaryDirectory() as directory:
+            checkpoint = Checkpoint(os.path.join(directory, "checkpoint"), "")
+            summary = import_transactions(data, checkpoint, batch_size=3)
+
+        self.assertEqual(summary.inserted, 4)
+        for company in self.companies:
+            self.assertEqual(
+                Transaction.objects.using(company._state.db)
+                .filter(company_id=company.id)
+                .count(),
+                2,
+            )
+            self.assertEqual(
+                self.get_shards_of(Transaction, company_id=company.id),
+                [company._state.db],
+            )
+
+    def test_move_company(self):
+        """
+        Should move a company along with its transactions, summary and
+        rollups to another shard, serving it from there
+        """
+        company = self.companies[0]
+        transactions = TransactionFactory.create_batch(3, company=company)
+        cnpj = format_cnpj(company.cnpj)
+        self.assertEqual(company_cache.get(cnpj).shard, self.first_shard)
+
+        call_command("move_company", cnpj=cnpj, shard=self.second_shard)
+
+        for model, filters in (
+            (Company, {"id": company.id}),
+            (Transaction, {"company_id": company.id}),
+            (CompanySummary, {"company_id": company.id}),
+            (DailyRollup, {"company_id": company.id}),
+        ):
+            self.assertEqual(
+                self.get_shards_of(model, **filters), [self.second_shard]
+            )
+        summary = CompanySummary.objects.using(self.second_shard).get(
+            company_id=company.id
+        )
+        self.assertEqual(
+            summary.total_value,
+            sum(transaction.value for transaction in transactions),
+        )
+        self.assertEqual(
+            CompanyPlacement.objects.get(cnpj=company.cnpj).shard,
+            self.second_shard,
+        )
+
+        self.assertEqual(company_cache.get(cnpj).shard, self.second_shard)
+        response = self.client.get(reverse(REPORT_VIEW_NAME), {"cnpj": cnpj})
+        self.assertEqual(len(response.json()["recebimentos"]), 3)
+
+        call_command("move_company", cnpj=cnpj, shard=self.first_shard)
+        self.assertEqual(
+            self.get_shards_of(Transaction, company_id=company.id),
+            [self.first_shard],
+        )
+        self.assertFalse(CompanyPlacement.objects.exists())
+
+    def test_move_company_errors(self):
+        """
+        Should not move a company to its own shard, to an unknown shard or
+        when it does not exist
+        """
+        cnpj = format_cnpj(self.companies[0].cnpj)
+        for cnpj, shard, message in (
+            (cnpj, self.first_shard, "is already in shard"),
+            (cnpj, "shard99", "Unknown shard"),
+            (cnpj_of_shard(self.first_shard), self.second_shard, "not found"),
+        ):
+            with self.assertRaisesMessage(CommandError, message):
+                call_command("move_company", cnpj=cnpj, shard=shard)
+
+    def test_pin_companies(self):
+        """
+        Should pin the companies held by shards other than the ones picked by
+        their CNPJs, serving them from the shards holding them
+        """
+        cnpj = cnpj_of_shard(self.first_shard)
+        company = CompanyFactory.build(cnpj=cnpj)
+        Company.objects.using(self.second_shard).bulk_create([company])
+        self.assertEqual(shard_directory.get(cnpj), self.first_shard)
+
+        output = StringIO()
+        call_command("pin_companies", stdout=output)
+
+        self.assertIn("Successfully pinned 1 companies", output.getvalue())
+        self.assertEqual(shard_directory.get(cnpj), self.second_shard)
+        response = self.client.get(reverse(REPORT_VIEW_NAME), {"cnpj": cnpj})
+        self.assertEqual(response.status_code, 200)
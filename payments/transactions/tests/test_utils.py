@@ -0,0 +1,150 @@
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
+from django.test import TestCase, TransactionTestCase
+
+from companies.cache import company_cache
+from companies.formats import normalize_cnpj
+from transactions.api.serializers import TransactionSerializer
+from transactions.formats import format_cpf
+from transactions.models import Transaction
+from transactions.tests.factories import TransactionFactory
+from transactions.utils import (
+    insert_transactions,
+    is_unknown_company,
+    merge_transactions,
+    record_transactions,
+)
+
+
+class TestUtils(TestCase):
+    def setUp(self):
+        self.transactions = TransactionFactory.build_batch(3)
+        for transaction in self.transactions:
+            transaction.company.save()
+
+        self.test_data = [
+            TransactionSerializer(transaction).data
+            for transaction in self.transactions
+        ]
+
+    def test_record_transactions(self):
+        """
+        Should successfully insert a batch of Transactions into the database
+        with a single query for the companies and a single insert
+        """
+        self.assertEqual(Transaction.objects.count(), 0)
+
+        # along with the savepoint the insert runs in, as the test runs
+        # within a transaction
+        with self.assertNumQueries(4):
+            accepted = record_transactions(self.test_data)
+
+        self.assertEqual(accepted, [True, True, True])
+        self.assertEqual(Transaction.objects.count(), len(self.test_data))
+
+        for transaction in self.transactions:
+            retrieved_transaction = Transaction.objects.get(
+                company=transaction.company
+            )
+            self.assertEqual(
+                format_cpf(retrieved_transaction.client), transaction.client
+            )
+            self.assertEqual(transaction.value, retrieved_transaction.value)
+            self.assertEqual(
+                transaction.description, retrieved_transaction.description
+            )
+
+    def test_record_transactions_rejections(self):
+        """
+        Should insert only valid Transactions of known companies, flagging
+        the rejected ones
+        """
+        self.test_data[0]["cliente"] = "111.111.111-11"
+        self.test_data[1]["estabelecimento"] = "11.111.111/1111-11"
+
+        accepted = record_transactions(self.test_data)
+
+        self.assertEqual(accepted, [False, False, True])
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_record_transactions_nothing_valid(self):
+        """
+        Should not query the database when none of the Transactions is valid
+        """
+        with self.assertNumQueries(0):
+            accepted = record_transactions([{"valor": "invalid"}, "invalid"])
+
+        self.assertEqual(accepted, [False, False])
+
+    def test_merge_transactions(self):
+        """
+        Should insert the given transactions along with their ids, leaving
+        out the ones merged before and the ones of deleted companies
+        """
+        deleted = TransactionFactory.build()
+        deleted.company.save()
+        deleted.company.delete()
+
+        inserted = merge_transactions(
+            self.transactions[:2] + [deleted], DEFAULT_DB_ALIAS
+        )
+        self.assertEqual(inserted, 2)
+
+        inserted = merge_transactions(self.transactions, DEFAULT_DB_ALIAS)
+        self.assertEqual(inserted, 1)
+        self.assertEqual(
+            set(Transaction.objects.values_list("id", flat=True)),
+            {transaction.id for transaction in self.transactions},
+        )
+
+
+class TestRecordTransactionsCommitted(TransactionTestCase):
+    """Records transactions outside of a transaction, as the API does"""
+
+    def setUp(self):
+        company_cache.clear()
+        self.transactions = TransactionFactory.build_batch(3)
+        for transaction in self.transactions:
+            transaction.company.save()
+
+        self.test_data = [
+            TransactionSerializer(transaction).data
+            for transaction in self.transactions
+        ]
+
+    def test_record_transactions_stale_company(self):
+        """
+        Should look the companies up again when a cached one no longer
+        exists, inserting the other Transactions and only rejecting the
+        ones of that company
+        """
+        deleted = self.transactions[0].company
+        cnpj = self.test_data[0]["estabelecimento"]
+        cached = company_cache.get(cnpj)
+        deleted.delete()
+        # as another process would still have it cached
+        company_cache._store(normalize_cnpj(cnpj), cached)
+
+        accepted = record_transactions(self.test_data)
+
+        self.assertEqual(accepted, [False, True, True])
+        self.assertEqual(
+            set(Transaction.objects.values_list("company_id", flat=True)),
+            {t.company.id for t in self.transactions[1:]},
+        )
+        self.assertEqual(company_cache.get_cached(cnpj), (True, None))
+
+    def test_is_unknown_company(self):
+        """
+        Should only tell the refusals by the foreign key of the company
+        apart from the ones by other constraints
+        """
+        transaction = self.transactions[0]
+        insert_transactions([transaction])
+        with self.assertRaises(IntegrityError) as duplicate:
+            insert_transactions([transaction])
+        self.assertFalse(is_unknown_company(duplicate.exception))
+
+        orphan = TransactionFactory.build()
+        with self.assertRaises(IntegrityError) as unknown:
+            insert_transactions([orphan])
+        self.assertTrue(is_unknown_company(unknown.exception))
@@ -0,0 +1,168 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Union
+from uuid import UUID
+
+from django.db import IntegrityError, connections, transaction
+from psycopg2 import errorcodes
+
+from companies.cache import company_cache
+from payments.bulk import copy_instances
+from payments.routers import use_shard
+from transactions.api.serializers import TransactionIngestSerializer
+from transactions.models import Transaction
+
+TransactionData = Dict[str, Union[str, float]]
+TransactionsData = List[TransactionData]
+
+STAGING_TABLE = "transactions_transaction_staging"
+
+CREATE_STAGING_TABLE = f"""
+CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE}
+(LIKE transactions_transaction)
+"""
+
+# the transactions merged before (e.g. by an import resumed or a queue
+# replayed after a crash) keep their ids, so they are left out as conflicts,
+# along with the ones of companies deleted in the meantime
+MERGE_STAGING_TABLE = f"""
+INSERT INTO transactions_transaction ({{columns}})
+SELECT {{columns}} FROM {STAGING_TABLE} AS staged
+WHERE EXISTS (
+    SELECT FROM companies_company AS company
+    WHERE company.id = staged.company_id
+)
+ON CONFLICT DO NOTHING
+"""
+
+TRUNCATE_STAGING_TABLE = f"TRUNCATE {STAGING_TABLE}"
+
+
+def validate_transaction(data: TransactionData) -> Optional[TransactionData]:
+    """
+    Validates incoming transaction data, returning the validated data or
+    None when it is invalid
+    """
+    serializer = TransactionIngestSerializer(data=data)
+    return serializer.validated_data if serializer.is_valid() else None
+
+
+def build_transaction(
+    company_id: UUID, validated_data: TransactionData
+) -> Transaction:
+    """Builds a Transaction instance out of validated transaction data"""
+    return Transaction(
+        company_id=company_id,
+        client=validated_data["client"],
+        value=validated_data["value"],
+        description=validated_data["description"],
+    )
+
+
+def is_unknown_company(exc: IntegrityError) -> bool:
+    """
+    Tells whether a transaction was refused by the foreign key of its
+    company, which no longer exists (e.g. deleted, or moved to another
+    shard, after it was cached), rather than by another constraint
+    """
+    error = exc.__cause__
+    if getattr(error, "pgcode", None) != errorcodes.FOREIGN_KEY_VIOLATION:
+        return False
+    column = Transaction._meta.get_field("company").column
+    return column in (error.diag.constraint_name or "")
+
+
+def insert_transactions(transactions: List[Transaction]):
+    """
+    Inserts already validated transactions with a single query, skipping
+    the model cleaning performed by Transaction.save
+    """
+    if transactions:
+        Transaction.objects.bulk_create(transactions)
+
+
+def merge_transactions(transactions: List[Transaction], shard: str) -> int:
+    """
+    Copies transactions, along with their ids, into a staging table of the
+    shard and merges them into the transactions table, returning how many
+    were inserted. Merging the same transactions again is a no-op.
+    """
+    connection = connections[shard]
+    fields = Transaction._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+
+    with transaction.atomic(using=shard), connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_TABLE)
+        copy_instances(cursor, STAGING_TABLE, fields, transactions)
+        cursor.execute(MERGE_STAGING_TABLE.format(columns=columns))
+        inserted = cursor.rowcount
+        cursor.execute(TRUNCATE_STAGING_TABLE)
+    return inserted
+
+
+def _insert_by_shard(
+    pieces: Dict[int, TransactionData], companies: Dict
+) -> List[int]:
+    """
+    Inserts validated transactions, keyed by their position in the batch,
+    with a single bulk insert into the shard of each company, returning the
+    positions of the ones which were not inserted: the ones of unknown
+    companies and the ones of shards which refused them (e.g. as a cached
+    company was deleted or moved meanwhile)
+    """
+    rejected = []
+    transactions_by_shard = defaultdict(dict)
+    for index, piece in pieces.items():
+        company = companies[piece["cnpj"]]
+        if company is None:
+            rejected.append(index)
+        else:
+            transactions_by_shard[company.shard][index] = build_transaction(
+                company.id, piece
+            )
+
+    for shard, transactions in transactions_by_shard.items():
+        try:
+            # atomic, so a refused insert is rolled back on its own
+            with use_shard(shard), transaction.atomic(using=shard):
+                insert_transactions(list(transactions.values()))
+        except IntegrityError:
+            rejected.extend(transactions)
+    return rejected
+
+
+def record_transactions(data: TransactionsData) -> List[bool]:
+    """
+    Validates and inserts a batch of transactions using at most a single
+    query for resolving the companies of each shard (see companies.cache)
+    and a single bulk insert into each shard, returning whether each one of
+    the given transactions was accepted.
+
+    When a shard refuses its insert, as a cached company no longer exists
+    there, the companies of its transactions are looked up again and the
+    transactions inserted into their current shards, so only the ones of
+    companies which no longer exist are rejected.
+    """
+    validated = [validate_transaction(piece) for piece in data]
+    pieces = {index: piece for index, piece in enumerate(validated) if piece}
+
+    companies = company_cache.get_many(
+        piece["cnpj"] for piece in pieces.values()
+    )
+    rejected = set(_insert_by_shard(pieces, companies))
+
+    stale = {
+        index: pieces[index]
+        for index in rejected
+        if companies[pieces[index]["cnpj"]] is not None
+    }
+    if stale:
+        companies = company_cache.refresh_many(
+            piece["cnpj"] for piece in stale.values()
+        )
+        rejected.difference_update(stale)
+        rejected.update(_insert_by_shard(stale, companies))
+
+    return [
+        index in pieces and index not in rejected
+        for index in range(len(validated))
+    ]
@@ -1,12 +1,16 @@
 from django.core.validators import ValidationError
 
+from companies.formats import DocumentNumber
 from pycpfcnpj.cpfcnpj import validate as cpf_is_valid
+from transactions.formats import format_cpf
 
 
-def cpf_validator(value: str):
-    message = f"Ensure the CPF is valid (it is {value})."
+def cpf_validator(value: DocumentNumber):
+    # the stored integers are shown with their punctuation
+    cpf = format_cpf(value) if isinstance(value, int) else value
+    message = f"Ensure the CPF is valid (it is {cpf})."
     code = "cpf_value"
     params = {"value": value}
 
-    if not cpf_is_valid(value):
+    if not cpf_is_valid(cpf):
         raise ValidationError(message, code=code, params=params)
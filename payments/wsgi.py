@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "payments.settings")
 
 application = get_wsgi_application()
+
+# the apps can only be imported once the application is set up
+from companies.cache import company_cache  # noqa: E402
+
+if settings.COMPANY_CACHE["PREWARM"]:
+    company_cache.prewarm()